@@ -0,0 +1,86 @@
+"""Benchmark the word-sense disambiguation methods against each other.
+
+Runs filtering and aspect extraction once, then times `match` for every method in
+`DISAMBIGUATION_METHODS` and reports how often the chosen synset differs from the
+default, cluster-context based disambiguation.
+
+Usage::
+
+    python benchmarks/bench_disambiguation.py tests/resources/1000_comments.csv -ep /embeddings
+"""
+
+import time
+from collections import Counter
+from pathlib import Path
+
+import click
+import pandas as pd
+
+from extra_model._aspects import generate_aspects
+from extra_model._disambiguate import DISAMBIGUATION_METHODS, match
+from extra_model._filter import filter
+from extra_model._models import ExtraModel
+from extra_model._wordnet import wordnet
+
+
+def compare_methods(aspect_counts, vectorizer, reference="context"):
+    """Time all disambiguation methods and compare their matches to a reference method.
+
+    :param aspect_counts: Counter object of aspect->number of occurrence
+    :type aspect_counts: :class:`collections.Counter`
+    :param vectorizer: the provider of word-embeddings
+    :type vectorizer: :class:`extra_model._vectorizer.Vectorizer`
+    :param reference: the method the others are compared to
+    :type reference: str
+    :return: one row per method with its runtime, speedup and share of aspects matched differently
+    :rtype: :class:`pandas.DataFrame`
+    """
+    # make sure building/loading the wordnet snapshot is not part of the timings
+    wordnet.get()
+
+    timings = {}
+    matches = {}
+    for method in DISAMBIGUATION_METHODS:
+        start = time.perf_counter()
+        aspects, synsets = match(aspect_counts, vectorizer, method=method)
+        timings[method] = time.perf_counter() - start
+        matches[method] = dict(zip(aspects, synsets))
+
+    rows = []
+    for method in DISAMBIGUATION_METHODS:
+        differing = sum(
+            matches[method][aspect] != synset
+            for aspect, synset in matches[reference].items()
+        )
+        rows.append(
+            {
+                "method": method,
+                "seconds": timings[method],
+                "speedup": timings[reference] / timings[method],
+                "aspects": len(matches[method]),
+                "differing": differing,
+                "differing_share": differing / max(1, len(matches[reference])),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+@click.command()
+@click.argument("input_path", type=Path)
+@click.option("-ep", "--embeddings-path", type=Path, default="/embeddings")
+def main(input_path, embeddings_path):
+    """Compare disambiguation methods on the comments in INPUT_PATH."""
+    dataframe_texts = pd.read_csv(input_path).rename(
+        {"CommentId": "source_guid"}, axis="columns"
+    )
+    dataframe_aspects = generate_aspects(filter(dataframe_texts))
+    extra_model = ExtraModel(models_folder=embeddings_path)
+    extra_model.load_from_files()
+    report = compare_methods(
+        Counter(dataframe_aspects["aspect"]), extra_model.vectorizer
+    )
+    click.echo(report.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
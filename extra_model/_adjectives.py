@@ -1,109 +1,193 @@
 """Cluster adjectives and extract sentiment."""
 
-from collections import Counter
-
 import numpy as np
-from nltk.corpus import wordnet as wn
+import pandas as pd
+from scipy.spatial import distance
 from sklearn.neighbors import BallTree
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
+from extra_model._parallel import parallel_map
+from extra_model._sentiment import sentiments
+from extra_model._wordnet import wordnet as wn
+
+# radius of 0.8 hand-tuned to give decent adjective clusters
+RADIUS = 0.8
+
+
+def _csr(rows):
+    """Pack lists of ids into compressed sparse row layout, sorting each row.
+
+    :param rows: the ids of each row
+    :type rows: [[int]]
+    :return: the offsets of the rows and the concatenated, sorted ids
+    :rtype: (:class:`numpy.array`, :class:`numpy.array`)
+    """
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=indptr[1:])
+    indices = np.concatenate(
+        [np.sort(np.asarray(row, dtype=np.int64)) for row in rows]
+        + [np.zeros(0, dtype=np.int64)]
+    )
+    return indptr, indices
+
+
+class AdjectiveGraph:
+    """Embeddings of a vocabulary of adjectives, their neighbours within `RADIUS` and their antonyms.
+
+    Built once for all the adjectives of all topics, so that the adjectives shared by many topics are only
+    embedded, searched and looked up in wordnet once. Neighbours and antonyms are stored in compressed sparse
+    row layout, sorted by id.
+    """
+
+    def __init__(self, adjectives, vectorizer, radius=RADIUS):
+        """Embed the adjectives and find their neighbours and antonyms.
+
+        :param adjectives: the adjectives, duplicates and adjectives without an embedding are dropped
+        :type adjectives: [str]
+        :param vectorizer:  provide embeddings to evaluate adjective similarity
+        :type vectorizer: :class:`_vectorizer.vectorizer`
+        :param radius: maximal distance between neighbours
+        :type radius: float
+        """
+        self.adjectives = []
+        vectors = []
+        for adjective in dict.fromkeys(adjectives):
+            vector = vectorizer.get_vector(adjective)
+            # most of the adjectives without an embedding are typos
+            if vector is not None:
+                self.adjectives.append(adjective)
+                vectors.append(vector)
+        self.ids = {adjective: i for i, adjective in enumerate(self.adjectives)}
+        self.vectors = np.array(vectors)
+
+        neighbours = []
+        if len(vectors) > 0:
+            neighbours = BallTree(self.vectors).query_radius(self.vectors, radius)
+        self.indptr, self.indices = _csr(neighbours)
+        self.antonym_indptr, self.antonym_indices = _csr(self._find_antonyms())
+
+    def _find_antonyms(self):
+        """Find, for each adjective, the adjectives of the vocabulary that are its antonyms.
+
+        `other` is an antonym of `adjective` if any wordnet lemma of `other` is an antonym of any meaning of
+        `adjective`. The relation is not necessarily symmetric.
+
+        :return: the ids of the antonyms of each adjective
+        :rtype: [[int]]
+        """
+        lemmas = {}
+        antonyms = {}
+        for word in {adjective.lower() for adjective in self.adjectives}:
+            lemmas[word] = set()
+            antonyms[word] = set()
+            for syn in wn.synsets(word, pos=wn.ADJ):
+                lemmas[word].update(syn.lemma_names())
+                antonyms[word].update(syn.antonyms())
+
+        # which adjectives of the vocabulary have a given lemma
+        having_lemma = {}
+        for i, adjective in enumerate(self.adjectives):
+            for lemma in lemmas[adjective.lower()]:
+                having_lemma.setdefault(lemma, []).append(i)
 
-def cluster_adjectives(adjective_counts, vectorizer):  # noqa: C901
+        return [
+            sorted(
+                {
+                    other
+                    for antonym in antonyms[adjective.lower()]
+                    for other in having_lemma.get(antonym, [])
+                }
+            )
+            for adjective in self.adjectives
+        ]
+
+    def neighbours(self, index):
+        """Return the ids of the adjectives within the radius of an adjective, including itself."""
+        return self.indices[self.indptr[index] : self.indptr[index + 1]]
+
+    def antonyms(self, index):
+        """Return the ids of the adjectives that are antonyms of an adjective."""
+        return self.antonym_indices[
+            self.antonym_indptr[index] : self.antonym_indptr[index + 1]
+        ]
+
+
+def cluster_adjectives(adjective_counts, vectorizer, neighbours=None):  # noqa: C901
     """Cluster adjectives based on a constant radius clustering algorithm.
 
     Technical implementation uses a scikitlearn BallTree.
 
     :param adjective_counts: dictionary with adjectives and their counts
     :type adjective_counts: [(str,int)]
-    :param vectorizer:  provide embeddings to evaluate adjective similarity
+    :param vectorizer:  provide embeddings to evaluate adjective similarity, not needed if `neighbours` is given
     :type vectorizer: :class:`_vectorizer.vectorizer`
+    :param neighbours: embeddings and neighbours of (at least) these adjectives, built from `adjective_counts`
+        if not given
+    :type neighbours: :class:`AdjectiveGraph`
     :return: first list contains the representative words for the adjective clusters,
         second list the size (total number of clustered adjectives) for each cluster,
         third list has for each cluster a list of the constituent adjectives with number of occurence
     :rtype: ([string],[int],[[(string,int)]])
     """
-    adjectives, counts = zip(*adjective_counts)
-    adjectives = list(adjectives)
-    counts = list(counts)
-
-    # find vector embeddings for the adjectives and filter adjectives for which ew don't have an embedding
-    # most of these are typos
-    vectors = [vectorizer.get_vector(ad) for ad in adjectives]
-    for i in range(len(adjectives)):
-        if vectors[i] is None:
-            adjectives[i] = None
-            counts[i] = None
-    adjectives = [ad for ad in adjectives if ad is not None]
-    counts = [count for count in counts if count is not None]
-    vectors = [vec for vec in vectors if vec is not None]
-    # keep track of indices for further processing
-    indices = [i for i in range(len(adjectives))]
-    clusters = []
-    cluster_size = []
-    # use the adjective closest to the cluster center as representative
-    cluster_representative = []
-    cluster_ads = []
-
+    if neighbours is None:
+        neighbours = AdjectiveGraph(
+            [adjective for adjective, _ in adjective_counts], vectorizer
+        )
+    # filter adjectives for which we don't have an embedding
+    adjective_counts = [
+        (adjective, count)
+        for adjective, count in adjective_counts
+        if adjective in neighbours.ids
+    ]
     if (
-        len(vectors) == 0
+        len(adjective_counts) == 0
     ):  # no embeddable adjective for this topic -> there is no cluster to build
         return
-    if len(vectors) == 1:  # Balltree doesn't work if list contains a single vector
+    adjectives, counts = zip(*adjective_counts)
+    adjectives = list(adjectives)
+    counts = list(counts)
+    if len(adjectives) == 1:
         # in this case, the single word is the whole cluster
         return (adjectives, [counts], [[(adjectives[0], counts[0])]])
-    tree = BallTree(vectors)
-    working_set = list(zip(adjectives, indices))
-    already_clustered = set()
+
+    # position of the adjectives of this topic in the vocabulary and vice versa
+    ids = np.array([neighbours.ids[adjective] for adjective in adjectives])
+    positions = np.full(len(neighbours.adjectives), -1)
+    positions[ids] = np.arange(len(ids))
+    vectors = neighbours.vectors[ids]
+    counts = np.array(counts)
+    clusters = []
     # run the constant radius clustering:
-    # as long as there are unclustered adjectives left, take the one with the highes count
-    # and cluster all other words within a given distance into it.
-    while len(working_set) > 0:
-        # radius of 0.8 hand-tuned to give decent adjective clusters
-        cluster_indices = tree.query_radius([vectors[working_set[0][1]]], 0.8)
-        new_cluster = []
-        for i in cluster_indices[0]:
-            new_cluster.append(i)
-        new_cluster = [index for index in new_cluster if index not in already_clustered]
-        # clean the new cluster from opposites:
-        # get the synset for the most common word in the cluster
-        master_synset = wn.synsets(working_set[0][0].lower(), pos=wn.ADJ)
-        master_antonyms = set()
-        for syn in master_synset:
-            for lemma in syn.lemmas():
-                master_antonyms.update(lemma.antonyms())
-        for i in range(len(new_cluster)):
-            # skip the most common word, in case it is among its own antonyms
-            # (shouldn't happen)
-            if new_cluster[i] == working_set[0][1]:
-                continue
-            for syn in wn.synsets(adjectives[new_cluster[i]].lower(), pos=wn.ADJ):
-                for lemma in syn.lemmas():
-                    if lemma in master_antonyms:
-                        new_cluster[i] = None
-                        break
-                if new_cluster[i] is None:
-                    break
-        new_cluster = [ind for ind in new_cluster if ind is not None]
-        already_clustered.update(new_cluster)
-        for i in range(len(working_set)):
-            if working_set[i][1] in already_clustered:
-                working_set[i] = None
-        working_set = [it for it in working_set if it is not None]
+    # sweep the adjectives in the given order (highest count first), each one that is not
+    # clustered yet starts a new cluster with all other unclustered words within a given distance
+    assigned = np.zeros(len(adjectives), dtype=bool)
+    for master in range(len(adjectives)):
+        if assigned[master]:
+            continue
+        cluster_indices = positions[neighbours.neighbours(ids[master])]
+        new_cluster = np.sort(cluster_indices[cluster_indices >= 0])
+        new_cluster = new_cluster[~assigned[new_cluster]]
+        # clean the new cluster from opposites of the most common word in the cluster,
+        # which is kept in case it is among its own antonyms (shouldn't happen)
+        opposite = np.isin(ids[new_cluster], neighbours.antonyms(ids[master]))
+        new_cluster = new_cluster[~opposite | (new_cluster == master)].tolist()
+        assigned[new_cluster] = True
         clusters.append(new_cluster)
-        cluster_size.append(sum(counts[i] for i in new_cluster))
-        cluster_ads.append([(adjectives[i], counts[i]) for i in new_cluster])
-
-        # get the representative as closest word to the cluster-mean
-        cluster_weights = [counts[i] for i in new_cluster]
-        cluster_vecs = [vectors[i] for i in new_cluster]
-        cluster_representative.append(
-            adjectives[
-                tree.query(
-                    [np.average(cluster_vecs, axis=(0), weights=cluster_weights)],
-                    return_distance=False,
-                )[0][0]
-            ]
-        )
+
+    # get the representatives as closest words to the count-weighted cluster-means
+    labels = np.zeros(len(adjectives), dtype=np.int64)
+    for label, cluster in enumerate(clusters):
+        labels[cluster] = label
+    cluster_size = np.bincount(labels, weights=counts).astype(counts.dtype)
+    centroids = np.zeros((len(clusters), vectors.shape[1]))
+    np.add.at(centroids, labels, vectors * counts[:, np.newaxis])
+    centroids /= cluster_size[:, np.newaxis]
+    cluster_representative = [
+        adjectives[i] for i in distance.cdist(centroids, vectors).argmin(axis=1)
+    ]
+    cluster_size = cluster_size.tolist()
+    cluster_ads = [
+        [(adjectives[i], counts[i].item()) for i in cluster] for cluster in clusters
+    ]
 
     # sort clusters by size before returning
     cluster_size, cluster_ads, cluster_representative = zip(
@@ -116,7 +200,20 @@ def cluster_adjectives(adjective_counts, vectorizer):  # noqa: C901
     return (cluster_representative, cluster_size, cluster_ads)
 
 
-def fill_sentiment_dict(adjective_counts):
+def cluster_topic_adjectives(neighbours, adjective_counts):
+    """Cluster the adjectives of one topic, in the argument order expected by :func:`extra_model._parallel.parallel_map`.
+
+    :param neighbours: embeddings and neighbours of the adjectives of all topics
+    :type neighbours: :class:`AdjectiveGraph`
+    :param adjective_counts: dictionary with adjectives and their counts
+    :type adjective_counts: [(str,int)]
+    :return: the adjective clusters, see :func:`cluster_adjectives`
+    :rtype: ([string],[int],[[(string,int)]])
+    """
+    return cluster_adjectives(adjective_counts, None, neighbours)
+
+
+def fill_sentiment_dict(adjective_counts, cache=None):
     """Given a dictionary with adjectives and their counts, will compute.
 
     The sentiment of each of the adjectives using the VADER sentiment analysis package
@@ -124,20 +221,19 @@ def fill_sentiment_dict(adjective_counts):
 
     :param adjective_counts: dictionary with adjectives and their counts
     :type adjective_counts: dict
+    :param cache: table of known sentiments, defaults to the shared :data:`extra_model._sentiment.sentiments`
+    :type cache: :class:`extra_model._sentiment.SentimentCache`
     :return: dictionary, where the keys are the adjectives and the values are tuples of the
         corresponding compound sentiument and binary sentiment
     :rtype: dict
     """
+    if cache is None:
+        cache = sentiments
     sentiment_dict = {}
-    analyzer = SentimentIntensityAnalyzer()
     for one_topic_adjectives in adjective_counts:
         for adjective, _ in one_topic_adjectives:
             if adjective not in sentiment_dict:
-                score = analyzer.polarity_scores(adjective)
-                sentiment_dict[adjective] = (
-                    score["compound"],
-                    (score["pos"] - score["neg"]),
-                )
+                sentiment_dict[adjective] = cache.score(adjective)
     return sentiment_dict
 
 
@@ -168,7 +264,77 @@ def sentiments_from_adjectives(adjective_counts, sentiment_dict):
     return (sentimentscore_compound, sentimentscore_binary)
 
 
-def adjective_info(dataframe_topics, dataframe_aspects, vectorizer):
+def count_topic_adjectives(rawterms, dataframe_aspects):
+    """Count the descriptors of the aspects of every topic.
+
+    Each aspect is joined to the topics whose raw terms contain it, so the descriptors of all topics are counted in
+    a single `groupby` rather than by filtering the whole aspect frame once per topic.
+
+    :param rawterms: the raw terms of each topic
+    :type rawterms: :class:`pandas.Series`
+    :param dataframe_aspects: the aspect instances with columns `aspect` and `descriptor`
+    :type dataframe_aspects: :class:`pandas.DataFrame`
+    :return: for each topic, the descriptors and their counts, most common first and in order of first occurrence
+        among equally common ones, as returned by :meth:`collections.Counter.most_common`
+    :rtype: [[(str,int)]]
+    """
+    topic_terms = (
+        pd.DataFrame({"topic": np.arange(len(rawterms)), "aspect": list(rawterms)})
+        .explode("aspect")
+        .dropna()
+        .drop_duplicates()
+    )
+    aspects = pd.DataFrame(
+        {
+            "row": np.arange(len(dataframe_aspects)),
+            "aspect": dataframe_aspects["aspect"].to_numpy(),
+            "descriptor": dataframe_aspects["descriptor"].to_numpy(),
+        }
+    )
+    counts = (
+        topic_terms.merge(aspects, on="aspect")
+        .groupby(["topic", "descriptor"], sort=False)["row"]
+        .agg(["size", "min"])
+        .reset_index()
+        .sort_values(["topic", "size", "min"], ascending=[True, False, True])
+    )
+    adjectives = [[] for _ in range(len(rawterms))]
+    for topic, descriptor, count in zip(
+        counts["topic"].tolist(), counts["descriptor"].tolist(), counts["size"].tolist()
+    ):
+        adjectives[topic].append((descriptor, count))
+    return adjectives
+
+
+def aspect_sentiments(dataframe_aspects, sentiment_dict):
+    """Add the sentiment of the descriptor of each aspect instance, flipped if the descriptor is negated.
+
+    :param dataframe_aspects: the aspect instances, with columns `descriptor` and `is_negated`
+    :type dataframe_aspects: :class:`pandas.DataFrame`
+    :param sentiment_dict: the compound and binary sentiment of the adjectives, see :func:`fill_sentiment_dict`
+    :type sentiment_dict: dict
+    :return: the aspects with columns `sentiment_compound` and `sentiment_binary`
+    :rtype: :class:`pandas.DataFrame`
+    """
+    # descriptors of aspects that are not part of any topic have neutral sentiment
+    compound = pd.Series(
+        {adjective: pair[0] for adjective, pair in sentiment_dict.items()}, dtype=float
+    )
+    binary = pd.Series(
+        {adjective: pair[1] for adjective, pair in sentiment_dict.items()}, dtype=float
+    )
+    # flip sentiment if adjective is negated
+    sign = np.where(dataframe_aspects["is_negated"].astype(bool), -1, 1)
+    dataframe_aspects["sentiment_compound"] = (
+        dataframe_aspects["descriptor"].map(compound).fillna(0) * sign
+    )
+    dataframe_aspects["sentiment_binary"] = (
+        dataframe_aspects["descriptor"].map(binary).fillna(0) * sign
+    )
+    return dataframe_aspects
+
+
+def adjective_info(dataframe_topics, dataframe_aspects, vectorizer, n_jobs=1):
     """Add adjective related information to the dataframes.
 
     This has two facets:
@@ -181,17 +347,29 @@ def adjective_info(dataframe_topics, dataframe_aspects, vectorizer):
     :type dataframe_aspects: :class:`pandas.DataFrame`
     :param vectorizer:  provide embeddings for the adjectives
     :type vectorizer: :class:`_vectorizer.vectorizer`
+    :param n_jobs: number of processes to cluster the topics in, see :func:`extra_model._parallel.parallel_map`
+    :type n_jobs: int
     :return: the enriched datafromes
     :rtype: (:class:`pandas.DataFrame`,:class:`pandas.DataFrame`)
     """
     # get counts of adjectives connected to a given topic
-    dataframe_topics["adjectives"] = dataframe_topics["rawterms"].apply(
-        lambda terms: Counter(
-            dataframe_aspects[dataframe_aspects["aspect"].isin(terms)]["descriptor"]
-        ).most_common()
+    dataframe_topics["adjectives"] = count_topic_adjectives(
+        dataframe_topics["rawterms"], dataframe_aspects
     )
-    dataframe_topics["adjective_clusters"] = dataframe_topics["adjectives"].apply(
-        lambda adjective_counts: cluster_adjectives(adjective_counts, vectorizer)
+    # embed every adjective and find its neighbours once for all topics
+    neighbours = AdjectiveGraph(
+        [
+            adjective
+            for adjective_counts in dataframe_topics["adjectives"]
+            for adjective, _ in adjective_counts
+        ],
+        vectorizer,
+    )
+    dataframe_topics["adjective_clusters"] = parallel_map(
+        cluster_topic_adjectives,
+        dataframe_topics["adjectives"],
+        shared=neighbours,
+        n_jobs=n_jobs,
     )
 
     # sentimentscore for adjectives, based on compund score of Vader sentiment
@@ -211,30 +389,5 @@ def adjective_info(dataframe_topics, dataframe_aspects, vectorizer):
         lambda pair: pair[1]
     )
 
-    dataframe_aspects["sentiment_compound"] = dataframe_aspects["descriptor"].apply(
-        lambda descriptor: (
-            sentiment_dict[descriptor][0] if descriptor in sentiment_dict else 0
-        )
-    )
-    dataframe_aspects["sentiment_binary"] = dataframe_aspects["descriptor"].apply(
-        lambda descriptor: (
-            sentiment_dict[descriptor][1] if descriptor in sentiment_dict else 0
-        )
-    )
-
-    # flip sentiment if adjective is negated
-    dataframe_aspects["sentiment_compound"] = dataframe_aspects.apply(
-        lambda x: (
-            x["sentiment_compound"] * (-1)
-            if x["is_negated"]
-            else x["sentiment_compound"]
-        ),
-        axis=1,
-    )
-    dataframe_aspects["sentiment_binary"] = dataframe_aspects.apply(
-        lambda x: (
-            x["sentiment_binary"] * (-1) if x["is_negated"] else x["sentiment_binary"]
-        ),
-        axis=1,
-    )
+    dataframe_aspects = aspect_sentiments(dataframe_aspects, sentiment_dict)
     return dataframe_topics, dataframe_aspects
@@ -1,3 +1,4 @@
+import functools
 import logging
 
 import pandas as pd
@@ -5,6 +6,7 @@ import spacy
 from spacy.symbols import NOUN, VERB, acomp, amod, nsubj
 
 from extra_model._errors import ExtraModelError
+from extra_model._progress import track
 
 """Generate the basic phrases that will be used for clustering
 Major steps:
@@ -15,6 +17,16 @@ Major steps:
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=None)
+def load_pipeline():
+    """Load the spaCy pipeline, once per process.
+
+    :return: the English pipeline without named entity recognition
+    :rtype: :class:`spacy.language.Language`
+    """
+    return spacy.load("en_core_web_sm", disable=["ner"])
+
+
 def compound_noun_list(token):
     """Find compound nouns.
 
@@ -101,7 +113,7 @@ def parse(dataframe_texts):  # noqa: C901
     :return: a dataframe with the aspect candidates
     :rtype: :class:`pandas.DataFrame`
     """
-    nlp = spacy.load("en_core_web_sm", disable=["ner"])
+    nlp = load_pipeline()
     # make a new dataframe with one row for each aspect/adjective pair
     rowlist = []
 
@@ -112,9 +124,12 @@ def parse(dataframe_texts):  # noqa: C901
 
     # n_threads > 5 can segfault with long (>500 tokens) sentences
     # n_threads has been deprecated in spacy 3.x - https://spacy.io/usage/v2-1#incompat
-    for index, document in zip(
-        dataframe_texts.index, nlp.pipe(dataframe_texts.Comments, batch_size=500)
+    progress = track("aspects", len(dataframe_texts))
+    for done, (index, document) in enumerate(
+        zip(dataframe_texts.index, nlp.pipe(dataframe_texts.Comments, batch_size=500)),
+        start=1,
     ):
+        progress.update(done)
         negated_adjectives = []
         for token in document:
             nouns = compound_noun_list(token)
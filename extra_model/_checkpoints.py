@@ -0,0 +1,182 @@
+"""Store the output of each stage of a prediction as Parquet files, to resume an interrupted run.
+
+The checkpoint of a stage is stored under a key that chains the key of the previous stage with the name and the
+parameters of the stage. The first key is derived from a hash of the input comments and the version of the package,
+so a checkpoint is only reused for the same input, code and parameters, and changing a parameter of a stage
+invalidates the checkpoints of that stage and all later ones.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from extra_model._errors import ExtraModelError
+
+try:
+    import pyarrow
+except ImportError:  # optional dependency, see the `checkpoints` extra
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+# stages of a prediction that are checkpointed, in order
+STAGES = ("filter", "aspects", "match", "topics", "output")
+# version of the checkpoint layout, part of every key
+FORMAT = "1"
+
+
+def input_key(dataframe_input):
+    """Hash the input comments together with the version of the package and of the checkpoint layout.
+
+    :param dataframe_input: the comments
+    :type dataframe_input: :class:`pandas.DataFrame`
+    :return: the hex digest
+    :rtype: str
+    """
+    # imported here, as the package imports this module before setting its version
+    from extra_model import __version__
+
+    digest = hashlib.sha256(f"{FORMAT}:{__version__}".encode())
+    digest.update(json.dumps([str(column) for column in dataframe_input]).encode())
+    digest.update(
+        pd.util.hash_pandas_object(dataframe_input, index=True).to_numpy().tobytes()
+    )
+    return digest.hexdigest()
+
+
+def stage_keys(dataframe_input, parameters):
+    """Derive the key of each stage from the input and the parameters of all stages up to it.
+
+    :param dataframe_input: the comments
+    :type dataframe_input: :class:`pandas.DataFrame`
+    :param parameters: the JSON serializable parameters of the stages, by stage name
+    :type parameters: dict
+    :return: the key of each stage in :data:`STAGES`
+    :rtype: dict
+    """
+    key = input_key(dataframe_input)
+    keys = {}
+    for stage in STAGES:
+        chained = json.dumps([key, stage, parameters.get(stage, {})], sort_keys=True)
+        key = hashlib.sha256(chained.encode()).hexdigest()
+        keys[stage] = key
+    return keys
+
+
+def _restore_lists(frame):
+    """Turn the arrays that Parquet returns for list columns back into lists.
+
+    :param frame: the frame read from Parquet, changed in place
+    :type frame: :class:`pandas.DataFrame`
+    :return: the frame
+    :rtype: :class:`pandas.DataFrame`
+    """
+    for column in frame.columns[frame.dtypes == object]:
+        if any(isinstance(value, np.ndarray) for value in frame[column]):
+            frame[column] = [
+                value.tolist() if isinstance(value, np.ndarray) else value
+                for value in frame[column]
+            ]
+    return frame
+
+
+class Checkpoints:
+    """Checkpoints of the stages of one prediction, doing nothing if no folder is given."""
+
+    def __init__(self, folder, dataframe_input, parameters):
+        """Derive the keys of the stages.
+
+        :param folder: where to store the checkpoints, None to disable them
+        :type folder: str or :class:`pathlib.Path`
+        :param dataframe_input: the comments
+        :type dataframe_input: :class:`pandas.DataFrame`
+        :param parameters: the JSON serializable parameters of the stages, by stage name
+        :type parameters: dict
+        :raises ExtraModelError: if checkpoints are requested but `pyarrow` is not installed
+        """
+        self.folder = folder
+        self.keys = {}
+        if folder is None:
+            return
+        if pyarrow is None:
+            raise ExtraModelError(
+                "Checkpoints are stored as Parquet and need `pyarrow`, install `extra-model[checkpoints]`"
+            )
+        os.makedirs(folder, exist_ok=True)
+        self.keys = stage_keys(dataframe_input, parameters)
+
+    def _path(self, stage, table):
+        return os.path.join(self.folder, f"{stage}-{self.keys[stage]}-{table}.parquet")
+
+    def load(self, stage, tables):
+        """Read the checkpoint of a stage.
+
+        :param stage: the stage
+        :type stage: str
+        :param tables: the names of the tables stored for the stage
+        :type tables: [str]
+        :return: the tables by name, None if checkpoints are disabled or any of the tables is missing or unreadable
+        :rtype: dict
+        """
+        if self.folder is None:
+            return None
+        paths = {table: self._path(stage, table) for table in tables}
+        if not all(os.path.isfile(path) for path in paths.values()):
+            return None
+        try:
+            loaded = {
+                table: _restore_lists(pd.read_parquet(path, engine="pyarrow"))
+                for table, path in paths.items()
+            }
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable checkpoint of stage {stage}: {e}")
+            return None
+        logger.info(f"Resuming stage {stage} from checkpoint {self.keys[stage]}")
+        return loaded
+
+    def save(self, stage, tables):
+        """Write the checkpoint of a stage, each table atomically so that readers never see a partial file.
+
+        A table that can't be stored as Parquet only logs a warning, the prediction continues without it.
+
+        :param stage: the stage
+        :type stage: str
+        :param tables: the tables by name
+        :type tables: dict
+        """
+        if self.folder is None:
+            return
+        for table, frame in tables.items():
+            handle, temporary = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+            os.close(handle)
+            try:
+                frame.to_parquet(temporary, engine="pyarrow")
+                os.replace(temporary, self._path(stage, table))
+            except Exception as e:
+                os.remove(temporary)
+                logger.warning(f"Could not store checkpoint of stage {stage}: {e}")
+                return
+
+    def run(self, stage, tables, compute):
+        """Read the checkpoint of a stage, or compute the stage and write its checkpoint.
+
+        :param stage: the stage
+        :type stage: str
+        :param tables: the names of the tables stored for the stage
+        :type tables: [str]
+        :param compute: computes the tables of the stage, by name
+        :type compute: callable
+        :return: the tables by name
+        :rtype: dict
+        """
+        loaded = self.load(stage, tables)
+        if loaded is not None:
+            return loaded
+        computed = compute()
+        self.save(stage, computed)
+        return computed
@@ -1,11 +1,14 @@
 import logging
 import sys
 from pathlib import Path
+from typing import Optional, Tuple
 
 import click
 
 from extra_model._errors import ExtraModelError
-from extra_model._run import run
+from extra_model._models import ExtraModel
+from extra_model._run import is_batch, run, run_aggregate, run_batch, run_extract
+from extra_model._serve import DEFAULT_HOST, DEFAULT_PORT, serve
 from extra_model._setup import setup
 
 logger = logging.getLogger(__name__)
@@ -16,6 +19,22 @@ OUTPUT_FILENAME = "result.csv"
 EMBEDDINGS_PATH = "/embeddings"
 
 
+def show_progress(stage: str, done: int, total: int, rate: float) -> None:
+    """Show the progress of a stage on stderr, with an estimate of the remaining time.
+
+    :param stage: the name of the stage
+    :param done: the number of items done
+    :param total: the number of items of the stage
+    :param rate: the number of items done per second
+    """
+    remaining = f", {(total - done) / rate:.0f}s left" if rate > 0 else ""
+    click.echo(
+        f"\r  {stage}: {done}/{total} ({rate:.1f}/s{remaining})",
+        err=True,
+        nl=done >= total,
+    )
+
+
 @click.command()
 @click.argument("input_path", type=Path)
 @click.option("-op", "--output-path", type=Path, default=OUTPUT_PATH, show_default=True)
@@ -25,18 +44,70 @@ EMBEDDINGS_PATH = "/embeddings"
 @click.option(
     "-ep", "--embeddings-path", type=Path, default=EMBEDDINGS_PATH, show_default=True
 )
+@click.option(
+    "--qa-report",
+    type=Path,
+    default=None,
+    help="Write a QA report of the topics to this file (Markdown for `.md`, JSON otherwise)",
+)
+@click.option(
+    "--metrics-out",
+    type=Path,
+    default=None,
+    help="Write the time, memory and row count of each stage to this JSON file",
+)
+@click.option(
+    "--progress", is_flag=True, help="Show the progress of long-running stages"
+)
+@click.option(
+    "--checkpoint-dir",
+    type=Path,
+    default=None,
+    help="Store the output of each stage here and resume from it when rerun",
+)
+@click.option(
+    "--state-dir",
+    type=Path,
+    default=None,
+    help="Fold the comments into the state of previous runs stored here",
+)
+@click.option(
+    "--group-by",
+    default=None,
+    help="Find the topics of each group of comments with the same value in this column separately",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=int,
+    default=1,
+    show_default=True,
+    help="Number of worker processes for the input files of a directory or glob, otherwise for the groups "
+    "and per-topic work, -1 for all cores",
+)
 @click.option("--debug", is_flag=True, help="Enable debug logging")
 def entrypoint(
     input_path: Path,
     output_path: Path,
     output_filename: Path,
     embeddings_path: Path,
+    qa_report: Optional[Path] = None,
+    metrics_out: Optional[Path] = None,
+    progress: bool = False,
+    checkpoint_dir: Optional[Path] = None,
+    state_dir: Optional[Path] = None,
+    group_by: Optional[str] = None,
+    jobs: int = 1,
     debug: bool = False,
 ) -> None:
     """Run the Extra algorithm for unsupervised topic extraction.
 
     INPUT_PATH (required) is the path to the input csv file with the user generated texts. It must contain
-    `CommentId` and `Comments` columns that are spelled exactly this way.
+    `CommentId` and `Comments` columns that are spelled exactly this way. It can also be a directory, whose `.csv`
+    files are all processed, or a quoted glob pattern such as `"/io/*.csv"`. The resources are then loaded once and
+    shared by JOBS worker processes, the output of each file is written to OUTPUT_PATH as
+    `<name of the input file>_result.csv`, and a summary of all files to `batch_summary.json`. Files ending in
+    `_result.csv` are not taken as input. The exit code is 1 if any file failed.
 
     OUTPUT_PATH (option) is the path to the output directory. Default is `/io`.
 
@@ -45,11 +116,155 @@ def entrypoint(
 
     EMBEDDINGS_PATH (option) is the path where the extra model will load the embeddings from.
     defaults to `/embeddings`.
+
+    QA_REPORT (option) is the path of a report summarizing each topic with its terms, adjective clusters
+    and representative comments. It is only created if this option is given.
+
+    METRICS_OUT (option) is the path of a JSON file with the wall time, CPU time, peak memory and row count
+    of each stage, and counters such as embedding and WordNet lookups. It is only created if this option is given.
+
+    CHECKPOINT_DIR (option) is a folder to store the output of each stage in. A rerun with the same input and
+    options resumes from the last stored stage. Needs `pyarrow` (`pip install extra-model[checkpoints]`).
+
+    STATE_DIR (option) is a folder with the state of previous runs. Only the new comments of INPUT_PATH are
+    parsed, and the output covers all comments of the state. Created by the first run, and needs `pyarrow`.
+
+    GROUP_BY (option) is a column of INPUT_PATH. The topics of each group of comments with the same value in it are
+    found separately, with the comments parsed together, and the column is added to the output.
+
+    JOBS (option) is the number of worker processes for several input files. For a single input file, it is the
+    number of processes for the groups of GROUP_BY and the per-topic work of the topic and adjective stages.
+    Default is 1.
+    """
+    logging.getLogger("extra_model").setLevel("DEBUG" if debug else "INFO")
+
+    try:
+        if is_batch(input_path):
+            options = {
+                "--qa-report": qa_report,
+                "--metrics-out": metrics_out,
+                "--checkpoint-dir": checkpoint_dir,
+                "--state-dir": state_dir,
+                "--group-by": group_by,
+            }
+            unsupported = [name for name, value in options.items() if value]
+            if unsupported:
+                raise ExtraModelError(
+                    f"{', '.join(unsupported)} can't be used with several input files"
+                )
+            summary = run_batch(input_path, output_path, embeddings_path, jobs=jobs)
+            failed = [result["input"] for result in summary if result["error"]]
+            if failed:
+                raise ExtraModelError(
+                    f"{len(failed)} of {len(summary)} input files failed: {', '.join(failed)}"
+                )
+            sys.exit(0)
+
+        run(
+            input_path,
+            output_path,
+            output_filename,
+            embeddings_path,
+            qa_report=qa_report,
+            metrics_out=metrics_out,
+            progress=show_progress if progress else None,
+            checkpoint_dir=checkpoint_dir,
+            state_dir=state_dir,
+            group_by=group_by,
+            n_jobs=jobs,
+        )
+        sys.exit(0)
+
+    except ExtraModelError as e:
+        logger.exception(e) if debug else logger.error(e)
+        sys.exit(1)
+
+
+@click.command()
+@click.argument("input_path", type=Path)
+@click.argument("partial_path", type=Path)
+@click.option("--debug", is_flag=True, help="Enable debug logging")
+def entrypoint_extract(
+    input_path: Path, partial_path: Path, debug: bool = False
+) -> None:
+    """Extract the aspects of a shard of comments, to be merged with other shards by `extra-model-aggregate`.
+
+    INPUT_PATH (required) is the path to the input csv file with the user generated texts. It must contain
+    `CommentId` and `Comments` columns that are spelled exactly this way.
+
+    PARTIAL_PATH (required) is the folder to write the filtered comments and their aspects to. Needs `pyarrow`
+    (`pip install extra-model[checkpoints]`). The embeddings are not needed.
     """
     logging.getLogger("extra_model").setLevel("DEBUG" if debug else "INFO")
 
     try:
-        run(input_path, output_path, output_filename, embeddings_path)
+        run_extract(input_path, partial_path)
+        sys.exit(0)
+
+    except ExtraModelError as e:
+        logger.exception(e) if debug else logger.error(e)
+        sys.exit(1)
+
+
+@click.command()
+@click.argument("partial_paths", type=Path, nargs=-1, required=True)
+@click.option("-op", "--output-path", type=Path, default=OUTPUT_PATH, show_default=True)
+@click.option(
+    "-of", "--output-filename", type=Path, default=OUTPUT_FILENAME, show_default=True
+)
+@click.option(
+    "-ep", "--embeddings-path", type=Path, default=EMBEDDINGS_PATH, show_default=True
+)
+@click.option(
+    "--qa-report",
+    type=Path,
+    default=None,
+    help="Write a QA report of the topics to this file (Markdown for `.md`, JSON otherwise)",
+)
+@click.option(
+    "--metrics-out",
+    type=Path,
+    default=None,
+    help="Write the time, memory and row count of each stage to this JSON file",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=int,
+    default=1,
+    show_default=True,
+    help="Number of processes for the per-topic work, -1 for all cores",
+)
+@click.option("--debug", is_flag=True, help="Enable debug logging")
+def entrypoint_aggregate(
+    partial_paths: Tuple[Path, ...],
+    output_path: Path,
+    output_filename: Path,
+    embeddings_path: Path,
+    qa_report: Optional[Path] = None,
+    metrics_out: Optional[Path] = None,
+    jobs: int = 1,
+    debug: bool = False,
+) -> None:
+    """Merge the partials of `extra-model-extract` and find the topics of all their comments.
+
+    PARTIAL_PATHS (required) are the folders written by `extra-model-extract`, in the order of their comments.
+    The output is that of `extra-model` on all comments of the partials.
+
+    The options are those of `extra-model`.
+    """
+    logging.getLogger("extra_model").setLevel("DEBUG" if debug else "INFO")
+
+    try:
+        run_aggregate(
+            list(partial_paths),
+            output_path,
+            output_filename,
+            embeddings_path,
+            qa_report=qa_report,
+            metrics_out=metrics_out,
+            n_jobs=jobs,
+        )
         sys.exit(0)
 
     except ExtraModelError as e:
@@ -73,3 +288,69 @@ def entrypoint_setup(output_path: Path) -> None:
     except ExtraModelError as e:
         logger.error(e)
         sys.exit(1)
+
+
+@click.command()
+@click.option(
+    "-ep", "--embeddings-path", type=Path, default=EMBEDDINGS_PATH, show_default=True
+)
+@click.option("--host", default=DEFAULT_HOST, show_default=True)
+@click.option("--port", type=int, default=DEFAULT_PORT, show_default=True)
+@click.option(
+    "--socket",
+    type=Path,
+    default=None,
+    help="Listen on this Unix socket instead of HOST and PORT",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=1,
+    show_default=True,
+    help="Number of requests to run at the same time",
+)
+@click.option(
+    "--queue-size",
+    type=int,
+    default=8,
+    show_default=True,
+    help="Number of requests that may wait for a worker, further requests get a 503",
+)
+@click.option("--debug", is_flag=True, help="Enable debug logging")
+def entrypoint_serve(
+    embeddings_path: Path,
+    host: str,
+    port: int,
+    socket: Optional[Path] = None,
+    workers: int = 1,
+    queue_size: int = 8,
+    debug: bool = False,
+) -> None:
+    """Serve predictions over HTTP, loading the embeddings, spaCy and WordNet once.
+
+    POST a JSON list of comments with keys `CommentId` and `Comments` to `/predict`, or to `/score` to label them
+    with the topic model fitted by `ExtraModel.train`. GET `/metrics` for request counts, latencies and stage
+    timings, and `/health` to check that the server is up.
+
+    EMBEDDINGS_PATH (option) is the path where the extra model will load the embeddings from.
+    defaults to `/embeddings`.
+    """
+    logging.basicConfig(format="  %(message)s")
+    logging.getLogger("extra_model").setLevel("DEBUG" if debug else "INFO")
+
+    try:
+        extra_model = ExtraModel(models_folder=embeddings_path)
+        extra_model.load_from_files()
+        serve(
+            extra_model,
+            host=host,
+            port=port,
+            socket=None if socket is None else str(socket),
+            workers=workers,
+            queue_size=queue_size,
+        )
+        sys.exit(0)
+
+    except ExtraModelError as e:
+        logger.exception(e) if debug else logger.error(e)
+        sys.exit(1)
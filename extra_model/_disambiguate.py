@@ -5,13 +5,25 @@ import math
 
 import numpy as np
 from nltk import tokenize
-from nltk.corpus import wordnet as wn
 from scipy.spatial import distance
 from sklearn.cluster import KMeans
 from sklearn.metrics import silhouette_score
 
+from extra_model._errors import ExtraModelError
+from extra_model._metrics import count
+from extra_model._progress import track
+from extra_model._wordnet import wordnet as wn
+
 logger = logging.getLogger(__name__)
 
+# "context": disambiguate with artificial contexts from k-means clusters of the aspects (default)
+# "similarity": disambiguate with the embedding of the aspect itself, skipping the clustering
+# "first_sense": always take the first (i.e. most common) wordnet sense
+DISAMBIGUATION_METHODS = ("context", "similarity", "first_sense")
+
+# fewest aspects with an embedding that :func:`best_cluster` can cluster
+MIN_CLUSTER_ASPECTS = 3
+
 
 def vectorize_aspects(aspect_counts, vectorizer):
     """Turn the aspect map into a a vector of nouns and their vector representations, which also filters aspects without embedding.
@@ -47,15 +59,19 @@ def best_cluster(aspect_vectors):
     safety_margin = 0.6
 
     silhouette_score_dict = {}
-    for cluster_count in range(2, min(max_cluster, len(aspect_vectors)), step_cluster):
+    cluster_counts = range(2, min(max_cluster, len(aspect_vectors)), step_cluster)
+    progress = track("disambiguation", len(cluster_counts))
+    for cluster_count in cluster_counts:
         kmeans_clustering = KMeans(n_clusters=cluster_count, random_state=1)
         kmeans_clustering.fit(aspect_vectors)
+        count("kmeans.fits")
         silhouette_score_dict[cluster_count] = silhouette_score(
             aspect_vectors, kmeans_clustering.labels_, metric="euclidean"
         )
         logger.debug(
             "{0:d} : {1:f}".format(cluster_count, silhouette_score_dict[cluster_count])
         )
+        progress.update(len(silhouette_score_dict))
     best = sorted(
         silhouette_score_dict.items(), key=lambda item: item[1], reverse=True
     )[0][0]
@@ -72,6 +88,93 @@ def best_cluster(aspect_vectors):
         return best
 
 
+class ContextModel:
+    """K-means clusters of the aspects, whose other members serve as the artificial context of an aspect.
+
+    Aspects that were not clustered, e.g. those first seen by a later incremental prediction, join the cluster
+    with the nearest center, so that the contexts of the clustered aspects stay unchanged.
+    """
+
+    def __init__(self, labels, centers):
+        """Index the members of each cluster.
+
+        :param labels: the cluster of each clustered aspect
+        :type labels: {str:int}
+        :param centers: the cluster centers, one row per cluster
+        :type centers: :class:`numpy.array`
+        """
+        self.labels = labels
+        self.centers = np.asarray(centers)
+        self.members = {}
+        for aspect, label in labels.items():
+            self.members.setdefault(label, []).append(aspect)
+        logger.debug(self.members)
+
+    @classmethod
+    def fit(cls, aspects, aspect_vectors):
+        """Cluster aspects with the number of clusters found by :func:`best_cluster`.
+
+        :param aspects: list of words to cluster
+        :type aspects: [str]
+        :param aspect_vectors:  list of embeddings corresponding to the the aspects
+        :type aspect_vectors: [:class:`numpy.array`]
+        :return: the clusters
+        :rtype: :class:`ContextModel`
+        :raises ExtraModelError: if there are fewer than `MIN_CLUSTER_ASPECTS` aspects
+        """
+        if len(aspect_vectors) < MIN_CLUSTER_ASPECTS:
+            raise ExtraModelError(
+                f'The "context" disambiguation needs at least {MIN_CLUSTER_ASPECTS} aspects with an embedding '
+                f"to cluster, got {len(aspect_vectors)}, add more comments or use another disambiguation method"
+            )
+        # find the best cluster-size and run k-means clustering, resulting
+        # clusters will serve as pseudo-contexts for disambiguation
+        best = best_cluster(aspect_vectors)
+        kmeans_clustering = KMeans(n_clusters=best, random_state=1)
+        kmeans_clustering.fit(aspect_vectors)
+        count("kmeans.fits")
+        return cls(
+            dict(zip(aspects, kmeans_clustering.labels_.tolist())),
+            kmeans_clustering.cluster_centers_,
+        )
+
+    def label(self, aspect, aspect_vector):
+        """Find the cluster of an aspect.
+
+        :param aspect: the aspect
+        :type aspect: str
+        :param aspect_vector: the embedding of the aspect, only used if it wasn't clustered
+        :type aspect_vector: :class:`numpy.array`
+        :return: the cluster the aspect was assigned to, or the one with the nearest center
+        :rtype: int
+        """
+        if aspect in self.labels:
+            return self.labels[aspect]
+        return int(np.argmin(np.linalg.norm(self.centers - aspect_vector, axis=1)))
+
+    def contexts(self, aspects, aspect_vectors, vectorizer):
+        """Generate the context of each aspect, i.e. the normalized sum of the embeddings of the other members of its cluster.
+
+        :param aspects: list of words for which contexts are generated
+        :type aspects: [str]
+        :param aspect_vectors:  list of embeddings corresponding to the the aspects
+        :type aspect_vectors: [:class:`numpy.array`]
+        :param vectorizer: the provider of word-embeddings for context generation
+        :type vectorizer: :class:`extra_model._vectorizer.Vectorizer`
+        :return: the synthetic context embedding for each of the input aspects
+        :rtype: [:class:`numpy.array`]
+        """
+        contexts = []
+        for aspect, aspect_vector in zip(aspects, aspect_vectors):
+            members = self.members.get(self.label(aspect, aspect_vector), [])
+            context = np.sum(
+                [vectorizer.get_vector(noun) for noun in members if noun != aspect],
+                axis=0,
+            )
+            contexts.append(np.divide(context, np.linalg.norm(context)))
+        return contexts
+
+
 def cluster(aspects, aspect_vectors, vectorizer):
     """Cluster aspects based on the distance of their vector representations.
 
@@ -87,60 +190,69 @@ def cluster(aspects, aspect_vectors, vectorizer):
     :return: the synthetic context embedding for each of the input aspects
     :rtype: [:class:`numpy.array`]
     """
-    # find the best cluster-size and run k-means clustering, resulting
-    # clusters will serve as pseudo-contexts for disambiguation
-    best = best_cluster(aspect_vectors)
-    kmeans_clustering = KMeans(n_clusters=best, random_state=1)
-    kmeans_clustering.fit(aspect_vectors)
-    label_map = {}
-    # map the cluster results on to the indices of the list of aspects
-    for label, aspect in zip(kmeans_clustering.labels_, aspects):
-        if label not in label_map:
-            label_map[label] = [aspect]
-        else:
-            label_map[label].append(aspect)
-    logger.debug(label_map)
-
-    # generate the context for each aspect, i.e. the average of the embeddings
-    # of the word in the cluster, excluding the aspect in question
-    contexts = []
-    for label, aspect in zip(kmeans_clustering.labels_, aspects):
-        contexts.append(
-            [vectorizer.get_vector(noun) for noun in label_map[label] if noun != aspect]
-        )
-    contexts = [np.sum(context, axis=0) for context in contexts]
-    contexts = [np.divide(context, np.linalg.norm(context)) for context in contexts]
+    return ContextModel.fit(aspects, aspect_vectors).contexts(
+        aspects, aspect_vectors, vectorizer
+    )
+
 
-    return contexts
+def find_synsets(aspect):
+    """Find the candidate wordnet nouns for an aspect.
+
+    :param aspect: the aspect to look up
+    :type aspect: str
+    :return: all noun synsets of the aspect, or of its constituents if the aspect is an unknown compound
+    :rtype: [:class:`extra_model._wordnet.Synset`]
+    """
+    synset = wn.synsets(aspect.lower(), pos=wn.NOUN)
+    if len(synset) == 0:
+        # wordnet is missing some compounds, if that happens, we try at to
+        # sea if we can have matches for constituents
+        for subword in aspect.split():
+            synset.extend(wn.synsets(subword.lower(), pos=wn.NOUN))
+    if len(synset) == 0:
+        logger.debug("No wordnet defintion found for: %s" % aspect)
+    return synset
 
 
-def match(aspect_counts, vectorizer):  # noqa: C901
+def match(  # noqa: C901
+    aspect_counts, vectorizer, method="context", context_model=None
+):
     """Match a word to a specific wordnet entry, using the vector similarity of the aspects context and the synonym gloss.
 
     :param aspect_counts: Counter object of aspect->number of occurrence
     :type aspect_counts: :class:`collections.Counter`
     :param vectorizer:  the provider of word-embeddings for context generation
     :type vectorizer: :class:`extra_model._vectorizer.Vectorizer`
+    :param method: one of `DISAMBIGUATION_METHODS`. "context" uses the clustering-based contexts,
+        "similarity" compares the glosses with the aspect embedding itself, "first_sense" takes the most common
+        sense. The latter two skip the (expensive) clustering.
+    :type method: str
+    :param context_model: clusters to take the contexts from for the "context" method, clustered here if None
+    :type context_model: :class:`ContextModel`
     :return list of aspects that have an embedding and best matching wordnet synonym for each aspect (can be None if no match is found)
-    :rtype: ([str],[:class:`nltk.wornet.Synset`])
+    :rtype: ([str],[:class:`extra_model._wordnet.Synset`])
     """
+    if method not in DISAMBIGUATION_METHODS:
+        raise ExtraModelError(
+            f"disambiguation method has to be one of {DISAMBIGUATION_METHODS}, got {method}"
+        )
     # prepare vector representations for clustering
     aspects, aspect_vectors = vectorize_aspects(aspect_counts, vectorizer)
-    # find clusters of vectors based on the embedding similarity
-    contexts = cluster(aspects, aspect_vectors, vectorizer)
-
-    synsets = []
-    for aspect in aspects:
-        # find synsets for each aspect
-        synset = wn.synsets(aspect.lower(), pos=wn.NOUN)
-        if len(synset) == 0:
-            # wordnet is missing some compounds, if that happens, we try at to
-            # sea if we can have matches for constituents
-            for subword in aspect.split():
-                synset.extend(wn.synsets(subword.lower(), pos=wn.NOUN))
-        if len(synset) == 0:
-            logger.debug("No wordnet defintion found for: %s" % aspect)
-        synsets.append(synset)
+
+    # find synsets for each aspect
+    synsets = [find_synsets(aspect) for aspect in aspects]
+    if method == "first_sense":
+        return aspects, [synset[0] if len(synset) > 0 else None for synset in synsets]
+
+    if method == "context":
+        if context_model is None:
+            # find clusters of vectors based on the embedding similarity
+            contexts = cluster(aspects, aspect_vectors, vectorizer)
+        else:
+            contexts = context_model.contexts(aspects, aspect_vectors, vectorizer)
+    else:
+        # the aspect itself serves as its context
+        contexts = aspect_vectors
 
     # get vector embeddings for each word sense by doing a bag-of-word
     # embedding for the dictionary difeinition
@@ -3,8 +3,32 @@ import logging
 import langdetect
 import pandas as pd
 
+from extra_model._progress import track
+
 logger = logging.getLogger(__name__)
 
+# number of comments between two progress reports of the language detection
+LANGUAGE_CHUNK = 1000
+
+
+def detect_languages(comments):
+    """Detect the language of each comment, reporting progress after each chunk of comments.
+
+    :param comments: the comments
+    :type comments: [str]
+    :return: the language codes, e.g. `en`
+    :rtype: [str]
+    """
+    progress = track("filter", len(comments))
+    languages = []
+    for start in range(0, len(comments), LANGUAGE_CHUNK):
+        languages.extend(
+            langdetect.detect(comment)
+            for comment in comments[start : start + LANGUAGE_CHUNK]
+        )
+        progress.update(len(languages))
+    return languages
+
 
 def filter(dataframe):
     """Filter a dataframe for language and text length.
@@ -37,9 +61,7 @@ def filter(dataframe):
 
     # detect language and filter english. If it's 'unknown' it's probably
     # still english
-    dataframe.loc[:, "lang"] = dataframe.Comments.apply(
-        lambda com: langdetect.detect(com)
-    )
+    dataframe.loc[:, "lang"] = detect_languages(dataframe.Comments.tolist())
     dataframe = dataframe[(dataframe["lang"] == "en")]
 
     # drop auxiliary columns again, re-index
@@ -0,0 +1,392 @@
+"""Integer-indexed hypernym graph used to aggregate aspects into topics.
+
+Aspects ('seeds') and wordnet synsets get integer ids in order of first appearance.
+Edges point from hyponym to hypernym and are stored once, in compressed sparse row
+(CSR) layout sorted by source node, with similarity and distance held in parallel
+float arrays. A second CSR index over the same edges gives the predecessors of each
+node. Node and edge order follow insertion order, which is the order `networkx`
+would use for the equivalent `DiGraph`.
+"""
+
+import heapq
+
+import numpy as np
+
+
+def _indptr(keys, size):
+    """Build CSR offsets for a sorted array of row keys.
+
+    :param keys: sorted row index of every entry
+    :type keys: :class:`numpy.array`
+    :param size: number of rows
+    :type size: int
+    :return: offsets of each row, of length `size + 1`
+    :rtype: :class:`numpy.array`
+    """
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=indptr[1:])
+    return indptr
+
+
+def _root(parents, node):
+    """Find the representative of a node in a union-find forest, halving the path on the way.
+
+    :param parents: parent of every node in the union-find forest
+    :type parents: [int]
+    :param node: the node to look up
+    :type node: int
+    :return: the representative of the set containing the node
+    :rtype: int
+    """
+    while parents[node] != node:
+        parents[node] = parents[parents[node]]
+        node = parents[node]
+    return node
+
+
+def _spanning_edges(pairs, size):
+    """Run Kruskal's algorithm on pre-sorted edges.
+
+    :param pairs: the two end nodes of every edge, sorted by ascending weight
+    :type pairs: [(int, int)]
+    :param size: number of nodes
+    :type size: int
+    :return: for every edge, whether it belongs to the minimum spanning forest
+    :rtype: [bool]
+    """
+    parents = list(range(size))
+    selected = []
+    for left, right in pairs:
+        left, right = _root(parents, left), _root(parents, right)
+        selected.append(left != right)
+        parents[left] = right
+    return selected
+
+
+class HypernymGraph:
+    """Directed acyclic graph of aspects and their wordnet hypernyms in CSR layout."""
+
+    def __init__(self, nodes, seed, sources, targets, similarity=None, distance=None):
+        """Build the graph from node and edge lists.
+
+        :param nodes: node names, their position is the node id
+        :type nodes: [str]
+        :param seed: for each node, whether it is an aspect from the texts (True) or a wordnet synset (False)
+        :type seed: [bool]
+        :param sources: id of the hyponym of each edge
+        :type sources: [int]
+        :param targets: id of the hypernym of each edge
+        :type targets: [int]
+        :param similarity: similarity of the two ends of each edge, defaults to 1
+        :type similarity: [float]
+        :param distance: distance of the two ends of each edge, defaults to 1
+        :type distance: [float]
+        """
+        self.nodes = list(nodes)
+        self.node_ids = {node: i for i, node in enumerate(self.nodes)}
+        self.seed = np.asarray(seed, dtype=bool)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        if similarity is None:
+            similarity = np.ones(len(sources))
+        if distance is None:
+            distance = np.ones(len(sources))
+
+        # edge ids are positions in the successor CSR, the sort is stable so
+        # that the edges of a node keep their insertion order
+        order = np.argsort(sources, kind="stable")
+        self.sources = sources[order]
+        self.targets = targets[order]
+        self.similarity = np.asarray(similarity, dtype=float)[order]
+        self.distance = np.asarray(distance, dtype=float)[order]
+        self.successor_indptr = _indptr(self.sources, len(self.nodes))
+
+        # edge ids in insertion order, needed to keep the order of predecessors
+        self.insertion_order = np.argsort(order)
+        self.predecessor_edges = self.insertion_order[
+            np.argsort(targets, kind="stable")
+        ]
+        self.predecessor_indptr = _indptr(
+            self.targets[self.predecessor_edges], len(self.nodes)
+        )
+        self._neighbour_index = None
+        self._reachable = None
+
+    @classmethod
+    def from_chains(cls, chains):
+        """Build the graph as the union of linear hypernym chains.
+
+        :param chains: pairs of an aspect and the names of the synsets in one of its hypernym paths, ordered
+            from the root of wordnet down to the synset matched to the aspect
+        :type chains: [(str, [str])]
+        :return: the graph, with aspects marked as seeds
+        :rtype: :class:`HypernymGraph`
+        """
+        node_ids = {}
+        seed = []
+        edges = {}
+
+        def add_node(node, is_seed):
+            if node not in node_ids:
+                node_ids[node] = len(node_ids)
+                seed.append(is_seed)
+            else:
+                # the flag of the latest chain wins, like in `networkx.compose_all`
+                seed[node_ids[node]] = is_seed
+            return node_ids[node]
+
+        for aspect, hypernyms in chains:
+            previous = add_node(aspect, True)
+            for hypernym in reversed(hypernyms):
+                current = add_node(hypernym, False)
+                edges.setdefault((previous, current), len(edges))
+                previous = current
+
+        sources, targets = zip(*edges) if edges else ((), ())
+        return cls(list(node_ids), seed, sources, targets)
+
+    @property
+    def node_count(self):
+        """Return the number of nodes."""
+        return len(self.nodes)
+
+    @property
+    def edge_count(self):
+        """Return the number of edges."""
+        return len(self.sources)
+
+    def successor_edges(self, node):
+        """Return the ids of the edges from a node to its hypernyms."""
+        return np.arange(self.successor_indptr[node], self.successor_indptr[node + 1])
+
+    def successors(self, node):
+        """Return the ids of the hypernyms of a node."""
+        return self.targets[
+            self.successor_indptr[node] : self.successor_indptr[node + 1]
+        ]
+
+    def incoming_edges(self, node):
+        """Return the ids of the edges from the hyponyms of a node to the node."""
+        return self.predecessor_edges[
+            self.predecessor_indptr[node] : self.predecessor_indptr[node + 1]
+        ]
+
+    def predecessors(self, node):
+        """Return the ids of the hyponyms of a node."""
+        return self.sources[self.incoming_edges(node)]
+
+    def topological_order(self):
+        """Order the nodes so that every node comes before all of its hypernyms.
+
+        :return: the node ids in topological order
+        :rtype: [int]
+        """
+        indptr, targets = self.successor_indptr.tolist(), self.targets.tolist()
+        in_degree = np.bincount(self.targets, minlength=self.node_count).tolist()
+        stack = [node for node in range(self.node_count) if in_degree[node] == 0]
+        order = []
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            for target in targets[indptr[node] : indptr[node + 1]]:
+                in_degree[target] -= 1
+                if in_degree[target] == 0:
+                    stack.append(target)
+        if len(order) != self.node_count:
+            raise ValueError("The hypernym graph contains a cycle")
+        return order
+
+    def reachable(self):
+        """Index the nodes reachable from every node by following the edges (i.e. all of their hypernyms).
+
+        The index is built once, from the root of wordnet down, so that reachability checks are set lookups.
+
+        :return: for every node id, the ids of the reachable nodes, excluding the node itself
+        :rtype: [frozenset]
+        """
+        if self._reachable is None:
+            indptr, targets = self.successor_indptr.tolist(), self.targets.tolist()
+            reachable = [frozenset()] * self.node_count
+            for node in reversed(self.topological_order()):
+                hypernyms = targets[indptr[node] : indptr[node + 1]]
+                if len(hypernyms) == 1:
+                    reachable[node] = reachable[hypernyms[0]] | {hypernyms[0]}
+                elif hypernyms:
+                    reachable[node] = frozenset(hypernyms).union(
+                        *(reachable[target] for target in hypernyms)
+                    )
+            self._reachable = reachable
+        return self._reachable
+
+    def has_path(self, source, target):
+        """Check if `target` can be reached from `source` by following the edges.
+
+        :param source: id of the start node
+        :type source: int
+        :param target: id of the end node
+        :type target: int
+        :return: is `target` a (possibly indirect) hypernym of `source`?
+        :rtype: bool
+        """
+        return target in self.reachable()[source]
+
+    def neighbours(self):
+        """Return the undirected adjacency of the graph in CSR layout.
+
+        :return: offsets per node, and the neighbour and the edge id of every entry
+        :rtype: ([int], [int], [int])
+        """
+        if self._neighbour_index is None:
+            ends = np.concatenate([self.sources, self.targets])
+            order = np.argsort(ends, kind="stable")
+            edges = np.concatenate([np.arange(self.edge_count)] * 2)[order]
+            others = np.concatenate([self.targets, self.sources])[order]
+            self._neighbour_index = (
+                _indptr(ends[order], self.node_count).tolist(),
+                others.tolist(),
+                edges.tolist(),
+            )
+        return self._neighbour_index
+
+    def steiner_tree(self, terminals):
+        """Find a tree of small total `distance` connecting the terminal nodes, ignoring edge directions.
+
+        Nodes that are not terminals and hang off the graph by a single edge are pruned first. Hypernym
+        graphs are close to trees, so what is left often has no cycles and is the exact Steiner tree. Only
+        if multiple inheritance leaves cycles, Mehlhorn's 2-approximation is run on the remaining graph.
+        Both steps are near-linear in the size of the graph.
+
+        :param terminals: for each node, whether it has to be part of the tree
+        :type terminals: :class:`numpy.array`
+        :return: the ids of the edges in the tree
+        :rtype: :class:`numpy.array`
+        """
+        terminals = np.asarray(terminals, dtype=bool)
+        edges = self._prune_leaves(np.arange(self.edge_count), terminals)
+        pairs = zip(self.sources[edges].tolist(), self.targets[edges].tolist())
+        if all(_spanning_edges(pairs, self.node_count)):
+            return edges
+        edges = self._mehlhorn(edges, terminals)
+        # the union of the shortest paths may itself contain cycles
+        order = edges[np.argsort(self.distance[edges], kind="stable")]
+        pairs = zip(self.sources[order].tolist(), self.targets[order].tolist())
+        spanning = np.array(_spanning_edges(pairs, self.node_count), dtype=bool)
+        return np.sort(self._prune_leaves(order[spanning], terminals))
+
+    def _prune_leaves(self, edges, terminals):
+        """Repeatedly remove edges to nodes of degree one that are not terminals.
+
+        :param edges: ids of the edges to consider
+        :type edges: :class:`numpy.array`
+        :param terminals: for each node, whether it is a terminal
+        :type terminals: :class:`numpy.array`
+        :return: ids of the remaining edges
+        :rtype: :class:`numpy.array`
+        """
+        alive = np.zeros(self.edge_count, dtype=bool)
+        alive[edges] = True
+        degree = np.bincount(
+            self.sources[alive], minlength=self.node_count
+        ) + np.bincount(self.targets[alive], minlength=self.node_count)
+        stack = np.flatnonzero((degree == 1) & ~terminals).tolist()
+        degree = degree.tolist()
+        indptr, others, edge_ids = self.neighbours()
+        while stack:
+            node = stack.pop()
+            for i in range(indptr[node], indptr[node + 1]):
+                if alive[edge_ids[i]]:
+                    alive[edge_ids[i]] = False
+                    degree[others[i]] -= 1
+                    if degree[others[i]] == 1 and not terminals[others[i]]:
+                        stack.append(others[i])
+        return np.flatnonzero(alive)
+
+    def _mehlhorn(self, edges, terminals):  # noqa: C901
+        """Connect the terminals along shortest paths between neighbouring Voronoi regions.
+
+        :param edges: ids of the edges to consider
+        :type edges: :class:`numpy.array`
+        :param terminals: for each node, whether it is a terminal
+        :type terminals: :class:`numpy.array`
+        :return: ids of the edges on the selected shortest paths
+        :rtype: :class:`numpy.array`
+        """
+        alive = np.zeros(self.edge_count, dtype=bool)
+        alive[edges] = True
+        alive = alive.tolist()
+        weights = self.distance.tolist()
+        sources, targets = self.sources.tolist(), self.targets.tolist()
+        indptr, others, edge_ids = self.neighbours()
+
+        # multi-source dijkstra: distance to, and id of, the closest terminal
+        distances = [np.inf] * self.node_count
+        closest = [-1] * self.node_count
+        via = [-1] * self.node_count
+        heap = [(0.0, node) for node in np.flatnonzero(terminals).tolist()]
+        for _, node in heap:
+            distances[node] = 0.0
+            closest[node] = node
+        while heap:
+            current, node = heapq.heappop(heap)
+            if current > distances[node]:
+                continue
+            for i in range(indptr[node], indptr[node + 1]):
+                if not alive[edge_ids[i]]:
+                    continue
+                candidate = current + weights[edge_ids[i]]
+                if candidate < distances[others[i]]:
+                    distances[others[i]] = candidate
+                    closest[others[i]] = closest[node]
+                    via[others[i]] = edge_ids[i]
+                    heapq.heappush(heap, (candidate, others[i]))
+
+        # shortest bridge between each pair of neighbouring regions
+        bridges = {}
+        for edge in edges.tolist():
+            source, target = sources[edge], targets[edge]
+            pair = (closest[source], closest[target])
+            if pair[0] == pair[1] or -1 in pair:
+                continue
+            pair = (min(pair), max(pair))
+            length = distances[source] + weights[edge] + distances[target]
+            if pair not in bridges or length < bridges[pair][0]:
+                bridges[pair] = (length, edge)
+
+        # minimum spanning tree of the regions, expanded back into paths
+        ordered = sorted(bridges.items(), key=lambda item: item[1])
+        selected = _spanning_edges([pair for pair, _ in ordered], self.node_count)
+        tree = set()
+        for (_, (_, edge)), keep in zip(ordered, selected):
+            if not keep:
+                continue
+            tree.add(edge)
+            for node in (sources[edge], targets[edge]):
+                # walk back to the terminal of the region
+                while via[node] != -1:
+                    tree.add(via[node])
+                    node = sources[via[node]] + targets[via[node]] - node
+        return np.array(sorted(tree), dtype=np.int64)
+
+    def subgraph(self, keep):
+        """Return the subgraph induced by a set of nodes.
+
+        :param keep: for each node, whether to keep it
+        :type keep: :class:`numpy.array`
+        :return: the subgraph with re-numbered nodes, preserving node and edge order
+        :rtype: :class:`HypernymGraph`
+        """
+        keep = np.asarray(keep, dtype=bool)
+        new_ids = np.cumsum(keep) - 1
+        # re-add the edges in their original insertion order
+        edges = self.insertion_order[
+            keep[self.sources[self.insertion_order]]
+            & keep[self.targets[self.insertion_order]]
+        ]
+        return HypernymGraph(
+            [node for node, kept in zip(self.nodes, keep) if kept],
+            self.seed[keep],
+            new_ids[self.sources[edges]],
+            new_ids[self.targets[edges]],
+            self.similarity[edges],
+            self.distance[edges],
+        )
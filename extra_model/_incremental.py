@@ -0,0 +1,296 @@
+"""Fold new comments into the state of previous predictions, rather than predicting on all comments again.
+
+The state keeps the filtered comments and their aspects, the `wordnet` match of every aspect seen so far, the
+aspect clusters of the "context" disambiguation, and the edge distances and node importances of the topic graph.
+Folding in new comments only filters and parses those, and only matches aspects that weren't seen before. The
+topic graph is rebuilt from the hypernym chains of all matches, reusing the stored edge distances, and its ranking
+starts from the stored importances.
+
+Compared to a prediction on all comments at once, the result differs in two ways:
+
+* topic importances differ by about the `tolerance` of the ranking, since the iteration starts from another
+  vector; the topics and their terms are the same unless two importances are that close.
+* with the "context" disambiguation, the aspects are clustered by the first prediction of a state, and new aspects
+  join the cluster with the nearest center. A full prediction would cluster all aspects again, which can change the
+  contexts and therefore the matches of any aspect. Once the number of aspects with an embedding has grown by a
+  factor of `REFIT_GROWTH` since the last clustering, all aspects are clustered and matched again, as by a full
+  prediction. The "similarity" and "first_sense" methods match every aspect on its own, so their matches are the same.
+
+Comments are told apart by their `source_guid`, comments already in the state are left out.
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from extra_model._disambiguate import ContextModel, vectorize_aspects
+from extra_model._errors import ExtraModelError
+from extra_model._topics import GraphCache, match_aspects
+
+try:
+    import pyarrow
+except ImportError:  # optional dependency, see the `checkpoints` extra
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+# version of the layout of the state folder
+FORMAT = "1"
+PARAMETERS_FILENAME = "parameters.json"
+# the "context" clusters are fitted again once there are this many times more aspects with an embedding
+REFIT_GROWTH = 1.5
+
+
+def _append(frame, new, ignore_index):
+    """Append rows to a frame, without changing the column types if either of them is empty.
+
+    :param frame: the rows so far, None if there are none
+    :type frame: :class:`pandas.DataFrame`
+    :param new: the rows to append
+    :type new: :class:`pandas.DataFrame`
+    :param ignore_index: whether to number the rows of the result from 0 rather than keep their index
+    :type ignore_index: bool
+    :return: all rows
+    :rtype: :class:`pandas.DataFrame`
+    """
+    if frame is None or frame.empty:
+        return new.reset_index(drop=True) if ignore_index else new
+    if new.empty:
+        return frame
+    return pd.concat([frame, new], ignore_index=ignore_index)
+
+
+class RunState:
+    """Everything an incremental prediction needs from the previous ones."""
+
+    def __init__(self, parameters):
+        """Start without any comments.
+
+        :param parameters: the JSON serializable parameters that all predictions of the state have to share
+        :type parameters: dict
+        """
+        self.parameters = parameters
+        self.texts = None
+        self.aspects = None
+        self.matches = None
+        self.context_model = None
+        self.cache = GraphCache()
+
+    @property
+    def text_count(self):
+        """Return the number of comments kept so far, the index of the next new comment."""
+        return 0 if self.texts is None else len(self.texts)
+
+    def new_texts(self, texts):
+        """Leave out the comments that are already in the state, and index the others from :attr:`text_count` on.
+
+        :param texts: the filtered comments, with a column `source_guid`
+        :type texts: :class:`pandas.DataFrame`
+        :return: the comments that aren't in the state yet
+        :rtype: :class:`pandas.DataFrame`
+        """
+        if self.texts is not None:
+            known = texts["source_guid"].isin(self.texts["source_guid"])
+            if known.any():
+                logger.warning(
+                    f"Leaving out {known.sum()} comments that are already in the state"
+                )
+                texts = texts[~known]
+        texts = texts.copy()
+        texts.index = pd.RangeIndex(self.text_count, self.text_count + len(texts))
+        return texts
+
+    def add(self, texts, aspects):
+        """Add filtered comments and their aspects.
+
+        :param texts: the new comments, indexed from :attr:`text_count` on, see :meth:`new_texts`
+        :type texts: :class:`pandas.DataFrame`
+        :param aspects: the aspects of the new comments, see :func:`extra_model._aspects.generate_aspects`
+        :type aspects: :class:`pandas.DataFrame`
+        :return: the aspects that weren't seen before
+        :rtype: :class:`pandas.DataFrame`
+        :raises ExtraModelError: if some of the comments are already in the state
+        """
+        if (
+            self.texts is not None
+            and texts["source_guid"].isin(self.texts["source_guid"]).any()
+        ):
+            raise ExtraModelError(
+                "Some of the comments are already in the state, leave them out with `new_texts`"
+            )
+        known = set() if self.aspects is None else set(self.aspects["aspect"])
+        unseen = aspects[~aspects["aspect"].isin(known)]
+        self.texts = _append(self.texts, texts, ignore_index=False)
+        self.aspects = _append(self.aspects, aspects, ignore_index=True)
+        return unseen
+
+    def match(self, unseen, vectors, disambiguation):
+        """Match the aspects that weren't seen before to `wordnet` nouns, and merge them with the known matches.
+
+        :param unseen: the aspects to match, as returned by :meth:`add`
+        :type unseen: :class:`pandas.DataFrame`
+        :param vectors: provides embeddings for context clustering and wordsense disammbguation
+        :type vectors: :class:`extra_model._vectorizer.Vectorizer`
+        :param disambiguation: word-sense disambiguation method, see :func:`extra_model._disambiguate.match`
+        :type disambiguation: str
+        :return: the matches of all aspects, in the order of :func:`extra_model._topics.match_aspects`
+        :rtype: :class:`pandas.DataFrame`
+        :raises ExtraModelError: if the "context" disambiguation has too few aspects to cluster
+        """
+        if not unseen.empty:
+            if disambiguation == "context":
+                aspects, aspect_vectors = vectorize_aspects(
+                    Counter(self.aspects["aspect"]), vectors
+                )
+                if self.context_model is None or len(aspects) >= REFIT_GROWTH * len(
+                    self.context_model.labels
+                ):
+                    if self.context_model is not None:
+                        logger.info(
+                            f"Clustering {len(aspects)} aspects again, "
+                            f"{len(self.context_model.labels)} were clustered before"
+                        )
+                    self.context_model = ContextModel.fit(aspects, aspect_vectors)
+                    # the contexts of all aspects changed, match them again
+                    unseen = self.aspects
+                    self.matches = None
+            self.matches = _append(
+                self.matches,
+                match_aspects(unseen, vectors, disambiguation, self.context_model),
+                ignore_index=True,
+            )
+        # most common first, as if all aspects were matched at once
+        ranks = {
+            aspect: rank
+            for rank, (aspect, _) in enumerate(
+                Counter(self.aspects["aspect"]).most_common()
+            )
+        }
+        order = np.argsort(
+            [ranks[aspect] for aspect in self.matches["aspect"]], kind="stable"
+        )
+        self.matches = self.matches.iloc[order].reset_index(drop=True)
+        return self.matches
+
+    def save(self, folder):
+        """Write the state, replacing the folder only once all files are written.
+
+        :param folder: the folder of the state
+        :type folder: str or :class:`pathlib.Path`
+        """
+        parent = os.path.dirname(os.path.abspath(folder))
+        os.makedirs(parent, exist_ok=True)
+        temporary = tempfile.mkdtemp(dir=parent, suffix=".tmp")
+        try:
+            self._write(temporary)
+            if os.path.isdir(folder):
+                previous = tempfile.mkdtemp(dir=parent, suffix=".old")
+                os.replace(folder, os.path.join(previous, "state"))
+                os.replace(temporary, folder)
+                shutil.rmtree(previous)
+            else:
+                os.replace(temporary, folder)
+        except BaseException:
+            shutil.rmtree(temporary, ignore_errors=True)
+            raise
+
+    def _write(self, folder):
+        """Write all files of the state into an empty folder.
+
+        :param folder: the folder to write to
+        :type folder: str
+        """
+
+        def parquet(name, frame):
+            frame.to_parquet(os.path.join(folder, f"{name}.parquet"), engine="pyarrow")
+
+        with open(os.path.join(folder, PARAMETERS_FILENAME), "w") as f:
+            json.dump({"format": FORMAT, "parameters": self.parameters}, f)
+        parquet("texts", self.texts)
+        parquet("aspects", self.aspects)
+        parquet("matches", self.matches)
+        parquet(
+            "distances",
+            pd.DataFrame(
+                [
+                    (source, target, value)
+                    for (source, target), value in self.cache.distances.items()
+                ],
+                columns=["source", "target", "distance"],
+            ),
+        )
+        parquet(
+            "importance",
+            pd.DataFrame(
+                list(self.cache.importance.items()), columns=["node", "importance"]
+            ),
+        )
+        if self.context_model is not None:
+            parquet(
+                "clusters",
+                pd.DataFrame(
+                    list(self.context_model.labels.items()),
+                    columns=["aspect", "label"],
+                ),
+            )
+            np.save(os.path.join(folder, "centers.npy"), self.context_model.centers)
+
+    @classmethod
+    def load(cls, folder, parameters):
+        """Read the state written by :meth:`save`, or start a new one if there is none.
+
+        :param folder: the folder of the state
+        :type folder: str or :class:`pathlib.Path`
+        :param parameters: the JSON serializable parameters of the prediction
+        :type parameters: dict
+        :return: the state
+        :rtype: :class:`RunState`
+        :raises ExtraModelError: if `pyarrow` is not installed, or if the state was built with other parameters
+        """
+        if pyarrow is None:
+            raise ExtraModelError(
+                "The state of incremental predictions is stored as Parquet and needs `pyarrow`, "
+                "install `extra-model[checkpoints]`"
+            )
+        state = cls(parameters)
+        parameters_file = os.path.join(folder, PARAMETERS_FILENAME)
+        if not os.path.isfile(parameters_file):
+            return state
+        with open(parameters_file) as f:
+            stored = json.load(f)
+        expected = {"format": FORMAT, "parameters": json.loads(json.dumps(parameters))}
+        if stored != expected:
+            raise ExtraModelError(
+                f"The state in {folder} was built with {stored}, not with {expected}, start a new state"
+            )
+
+        def parquet(name):
+            return pd.read_parquet(os.path.join(folder, f"{name}.parquet"))
+
+        state.texts = parquet("texts")
+        state.aspects = parquet("aspects")
+        state.matches = parquet("matches")
+        distances = parquet("distances")
+        importance = parquet("importance")
+        state.cache = GraphCache(
+            dict(
+                zip(
+                    zip(distances["source"], distances["target"]),
+                    distances["distance"],
+                )
+            ),
+            dict(zip(importance["node"], importance["importance"])),
+        )
+        if os.path.isfile(os.path.join(folder, "clusters.parquet")):
+            clusters = parquet("clusters")
+            state.context_model = ContextModel(
+                dict(zip(clusters["aspect"], clusters["label"].tolist())),
+                np.load(os.path.join(folder, "centers.npy")),
+            )
+        return state
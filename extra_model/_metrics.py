@@ -0,0 +1,164 @@
+"""Record wall time, CPU time, memory and row counts of the stages of a prediction, and counters of hot paths.
+
+Recording is switched on by :func:`collect` for the current context only. Without it, :func:`stage`,
+:func:`count` and :func:`note` do nothing but look up a context variable, so the instrumented code paths stay cheap.
+Counters of work done in the worker processes of :func:`extra_model._parallel.parallel_map` are not included.
+"""
+
+import contextlib
+import contextvars
+import sys
+import time
+import tracemalloc
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore
+
+_current: contextvars.ContextVar[Optional["Metrics"]] = contextvars.ContextVar(
+    "extra_model_metrics", default=None
+)
+
+
+def _peak_rss():
+    """Return the peak resident set size of the process so far.
+
+    :return: the peak resident set size in bytes, None if the platform doesn't report it
+    :rtype: int
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Metrics:
+    """Measurements of the stages of one prediction and counters of hot paths."""
+
+    def __init__(self):
+        """Start without any stages or counts."""
+        self.stages = []
+        self.counters = {}
+        # records of the stages running now, innermost last
+        self._running = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Measure a stage, the number of rows it produced can be set as `rows` of the yielded record.
+
+        The peak resident set size is that of the process up to the end of the stage. The peak of the memory
+        traced by :mod:`tracemalloc` within the stage is only recorded if tracing was started before,
+        e.g. with `PYTHONTRACEMALLOC=1`, as tracing slows down all allocations.
+
+        :param name: the name of the stage
+        :type name: str
+        :return: the record of the stage
+        :rtype: dict
+        """
+        record = {"name": name, "rows": None}
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        self._running.append(record)
+        try:
+            yield record
+        finally:
+            self._running.pop()
+            record["wall_time"] = time.perf_counter() - wall
+            record["cpu_time"] = time.process_time() - cpu
+            record["peak_rss"] = _peak_rss()
+            if tracing:
+                record["peak_traced"] = tracemalloc.get_traced_memory()[1]
+            self.stages.append(record)
+
+    def count(self, name, n=1):
+        """Add to a counter.
+
+        :param name: the name of the counter
+        :type name: str
+        :param n: the amount to add
+        :type n: int
+        """
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def note(self, name, value):
+        """Set a value in the record of the innermost stage running now, if any.
+
+        :param name: the name of the value
+        :type name: str
+        :param value: the JSON serializable value
+        :type value: object
+        """
+        if self._running:
+            self._running[-1][name] = value
+
+    def to_dict(self):
+        """Return the measurements as a JSON serializable dictionary.
+
+        :return: the list of `stages` in the order they ran and the `counters`
+        :rtype: dict
+        """
+        return {
+            "stages": [dict(record) for record in self.stages],
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+
+@contextlib.contextmanager
+def collect():
+    """Record the stages and counters of the code run in this context.
+
+    :return: the metrics being recorded
+    :rtype: :class:`Metrics`
+    """
+    metrics = Metrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def stage(name):
+    """Measure a stage if metrics are being collected, see :meth:`Metrics.stage`.
+
+    :param name: the name of the stage
+    :type name: str
+    :return: a context manager yielding the record of the stage
+    :rtype: contextlib.AbstractContextManager
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return contextlib.nullcontext({})
+    return metrics.stage(name)
+
+
+def count(name, n=1):
+    """Add to a counter if metrics are being collected.
+
+    :param name: the name of the counter
+    :type name: str
+    :param n: the amount to add
+    :type n: int
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.count(name, n)
+
+
+def note(name, value):
+    """Set a value in the record of the innermost stage if metrics are being collected, see :meth:`Metrics.note`.
+
+    :param name: the name of the value
+    :type name: str
+    :param value: the JSON serializable value
+    :type value: object
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.note(name, value)
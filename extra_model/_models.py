@@ -1,3 +1,4 @@
+import copy
 import datetime as dt
 import json
 import logging
@@ -9,10 +10,21 @@ import pandas as pd
 
 from extra_model._adjectives import adjective_info
 from extra_model._aspects import generate_aspects
+from extra_model._checkpoints import Checkpoints
 from extra_model._filter import filter
-from extra_model._summarize import link_aspects_to_texts, link_aspects_to_topics, qa
-from extra_model._topics import get_topics
+from extra_model._incremental import RunState
+from extra_model._metrics import collect, stage
+from extra_model._parallel import parallel_map, resolve_n_jobs
+from extra_model._partials import Partial
+from extra_model._progress import ProgressCallback, reporting
+from extra_model._sentiment import SENTIMENT_FILENAME, sentiments
+from extra_model._summarize import link_aspects_to_texts, link_aspects_to_topics
+from extra_model._summarize import qa_report as build_qa_report
+from extra_model._summarize import write_qa_report
+from extra_model._topic_model import TOPIC_COLUMNS, TOPIC_MODEL_FILENAME, TopicModel
+from extra_model._topics import get_topics, match_aspects
 from extra_model._vectorizer import Vectorizer
+from extra_model._wordnet import SNAPSHOT_DIRNAME, wordnet
 
 CB_BASE_DIR = "/"
 EMBEDDING_TYPE = "glove.840B.300d"
@@ -60,8 +72,9 @@ class ExtraModelBase:
         "embeddings": f"{EMBEDDING_TYPE}.vectors.npy",
         "prepro": EMBEDDING_TYPE,
     }
-    # there is no need for this since Extra doesn't create any artifacts
-    _training_artifacts: Dict[str, str] = {}
+    # written to `models_folder` by `train` when it is given comments
+    _training_artifacts: Dict[str, str] = {"topic_model": TOPIC_MODEL_FILENAME}
+    topic_model: Optional[TopicModel] = None
 
     def __init__(
         self,
@@ -69,6 +82,11 @@ class ExtraModelBase:
         dag_run_id="",
         models_folder=models_folder,
         embedding_type=EMBEDDING_TYPE,
+        disambiguation="context",
+        alpha=0.5,
+        max_iter=100,
+        tolerance=1e-10,
+        n_jobs=1,
     ):
         """Init function for ExtraModel object.
 
@@ -76,9 +94,24 @@ class ExtraModelBase:
         :param dag_runs_ids: Dag run IDs
         :param models_folder: Path to folder where model files are stored
         :param embedding_type: Name of embedding file. Default is "glove.840B.300d"
+        :param disambiguation: Word-sense disambiguation method. Default is "context", which clusters the aspects
+            to build artificial contexts. "similarity" and "first_sense" skip the clustering and are much faster
+            on large inputs, see `extra_model._disambiguate.DISAMBIGUATION_METHODS`
+        :param alpha: Weight of the propagation along the hypernym graph in the topic importance ranking,
+            `1 - alpha` is the weight of the original aspect counts. Default is 0.5
+        :param max_iter: Maximum number of iterations of the topic importance ranking. Default is 100
+        :param tolerance: The topic importance ranking stops once the importances change by less than this
+            (L1 norm) between two iterations. Default is 1e-10
+        :param n_jobs: Number of processes for the per-topic work of the topic and adjective stages, -1 to use
+            all cores. Default is 1, i.e. no process pool
         """
         self.models_folder = models_folder
         self.embedding_type = embedding_type
+        self.disambiguation = disambiguation
+        self.alpha = alpha
+        self.max_iter = max_iter
+        self.tolerance = tolerance
+        self.n_jobs = n_jobs
         self.api_spec_names = {
             "position": "Position",
             "aspect": "Aspect",
@@ -123,28 +156,216 @@ class ExtraModelBase:
         self.vectorizer = Vectorizer(
             os.path.join(self.models_folder, self.embedding_type)
         )
+        # use the prebuilt wordnet snapshot if `extra-model-setup` created one,
+        # otherwise it is built from nltk on first use
+        wordnet_folder = os.path.join(self.models_folder, SNAPSHOT_DIRNAME)
+        if os.path.isdir(wordnet_folder):
+            wordnet.load(wordnet_folder)
+        # same for the table of adjective sentiments
+        sentiment_file = os.path.join(self.models_folder, SENTIMENT_FILENAME)
+        if os.path.isfile(sentiment_file):
+            sentiments.load(sentiment_file)
+        # and the topic model written by `train`
+        topic_model_file = os.path.join(
+            self.models_folder, self._training_artifacts["topic_model"]
+        )
+        if os.path.isfile(topic_model_file):
+            self.topic_model = TopicModel.load(topic_model_file)
         self.is_trained = True
 
-    def train(self):
-        """Docstring."""
-        for key, filename in self._filenames.items():
-            logger.debug(f"Downloading {key}")
-            shutil.copyfile(
-                src=os.path.join(CB_BASE_DIR, filename),
-                dst=os.path.join(self.models_folder, filename),
+    def train(self, comments: Optional[List[Dict[str, str]]] = None) -> None:
+        """Fit a topic model on comments, for `score` to label new comments with, or copy the embeddings.
+
+        The topic model holds the topics found by `predict` on the comments, the aspects and adjective clusters
+        of each topic and the sentiments of the adjectives. It is written to `models_folder`, where
+        `load_from_files` finds it, see `extra_model._topic_model`.
+
+        :param comments: the comments, with keys `CommentId` and `Comments`. If None, the embedding files are
+            copied into `models_folder` instead
+        """
+        if comments is None:
+            for key, filename in self._filenames.items():
+                logger.debug(f"Downloading {key}")
+                shutil.copyfile(
+                    src=os.path.join(CB_BASE_DIR, filename),
+                    dst=os.path.join(self.models_folder, filename),
+                )
+            self.is_trained = True
+            return
+
+        if not self.is_trained:
+            raise RuntimeError(
+                "Extra needs its embeddings to fit a topic model, call `load_from_files()` before `train(comments)`!"
             )
-        self.is_trained = True
+        dataframe_input = pd.DataFrame(comments)
+        dataframe_input.rename(
+            {"CommentId": "source_guid"}, axis="columns", inplace=True
+        )
+        with stage("filter") as record:
+            dataframe_texts = filter(dataframe_input)
+            record["rows"] = len(dataframe_texts)
+        with stage("aspects") as record:
+            dataframe_aspects = generate_aspects(dataframe_texts)
+            record["rows"] = len(dataframe_aspects)
+        if dataframe_aspects.empty:
+            raise ValueError(
+                "Input dataset doesn't contain valid aspects, stopping the algorithm"
+            )
+        with stage("topics") as record:
+            dataframe_topics = get_topics(
+                dataframe_aspects,
+                self.vectorizer,
+                disambiguation=self.disambiguation,
+                alpha=self.alpha,
+                max_iter=self.max_iter,
+                tolerance=self.tolerance,
+                n_jobs=self.n_jobs,
+            )
+            record["rows"] = len(dataframe_topics)
+        dataframe_aspects, dataframe_topics = self._link(
+            dataframe_texts, dataframe_aspects, dataframe_topics
+        )
 
-    def predict(self, comments: List[Dict[str, str]]) -> List[Dict]:
-        """Docstring."""
+        topic_model = TopicModel.fit(
+            dataframe_topics, dataframe_aspects, self._stage_parameters()
+        )
+        topic_model.save(
+            os.path.join(self.models_folder, self._training_artifacts["topic_model"])
+        )
+        self.topic_model = topic_model
+
+    def score(
+        self,
+        comments: List[Dict[str, str]],
+        return_metrics: bool = False,
+        progress: Optional[ProgressCallback] = None,
+    ) -> Union[List[Dict], Tuple[List[Dict], Dict]]:
+        """Label comments with the topics of the topic model fitted by `train`.
+
+        Only the comments are filtered and parsed, their aspects are then looked up in the topic model. Aspects
+        and descriptors that the model doesn't know are dropped, as are aspects without topic by `predict`. The
+        topic importances, sentiments and counts, and the aspect counts, are those of the comments the model was
+        fitted on.
+
+        :param comments: the comments, with keys `CommentId` and `Comments`
+        :param return_metrics: if True, also return the metrics of the stages, see `predict`
+        :param progress: called as `progress(stage, done, total, rate)`, see `predict`
+        :return: one record per aspect of the comments that has a topic, in the format of `predict`, and the
+            metrics if `return_metrics` is True
+        """
+        with reporting(progress):
+            if not return_metrics:
+                return self._score(comments)
+            with collect() as metrics:
+                records = self._score(comments)
+        return records, metrics.to_dict()
+
+    def _score(self, comments: List[Dict[str, str]]) -> List[Dict]:
+        """Run all stages of :meth:`score`."""
+        if self.topic_model is None:
+            raise RuntimeError(
+                "Extra needs a topic model to score comments, fit one with `train`!"
+            )
+        dataframe_input = pd.DataFrame(comments)
+        dataframe_input.rename(
+            {"CommentId": "source_guid"}, axis="columns", inplace=True
+        )
+        with stage("filter") as record:
+            dataframe_texts = filter(dataframe_input)
+            record["rows"] = len(dataframe_texts)
+        with stage("aspects") as record:
+            dataframe_aspects = generate_aspects(dataframe_texts)
+            record["rows"] = len(dataframe_aspects)
+        if dataframe_aspects.empty:
+            return []
+        with stage("link") as record:
+            dataframe_aspects = self.topic_model.assign(dataframe_aspects)
+            dataframe_aspects = link_aspects_to_texts(
+                dataframe_aspects, dataframe_texts
+            )
+            record["rows"] = len(dataframe_aspects)
+        with stage("output") as record:
+            records = self._records(dataframe_aspects, self.topic_model.topics)
+            record["rows"] = len(records)
+        return records
+
+    def predict(
+        self,
+        comments: List[Dict[str, str]],
+        qa_report: Optional[Union[str, os.PathLike]] = None,
+        return_metrics: bool = False,
+        progress: Optional[ProgressCallback] = None,
+        checkpoint_dir: Optional[Union[str, os.PathLike]] = None,
+    ) -> Union[List[Dict], Tuple[List[Dict], Dict]]:
+        """Extract topics from comments.
+
+        :param comments: the comments, with keys `CommentId` and `Comments`
+        :param qa_report: if given, write a summary of the topics for quality assurance to this file,
+            as Markdown if its name ends in `.md` and as JSON otherwise
+        :param return_metrics: if True, also return the wall time, CPU time, peak memory and row count of each
+            stage and counters of hot paths, see `extra_model._metrics.Metrics.to_dict`
+        :param progress: called as `progress(stage, done, total, rate)` while comments are filtered and parsed
+            and while the number of aspect clusters is searched, `rate` being the number of items per second
+        :param checkpoint_dir: if given, store the output of each stage in this folder and resume from the
+            stored outputs of a previous run with the same comments and parameters, see `extra_model._checkpoints`.
+            Needs `pyarrow`
+        :return: one record per aspect found in the comments, and the metrics if `return_metrics` is True
+        """
+        with reporting(progress):
+            if not return_metrics:
+                return self._predict(comments, qa_report, checkpoint_dir)
+            with collect() as metrics:
+                records = self._predict(comments, qa_report, checkpoint_dir)
+        return records, metrics.to_dict()
+
+    def _stage_parameters(self) -> Dict[str, Dict]:
+        """Return the parameters that change the output of each stage, see `extra_model._checkpoints.STAGES`."""
+        return {
+            "match": {
+                "disambiguation": self.disambiguation,
+                "embedding_type": self.embedding_type,
+            },
+            "topics": {
+                "alpha": self.alpha,
+                "max_iter": self.max_iter,
+                "tolerance": self.tolerance,
+            },
+        }
+
+    def _predict(
+        self,
+        comments: List[Dict[str, str]],
+        qa_report: Optional[Union[str, os.PathLike]] = None,
+        checkpoint_dir: Optional[Union[str, os.PathLike]] = None,
+    ) -> List[Dict]:
+        """Run all stages of :meth:`predict`."""
         if not self.is_trained:
             raise RuntimeError("Extra must be trained before you can predict!")
-        dataframe_texts = pd.DataFrame(comments)
-        dataframe_texts.rename(
+        dataframe_input = pd.DataFrame(comments)
+        dataframe_input.rename(
             {"CommentId": "source_guid"}, axis="columns", inplace=True
         )
-        dataframe_texts = filter(dataframe_texts)
-        dataframe_aspects = generate_aspects(dataframe_texts)
+        checkpoints = Checkpoints(
+            checkpoint_dir, dataframe_input, self._stage_parameters()
+        )
+        # an identical rerun doesn't need to run any stage, unless it has to write a QA report
+        if qa_report is None:
+            cached = checkpoints.load("output", ["output"])
+            if cached is not None:
+                return cached["output"].to_dict("records")
+
+        with stage("filter") as record:
+            dataframe_texts = checkpoints.run(
+                "filter", ["texts"], lambda: {"texts": filter(dataframe_input)}
+            )["texts"]
+            record["rows"] = len(dataframe_texts)
+        with stage("aspects") as record:
+            dataframe_aspects = checkpoints.run(
+                "aspects",
+                ["aspects"],
+                lambda: {"aspects": generate_aspects(dataframe_texts)},
+            )["aspects"]
+            record["rows"] = len(dataframe_aspects)
 
         if dataframe_aspects.empty:
             raise ValueError(
@@ -152,32 +373,330 @@ class ExtraModelBase:
             )
 
         # aggregate and abstract aspects into topics
-        dataframe_topics = get_topics(dataframe_aspects, self.vectorizer)
-        dataframe_topics, dataframe_aspects = adjective_info(
-            dataframe_topics, dataframe_aspects, self.vectorizer
-        )
-        dataframe_aspects = link_aspects_to_topics(dataframe_aspects, dataframe_topics)
-        dataframe_aspects = link_aspects_to_texts(dataframe_aspects, dataframe_texts)
-
-        # do some extra book-keeping if debug-level is set low enough
-        if logger.isEnabledFor(20):
-            qa(dataframe_texts, dataframe_aspects, dataframe_topics)
-
-        # write output_tables, after dropping auxilliary information
-        dataframe_topics.loc[:, "num_occurance"] = dataframe_topics["rawnums"].apply(
-            lambda counts: sum(counts)
-        )
-        dataframe_topics = dataframe_topics[
-            [
-                "topicID",
-                "topic",
-                "importance",
-                "sentiment_compound",
-                "sentiment_binary",
-                "num_occurance",
-            ]
+        with stage("topics") as record:
+            matches = checkpoints.run(
+                "match",
+                ["matches"],
+                lambda: {
+                    "matches": match_aspects(
+                        dataframe_aspects, self.vectorizer, self.disambiguation
+                    )
+                },
+            )["matches"]
+            # `get_topics` adds the topic related columns to the aspects
+            tables = checkpoints.run(
+                "topics",
+                ["topics", "aspects"],
+                lambda: {
+                    "topics": get_topics(
+                        dataframe_aspects,
+                        self.vectorizer,
+                        disambiguation=self.disambiguation,
+                        alpha=self.alpha,
+                        max_iter=self.max_iter,
+                        tolerance=self.tolerance,
+                        n_jobs=self.n_jobs,
+                        matches=matches,
+                    ),
+                    "aspects": dataframe_aspects,
+                },
+            )
+            dataframe_topics, dataframe_aspects = tables["topics"], tables["aspects"]
+            record["rows"] = len(dataframe_topics)
+        records = self._finish(
+            dataframe_texts, dataframe_aspects, dataframe_topics, qa_report
+        )
+        checkpoints.save("output", {"output": pd.DataFrame(records)})
+        return records
+
+    def predict_incremental(
+        self,
+        comments: List[Dict[str, str]],
+        state_dir: Union[str, os.PathLike],
+        qa_report: Optional[Union[str, os.PathLike]] = None,
+        return_metrics: bool = False,
+        progress: Optional[ProgressCallback] = None,
+    ) -> Union[List[Dict], Tuple[List[Dict], Dict]]:
+        """Extract topics from new comments together with all comments folded into a stored state before.
+
+        Only the new comments are filtered and parsed, and only aspects that weren't seen before are matched to
+        `wordnet`. The result is that of :meth:`predict` on all comments, except that topic importances may differ
+        by about `tolerance` and that the "context" disambiguation keeps the aspect clusters of an earlier
+        prediction until the aspects have grown enough, see `extra_model._incremental`. Comments whose `CommentId`
+        is already in the state are left out.
+
+        :param comments: the new comments, with keys `CommentId` and `Comments`
+        :param state_dir: the folder of the state, which is created by the first prediction and updated by every
+            later one. Needs `pyarrow`
+        :param qa_report: if given, write a summary of the topics for quality assurance to this file,
+            as Markdown if its name ends in `.md` and as JSON otherwise
+        :param return_metrics: if True, also return the metrics of the stages, see :meth:`predict`
+        :param progress: called as `progress(stage, done, total, rate)`, see :meth:`predict`
+        :return: one record per aspect found in all comments of the state, and the metrics if `return_metrics`
+            is True
+        """
+        with reporting(progress):
+            if not return_metrics:
+                return self._predict_incremental(comments, state_dir, qa_report)
+            with collect() as metrics:
+                records = self._predict_incremental(comments, state_dir, qa_report)
+        return records, metrics.to_dict()
+
+    def _predict_incremental(
+        self,
+        comments: List[Dict[str, str]],
+        state_dir: Union[str, os.PathLike],
+        qa_report: Optional[Union[str, os.PathLike]] = None,
+    ) -> List[Dict]:
+        """Run all stages of :meth:`predict_incremental`."""
+        if not self.is_trained:
+            raise RuntimeError("Extra must be trained before you can predict!")
+        state = RunState.load(state_dir, self._stage_parameters()["match"])
+        dataframe_input = pd.DataFrame(comments)
+        dataframe_input.rename(
+            {"CommentId": "source_guid"}, axis="columns", inplace=True
+        )
+
+        with stage("filter") as record:
+            # continue the index of the comments of the state, the aspects refer to it
+            new_texts = state.new_texts(filter(dataframe_input))
+            record["rows"] = len(new_texts)
+        with stage("aspects") as record:
+            unseen = state.add(new_texts, generate_aspects(new_texts))
+            dataframe_texts = state.texts
+            # `get_topics` adds the topic related columns to the aspects
+            dataframe_aspects = state.aspects.copy()
+            record["rows"] = len(dataframe_aspects)
+
+        if dataframe_aspects.empty:
+            raise ValueError(
+                "Input dataset doesn't contain valid aspects, stopping the algorithm"
+            )
+
+        with stage("topics") as record:
+            matches = state.match(unseen, self.vectorizer, self.disambiguation)
+            dataframe_topics = get_topics(
+                dataframe_aspects,
+                self.vectorizer,
+                disambiguation=self.disambiguation,
+                alpha=self.alpha,
+                max_iter=self.max_iter,
+                tolerance=self.tolerance,
+                n_jobs=self.n_jobs,
+                matches=matches,
+                cache=state.cache,
+            )
+            record["rows"] = len(dataframe_topics)
+
+        records = self._finish(
+            dataframe_texts, dataframe_aspects, dataframe_topics, qa_report
+        )
+        state.save(state_dir)
+        return records
+
+    def predict_grouped(
+        self,
+        comments: List[Dict[str, Any]],
+        group_by: str,
+        return_metrics: bool = False,
+        progress: Optional[ProgressCallback] = None,
+    ) -> Union[List[Dict], Tuple[List[Dict], Dict]]:
+        """Extract topics from each group of comments separately, e.g. per product class.
+
+        All comments are filtered and parsed together, in one pass of spaCy. The topics, adjectives and links are
+        then found for each group on its own, in a process pool of `n_jobs` processes, each group giving the
+        records that :meth:`predict` gives for its comments. Groups without valid aspects are left out, as are
+        comments without a group. So are groups that fail, e.g. with too few aspects to cluster for the "context"
+        disambiguation, with a warning that names them.
+
+        :param comments: the comments, with keys `CommentId`, `Comments` and `group_by`
+        :param group_by: the key of the group of a comment
+        :param return_metrics: if True, also return the metrics of the stages, see :meth:`predict`. The stages of
+            the groups are only included if `n_jobs` is 1
+        :param progress: called as `progress(stage, done, total, rate)`, see :meth:`predict`
+        :return: one record per aspect found in the comments, with the group in `group_by`, ordered by group, and
+            the metrics if `return_metrics` is True
+        """
+        with reporting(progress):
+            if not return_metrics:
+                return self._predict_grouped(comments, group_by)
+            with collect() as metrics:
+                records = self._predict_grouped(comments, group_by)
+        return records, metrics.to_dict()
+
+    def _predict_grouped(
+        self, comments: List[Dict[str, Any]], group_by: str
+    ) -> List[Dict]:
+        """Run all stages of :meth:`predict_grouped`."""
+        if not self.is_trained:
+            raise RuntimeError("Extra must be trained before you can predict!")
+        dataframe_input = pd.DataFrame(comments)
+        dataframe_input.rename(
+            {"CommentId": "source_guid"}, axis="columns", inplace=True
+        )
+        if dataframe_input[group_by].isna().any():
+            logger.warning(
+                f"Leaving out {dataframe_input[group_by].isna().sum()} comments without `{group_by}`"
+            )
+
+        with stage("filter") as record:
+            dataframe_texts = filter(dataframe_input)
+            record["rows"] = len(dataframe_texts)
+        with stage("aspects") as record:
+            dataframe_aspects = generate_aspects(dataframe_texts)
+            record["rows"] = len(dataframe_aspects)
+
+        groups = _split_groups(dataframe_texts, dataframe_aspects, group_by)
+        skipped = dataframe_texts[group_by].dropna().nunique() - len(groups)
+        if skipped:
+            logger.warning(f"Leaving out {skipped} groups without valid aspects")
+        if not groups:
+            raise ValueError(
+                "Input dataset doesn't contain valid aspects, stopping the algorithm"
+            )
+
+        n_jobs = min(resolve_n_jobs(self.n_jobs), len(groups))
+        # the processes run one group each, so the groups don't start pools of their own
+        model = self
+        if n_jobs > 1:
+            model = copy.copy(self)
+            model.n_jobs = 1
+        results = parallel_map(
+            _predict_group, groups, shared=model, n_jobs=n_jobs, broken=_group_died
+        )
+        failed = [key for (key, _, _), records in zip(groups, results) if not records]
+        if failed:
+            logger.warning(
+                f"Leaving out {len(failed)} groups that failed or have no topics: {failed}"
+            )
+        if len(failed) == len(groups):
+            raise ValueError(
+                "No group of the input dataset gave any topics, stopping the algorithm"
+            )
+        return [
+            {group_by: key, **record}
+            for (key, _, _), records in zip(groups, results)
+            for record in records or []
         ]
 
+    def aggregate(
+        self,
+        partials: List[Partial],
+        qa_report: Optional[Union[str, os.PathLike]] = None,
+        return_metrics: bool = False,
+    ) -> Union[List[Dict], Tuple[List[Dict], Dict]]:
+        """Extract topics from the comments of partials, the filtered and parsed shards of a corpus.
+
+        The partials are merged and the stages after parsing are run on all of their aspects, which gives the
+        records of :meth:`predict` on the comments of all partials, see `extra_model._partials`.
+
+        :param partials: the partials, see `extra_model._partials.Partial.extract`
+        :param qa_report: if given, write a summary of the topics for quality assurance to this file,
+            as Markdown if its name ends in `.md` and as JSON otherwise
+        :param return_metrics: if True, also return the metrics of the stages, see :meth:`predict`
+        :return: one record per aspect found in the comments, and the metrics if `return_metrics` is True
+        """
+        if not return_metrics:
+            return self._aggregate(partials, qa_report)
+        with collect() as metrics:
+            records = self._aggregate(partials, qa_report)
+        return records, metrics.to_dict()
+
+    def _aggregate(
+        self,
+        partials: List[Partial],
+        qa_report: Optional[Union[str, os.PathLike]] = None,
+    ) -> List[Dict]:
+        """Run all stages of :meth:`aggregate`."""
+        if not self.is_trained:
+            raise RuntimeError("Extra must be trained before you can predict!")
+        with stage("merge") as record:
+            partial = Partial.merge(partials)
+            record["rows"] = len(partial.aspects)
+        dataframe_texts = partial.texts
+        dataframe_aspects = partial.aspects
+
+        if dataframe_aspects.empty:
+            raise ValueError(
+                "Input dataset doesn't contain valid aspects, stopping the algorithm"
+            )
+
+        with stage("topics") as record:
+            # `get_topics` adds the topic related columns to the aspects
+            dataframe_topics = get_topics(
+                dataframe_aspects,
+                self.vectorizer,
+                disambiguation=self.disambiguation,
+                alpha=self.alpha,
+                max_iter=self.max_iter,
+                tolerance=self.tolerance,
+                n_jobs=self.n_jobs,
+            )
+            record["rows"] = len(dataframe_topics)
+        return self._finish(
+            dataframe_texts, dataframe_aspects, dataframe_topics, qa_report
+        )
+
+    def _finish(
+        self,
+        dataframe_texts: pd.DataFrame,
+        dataframe_aspects: pd.DataFrame,
+        dataframe_topics: pd.DataFrame,
+        qa_report: Optional[Union[str, os.PathLike]] = None,
+    ) -> List[Dict]:
+        """Run the stages after the topics are found, from the adjectives to the output records."""
+        dataframe_aspects, dataframe_topics = self._link(
+            dataframe_texts, dataframe_aspects, dataframe_topics
+        )
+
+        # do some extra book-keeping if requested
+        if qa_report is not None:
+            with stage("qa_report") as record:
+                write_qa_report(
+                    build_qa_report(
+                        dataframe_texts, dataframe_aspects, dataframe_topics
+                    ),
+                    qa_report,
+                )
+                record["rows"] = len(dataframe_topics)
+
+        with stage("output") as record:
+            # write output_tables, after dropping auxilliary information
+            dataframe_topics.loc[:, "num_occurance"] = dataframe_topics[
+                "rawnums"
+            ].apply(lambda counts: sum(counts))
+            records = self._records(dataframe_aspects, dataframe_topics[TOPIC_COLUMNS])
+            record["rows"] = len(records)
+        return records
+
+    def _link(
+        self,
+        dataframe_texts: pd.DataFrame,
+        dataframe_aspects: pd.DataFrame,
+        dataframe_topics: pd.DataFrame,
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Cluster and score the adjectives of the topics and link the aspects to their topics and texts."""
+        with stage("adjectives") as record:
+            dataframe_topics, dataframe_aspects = adjective_info(
+                dataframe_topics, dataframe_aspects, self.vectorizer, n_jobs=self.n_jobs
+            )
+            # remember the sentiments of adjectives seen for the first time
+            sentiments.flush()
+            record["rows"] = len(dataframe_topics)
+        with stage("link") as record:
+            dataframe_aspects = link_aspects_to_topics(
+                dataframe_aspects, dataframe_topics
+            )
+            dataframe_aspects = link_aspects_to_texts(
+                dataframe_aspects, dataframe_texts
+            )
+            record["rows"] = len(dataframe_aspects)
+        return dataframe_aspects, dataframe_topics
+
+    def _records(
+        self, dataframe_aspects: pd.DataFrame, dataframe_topics: pd.DataFrame
+    ) -> List[Dict]:
+        """Join the aspects that have a topic and an adjective cluster with their topics, as output records."""
         dataframe_aspects.dropna(axis=0, inplace=True)
         dataframe_aspects["topicID"] = dataframe_aspects["topicID"].astype(int)
 
@@ -187,6 +706,70 @@ class ExtraModelBase:
         return standardize_output(output, names=self.api_spec_names).to_dict("records")
 
 
+def _split_groups(
+    dataframe_texts: pd.DataFrame, dataframe_aspects: pd.DataFrame, group_by: str
+) -> List[Tuple[Any, pd.DataFrame, pd.DataFrame]]:
+    """Split the texts and aspects of a grouped prediction by group.
+
+    :param dataframe_texts: the filtered comments, with the column `group_by`
+    :param dataframe_aspects: their aspects
+    :param group_by: the column of the group of a comment
+    :return: the key, texts and aspects of each group with aspects, ordered by key
+    """
+    groups = []
+    group_of_text = dataframe_texts[group_by]
+    for key, aspects in dataframe_aspects.groupby(
+        dataframe_aspects["CiD"].map(group_of_text), sort=True
+    ):
+        # index the aspects of the group as `predict` would on its comments alone
+        groups.append(
+            (
+                key,
+                dataframe_texts[group_of_text == key],
+                aspects.reset_index(drop=True),
+            )
+        )
+    return groups
+
+
+def _predict_group(
+    extra_model: ExtraModelBase,
+    group: Tuple[Any, pd.DataFrame, pd.DataFrame],
+) -> Optional[List[Dict]]:
+    """Find the topics of a group of comments, see `ExtraModelBase.predict_grouped`.
+
+    :param extra_model: the model
+    :param group: the key of the group, and its texts and aspects
+    :return: the records of the group, as `predict` returns them, None if the group failed
+    """
+    key, dataframe_texts, dataframe_aspects = group
+    try:
+        with stage("topics") as record:
+            # `get_topics` adds the topic related columns to the aspects
+            dataframe_topics = get_topics(
+                dataframe_aspects,
+                extra_model.vectorizer,
+                disambiguation=extra_model.disambiguation,
+                alpha=extra_model.alpha,
+                max_iter=extra_model.max_iter,
+                tolerance=extra_model.tolerance,
+                n_jobs=extra_model.n_jobs,
+            )
+            record["rows"] = len(dataframe_topics)
+        return extra_model._finish(dataframe_texts, dataframe_aspects, dataframe_topics)
+    except Exception as e:
+        # one group, e.g. with too few aspects to cluster, mustn't stop the others
+        logger.warning(f"Group {key!r} failed: {type(e).__name__}: {e}")
+        return None
+
+
+def _group_died(
+    group: Tuple[Any, pd.DataFrame, pd.DataFrame], error: Exception
+) -> None:
+    """Log a group whose process died, see `extra_model._parallel.parallel_map`."""
+    logger.warning(f"Group {group[0]!r} failed: the process running it died")
+
+
 # NOTE: improve typehints!
 def extra_factory(bases: Optional[Union[Any, Tuple[Any]]] = None) -> Any:
     """Create for ExtraModel class types.
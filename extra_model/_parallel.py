@@ -0,0 +1,150 @@
+"""Run independent per-topic work in a process pool."""
+
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from extra_model._errors import ExtraModelError
+
+# read-only state of the pool, set once per worker process
+_shared = None
+
+
+def _initialize(shared):
+    """Store the shared state in a worker process.
+
+    :param shared: the read-only state passed to every task
+    :type shared: object
+    """
+    global _shared
+    _shared = shared
+
+
+def _call(function, item):
+    """Run a task in a worker process with the state stored by :func:`_initialize`.
+
+    :param function: the task to run
+    :type function: callable
+    :param item: the item to process
+    :type item: object
+    :return: the result of the task
+    :rtype: object
+    """
+    return function(_shared, item)
+
+
+def resolve_n_jobs(n_jobs):
+    """Turn the `n_jobs` option into a number of processes.
+
+    :param n_jobs: number of processes, -1 to use all cores
+    :type n_jobs: int
+    :return: the number of processes to use
+    :rtype: int
+    """
+    if n_jobs == -1:
+        return os.cpu_count() or 1
+    if not isinstance(n_jobs, int) or n_jobs < 1:
+        raise ExtraModelError(
+            f"`n_jobs` must be a positive integer or -1, got {n_jobs}"
+        )
+    return n_jobs
+
+
+def _pool(n_jobs, shared):
+    """Start a pool of processes that hold the shared state.
+
+    :param n_jobs: number of processes
+    :type n_jobs: int
+    :param shared: the read-only state passed to every task
+    :type shared: object
+    :return: the pool
+    :rtype: :class:`concurrent.futures.ProcessPoolExecutor`
+    """
+    context = None
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    return ProcessPoolExecutor(
+        max_workers=n_jobs,
+        mp_context=context,
+        initializer=_initialize,
+        initargs=(shared,),
+    )
+
+
+def _isolated(function, item, shared, broken):
+    """Run a task in a process of its own, so that only this task fails if the process dies.
+
+    :param function: the task to run
+    :type function: callable
+    :param item: the item to process
+    :type item: object
+    :param shared: the read-only state passed to the task
+    :type shared: object
+    :param broken: called as `broken(item, error)` if the process dies
+    :type broken: callable
+    :return: the result of the task
+    :rtype: object
+    """
+    with _pool(1, shared) as executor:
+        try:
+            return executor.submit(_call, function, item).result()
+        except BrokenProcessPool as e:
+            return broken(item, e)
+
+
+def parallel_map(function, items, shared=None, n_jobs=1, broken=None):
+    """Apply a function to every item, optionally in a pool of processes.
+
+    `shared` is handed to each worker process once, when the pool starts: with the `fork` start method it is
+    inherited without being pickled at all, otherwise it is pickled once per process rather than once per task.
+    Results are returned in the order of `items`, independent of the number of processes.
+
+    If a worker process dies, e.g. killed for running out of memory, the pool is broken and no further task
+    completes. By default the error is raised. With `broken`, every item is sent as a task of its own and the
+    results of the tasks that completed are kept. The other items are then run one at a time, each in a process of
+    its own, and `broken(item, error)` gives the result of each item whose process dies again.
+
+    :param function: module-level function called as `function(shared, item)`
+    :type function: callable
+    :param items: the items to process
+    :type items: [object]
+    :param shared: read-only state needed by every task, e.g. the hypernym graph or the embeddings
+    :type shared: object
+    :param n_jobs: number of processes, 1 to run in the current process, -1 to use all cores
+    :type n_jobs: int
+    :param broken: if given, called as `broken(item, error)` for the items whose process dies
+    :type broken: callable
+    :return: the results for all items
+    :rtype: [object]
+    """
+    items = list(items)
+    n_jobs = min(resolve_n_jobs(n_jobs), len(items))
+    if n_jobs <= 1:
+        return [function(shared, item) for item in items]
+
+    if broken is None:
+        with _pool(n_jobs, shared) as executor:
+            return list(
+                executor.map(
+                    _call,
+                    [function] * len(items),
+                    items,
+                    chunksize=math.ceil(len(items) / (4 * n_jobs)),
+                )
+            )
+
+    missing = object()
+    with _pool(n_jobs, shared) as executor:
+        futures = [executor.submit(_call, function, item) for item in items]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except BrokenProcessPool:
+                results.append(missing)
+    return [
+        _isolated(function, item, shared, broken) if result is missing else result
+        for item, result in zip(items, results)
+    ]
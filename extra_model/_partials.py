@@ -0,0 +1,204 @@
+"""Split a prediction into an extraction over shards of the comments and an aggregation over all shards.
+
+Filtering and parsing treat every comment on its own, so they can run on any shard of the comments, on many machines
+or processes at once. Each shard is stored as a partial: its filtered comments, their aspect rows and the count of
+each aspect. The topic stages need the aspect counts of all comments, so the partials are merged and aggregated once.
+
+Merging concatenates the comments and the aspects of the partials in the given order, renumbering the comments
+after those of the previous partials, so aggregating the partials of consecutive shards gives the records of a
+prediction on all comments at once.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from collections import Counter
+
+import pandas as pd
+
+from extra_model._aspects import generate_aspects
+from extra_model._errors import ExtraModelError
+from extra_model._filter import filter
+from extra_model._metrics import stage
+
+try:
+    import pyarrow
+except ImportError:  # optional dependency, see the `checkpoints` extra
+    pyarrow = None
+
+# version of the layout of a partial
+FORMAT = "1"
+METADATA_FILENAME = "partial.json"
+
+
+def _package_version():
+    """Return the version of the package, partials of other versions may parse differently.
+
+    :return: the version
+    :rtype: str
+    """
+    # imported here, as the package imports this module before setting its version
+    from extra_model import __version__
+
+    return __version__
+
+
+def _require_pyarrow():
+    """Raise if the Parquet files of partials can't be read or written.
+
+    :raises ExtraModelError: if `pyarrow` is not installed
+    """
+    if pyarrow is None:
+        raise ExtraModelError(
+            "Partials are stored as Parquet and need `pyarrow`, install `extra-model[checkpoints]`"
+        )
+
+
+def _concat(frames):
+    """Concatenate frames, leaving out empty ones, which would change the column types.
+
+    :param frames: the frames, at least one
+    :type frames: [:class:`pandas.DataFrame`]
+    :return: the rows of all frames, numbered from 0
+    :rtype: :class:`pandas.DataFrame`
+    """
+    return pd.concat(
+        [frame for frame in frames if not frame.empty] or frames[:1], ignore_index=True
+    )
+
+
+class Partial:
+    """The filtered comments of a shard and their aspects."""
+
+    def __init__(self, texts, aspects, version=None):
+        """Collect the tables of the shard.
+
+        :param texts: the filtered comments, see :func:`extra_model._filter.filter`
+        :type texts: :class:`pandas.DataFrame`
+        :param aspects: the aspect rows, whose `CiD` is the index of their comment in `texts`
+        :type aspects: :class:`pandas.DataFrame`
+        :param version: the version of the package that extracted the shard, the current one by default
+        :type version: str
+        """
+        self.texts = texts
+        self.aspects = aspects
+        self.version = version or _package_version()
+
+    @property
+    def aspect_counts(self):
+        """Return the number of rows of each aspect."""
+        return Counter(self.aspects["aspect"])
+
+    @classmethod
+    def extract(cls, comments):
+        """Filter and parse a shard of comments.
+
+        :param comments: the comments, with keys `CommentId` and `Comments`
+        :type comments: [dict]
+        :return: the partial of the shard
+        :rtype: :class:`Partial`
+        """
+        dataframe_input = pd.DataFrame(comments)
+        dataframe_input.rename(
+            {"CommentId": "source_guid"}, axis="columns", inplace=True
+        )
+        with stage("filter") as record:
+            dataframe_texts = filter(dataframe_input)
+            record["rows"] = len(dataframe_texts)
+        with stage("aspects") as record:
+            dataframe_aspects = generate_aspects(dataframe_texts)
+            record["rows"] = len(dataframe_aspects)
+        return cls(dataframe_texts, dataframe_aspects)
+
+    @classmethod
+    def merge(cls, partials):
+        """Concatenate partials, as if their comments had been extracted at once.
+
+        :param partials: the partials, in the order of their comments
+        :type partials: [:class:`Partial`]
+        :return: the partial of all comments
+        :rtype: :class:`Partial`
+        :raises ExtraModelError: if there are no partials, or they were extracted by different versions
+        """
+        if not partials:
+            raise ExtraModelError("No partials to merge")
+        versions = sorted({partial.version for partial in partials})
+        if len(versions) > 1:
+            raise ExtraModelError(
+                f"Partials extracted by different versions {', '.join(versions)} can't be merged, "
+                "extract them again"
+            )
+        texts, aspects = [], []
+        offset = 0
+        for partial in partials:
+            texts.append(partial.texts)
+            # the comments of this partial follow those of the previous ones
+            aspects.append(partial.aspects.assign(CiD=partial.aspects["CiD"] + offset))
+            offset += len(partial.texts)
+        return cls(_concat(texts), _concat(aspects), versions[0])
+
+    def save(self, folder):
+        """Write the partial, replacing the folder only once all files are written.
+
+        :param folder: the folder of the partial
+        :type folder: str or :class:`pathlib.Path`
+        :raises ExtraModelError: if `pyarrow` is not installed
+        """
+        _require_pyarrow()
+        parent = os.path.dirname(os.path.abspath(folder))
+        os.makedirs(parent, exist_ok=True)
+        temporary = tempfile.mkdtemp(dir=parent, suffix=".tmp")
+        try:
+            with open(os.path.join(temporary, METADATA_FILENAME), "w") as f:
+                json.dump(
+                    {
+                        "format": FORMAT,
+                        "version": self.version,
+                        "texts": len(self.texts),
+                        "aspect_counts": dict(self.aspect_counts.most_common()),
+                    },
+                    f,
+                )
+            self.texts.to_parquet(
+                os.path.join(temporary, "texts.parquet"), engine="pyarrow"
+            )
+            self.aspects.to_parquet(
+                os.path.join(temporary, "aspects.parquet"), engine="pyarrow"
+            )
+            if os.path.isdir(folder):
+                previous = tempfile.mkdtemp(dir=parent, suffix=".old")
+                os.replace(folder, os.path.join(previous, "partial"))
+                os.replace(temporary, folder)
+                shutil.rmtree(previous)
+            else:
+                os.replace(temporary, folder)
+        except BaseException:
+            shutil.rmtree(temporary, ignore_errors=True)
+            raise
+
+    @classmethod
+    def load(cls, folder):
+        """Read a partial written by :meth:`save`.
+
+        :param folder: the folder of the partial
+        :type folder: str or :class:`pathlib.Path`
+        :return: the partial
+        :rtype: :class:`Partial`
+        :raises ExtraModelError: if `pyarrow` is not installed, or the folder doesn't hold a partial of this layout
+        """
+        _require_pyarrow()
+        metadata_file = os.path.join(folder, METADATA_FILENAME)
+        if not os.path.isfile(metadata_file):
+            raise ExtraModelError(f"{folder} is not a partial, no {METADATA_FILENAME}")
+        with open(metadata_file) as f:
+            metadata = json.load(f)
+        if metadata.get("format") != FORMAT:
+            raise ExtraModelError(
+                f"The partial {folder} has format {metadata.get('format')}, not {FORMAT}, extract it again"
+            )
+        return cls(
+            pd.read_parquet(os.path.join(folder, "texts.parquet")),
+            pd.read_parquet(os.path.join(folder, "aspects.parquet")),
+            metadata["version"],
+        )
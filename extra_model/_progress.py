@@ -0,0 +1,83 @@
+"""Report the progress of long-running loops to a callback.
+
+A callback set with :func:`reporting` is called as `callback(stage, done, total, rate)`, where `rate` is the number
+of items per second since the loop started. Calls are throttled to one per :data:`INTERVAL` seconds, plus one when
+the loop completes. Without a callback, :meth:`Tracker.update` returns after a single attribute check.
+"""
+
+import contextlib
+import contextvars
+import time
+from typing import Callable, Optional
+
+# minimum number of seconds between two calls of the callback for the same loop
+INTERVAL = 0.5
+
+ProgressCallback = Callable[[str, int, int, float], None]
+
+_callback: contextvars.ContextVar[Optional[ProgressCallback]] = contextvars.ContextVar(
+    "extra_model_progress", default=None
+)
+
+
+class Tracker:
+    """Progress of one loop."""
+
+    def __init__(self, callback, stage, total):
+        """Start tracking a loop.
+
+        :param callback: the callback to report to, None to report nothing
+        :type callback: callable
+        :param stage: the name of the stage the loop belongs to
+        :type stage: str
+        :param total: the number of items of the loop
+        :type total: int
+        """
+        self.callback = callback
+        self.stage = stage
+        self.total = total
+        self.start = self.last = time.perf_counter()
+
+    def update(self, done):
+        """Report that a number of items is done, if the callback wasn't called too recently.
+
+        :param done: the number of items done so far
+        :type done: int
+        """
+        if self.callback is None:
+            return
+        now = time.perf_counter()
+        if done < self.total and now - self.last < INTERVAL:
+            return
+        self.last = now
+        elapsed = now - self.start
+        self.callback(
+            self.stage, done, self.total, done / elapsed if elapsed > 0 else 0.0
+        )
+
+
+def track(stage, total):
+    """Track the progress of a loop, reporting to the callback of the current context.
+
+    :param stage: the name of the stage the loop belongs to, e.g. `aspects`
+    :type stage: str
+    :param total: the number of items of the loop
+    :type total: int
+    :return: the tracker to update as items are done
+    :rtype: :class:`Tracker`
+    """
+    return Tracker(_callback.get(), stage, total)
+
+
+@contextlib.contextmanager
+def reporting(callback):
+    """Report the progress of the code run in this context to a callback.
+
+    :param callback: called as `callback(stage, done, total, rate)`, None to report nothing
+    :type callback: callable
+    """
+    token = _callback.set(callback)
+    try:
+        yield
+    finally:
+        _callback.reset(token)
@@ -1,40 +1,110 @@
+import glob
+import json
 import logging
+import time
+from functools import partial
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
 import pandas as pd
 
 from extra_model._errors import ExtraModelError
 from extra_model._models import ExtraModel
+from extra_model._parallel import parallel_map
+from extra_model._partials import Partial
+from extra_model._progress import ProgressCallback
+from extra_model._serve import warm_up
 
 MODELS_FOLDER = Path("./embeddings")
 OUTPUT_FILE = Path("result.csv")
+BATCH_SUMMARY_FILE = Path("batch_summary.json")
+# appended to the name of each input file of a batch to name its output file
+BATCH_OUTPUT_SUFFIX = "_result.csv"
 
 logger = logging.getLogger(__name__)
 
 
 def run_from_dataframe(
-    df: pd.core.frame.DataFrame, embeddings_path: Path = MODELS_FOLDER
+    df: pd.core.frame.DataFrame,
+    embeddings_path: Path = MODELS_FOLDER,
+    qa_report: Optional[Path] = None,
+    metrics_out: Optional[Path] = None,
+    progress: Optional[ProgressCallback] = None,
+    checkpoint_dir: Optional[Path] = None,
+    state_dir: Optional[Path] = None,
+    group_by: Optional[str] = None,
+    n_jobs: int = 1,
 ) -> pd.core.frame.DataFrame:
     """
     Run extra-model with dataframe as an input.
 
     :param df: is a dataframe with with 2 columns: CommentId and Comments.
     :param embeddings_path: path to the embeddings files
+    :param qa_report: if given, write a QA report of the topics to this file (Markdown for `.md`, JSON otherwise)
+    :param metrics_out: if given, write the time, memory and row count of each stage and the counters of hot paths
+        to this JSON file
+    :param progress: called as `progress(stage, done, total, rate)` during the long-running loops of the prediction
+    :param checkpoint_dir: if given, store the output of each stage in this folder and resume from it when rerun
+    :param state_dir: if given, fold the comments into the state of previous runs stored in this folder and return
+        the results for all comments of the state, see `ExtraModel.predict_incremental`
+    :param group_by: if given, find the topics of each group of comments with the same value in this column
+        separately and add the column to the results, see `ExtraModel.predict_grouped`
+    :param n_jobs: number of processes for the groups and the per-topic work, see `ExtraModel`
     :return: dataframe of the ExtraModel results. More details here - https://wayfair-incubator.github.io/extra-model/site/#extra-model-output
     """
     logging.basicConfig(format="  %(message)s")
 
-    if not {"CommentId", "Comments"}.issubset(df.columns):
+    _check_columns(df)
+
+    if state_dir is not None and checkpoint_dir is not None:
         raise ExtraModelError(
-            f"Input columns must include `CommentId` and `Comments`, \
-        but got {df.columns.to_list()} instead"
+            "Checkpoints are not supported for incremental runs, got both `checkpoint_dir` and `state_dir`"
         )
 
-    extra_model = ExtraModel(models_folder=embeddings_path)
+    if group_by is not None:
+        if group_by not in df.columns:
+            raise ExtraModelError(
+                f"Column `{group_by}` to group by not found in {df.columns.to_list()}"
+            )
+        options = {
+            "qa_report": qa_report,
+            "checkpoint_dir": checkpoint_dir,
+            "state_dir": state_dir,
+        }
+        unsupported = [name for name, value in options.items() if value is not None]
+        if unsupported:
+            raise ExtraModelError(
+                f"`{'`, `'.join(unsupported)}` can't be used with `group_by`"
+            )
+
+    extra_model = ExtraModel(models_folder=embeddings_path, n_jobs=n_jobs)
     extra_model.load_from_files()
 
     logger.info("Running `extra-model`")
-    results_raw = extra_model.predict(comments=df.to_dict("records"))
+    if group_by is not None:
+        predict = partial(extra_model.predict_grouped, group_by=group_by)
+    elif state_dir is None:
+        predict = partial(
+            extra_model.predict, qa_report=qa_report, checkpoint_dir=checkpoint_dir
+        )
+    else:
+        predict = partial(
+            extra_model.predict_incremental, qa_report=qa_report, state_dir=state_dir
+        )
+    if metrics_out is None:
+        results_raw = predict(
+            comments=df.to_dict("records"),
+            progress=progress,
+        )
+    else:
+        results_raw, metrics = predict(
+            comments=df.to_dict("records"),
+            return_metrics=True,
+            progress=progress,
+        )
+        logger.info(f"Saving metrics to {metrics_out}")
+        with open(metrics_out, "w") as f:
+            json.dump(metrics, f, indent=2)
     results = pd.DataFrame(results_raw)
 
     logger.info("Returning results")
@@ -46,6 +116,13 @@ def run(
     output_path: Path,
     output_filename: Path = OUTPUT_FILE,
     embeddings_path: Path = MODELS_FOLDER,
+    qa_report: Optional[Path] = None,
+    metrics_out: Optional[Path] = None,
+    progress: Optional[ProgressCallback] = None,
+    checkpoint_dir: Optional[Path] = None,
+    state_dir: Optional[Path] = None,
+    group_by: Optional[str] = None,
+    n_jobs: int = 1,
 ) -> None:
     """Docstring."""
     logging.basicConfig(format="  %(message)s")
@@ -53,7 +130,233 @@ def run(
     logger.info(f"Loading data from {input_path}")
     input_data = pd.read_csv(input_path)
 
-    results = run_from_dataframe(input_data, embeddings_path)
+    results = run_from_dataframe(
+        input_data,
+        embeddings_path,
+        qa_report=qa_report,
+        metrics_out=metrics_out,
+        progress=progress,
+        checkpoint_dir=checkpoint_dir,
+        state_dir=state_dir,
+        group_by=group_by,
+        n_jobs=n_jobs,
+    )
+
+    if not output_path.exists():
+        logger.info(f"Creating folder {output_path}")
+        output_path.mkdir(parents=True)
+
+    logger.info(f"Saving output to {output_path / output_filename}")
+    results.to_csv(output_path / output_filename, encoding="utf-8", index=False)
+
+
+def _check_columns(df: pd.core.frame.DataFrame) -> None:
+    if not {"CommentId", "Comments"}.issubset(df.columns):
+        raise ExtraModelError(
+            f"Input columns must include `CommentId` and `Comments`, \
+        but got {df.columns.to_list()} instead"
+        )
+
+
+def is_batch(input_path: Path) -> bool:
+    """Tell whether the input is a directory or a glob pattern rather than a single file."""
+    return input_path.is_dir() or any(char in str(input_path) for char in "*?[")
+
+
+def resolve_inputs(input_path: Path) -> List[Path]:
+    """
+    Expand the input of a batch into its files.
+
+    Output files of earlier batches, whose names end in `BATCH_OUTPUT_SUFFIX`, and their summaries are left out,
+    so that rerunning a batch doesn't read its own results.
+
+    :param input_path: a directory, whose `.csv` files are the input, or a glob pattern
+    :return: the input files, sorted
+    :raises ExtraModelError: if there is no input file, or two of them would have the same output file
+    """
+    if input_path.is_dir():
+        files = sorted(input_path.glob("*.csv"))
+    else:
+        files = sorted(Path(path) for path in glob.glob(str(input_path)))
+        files = [path for path in files if path.is_file()]
+    files = [
+        path
+        for path in files
+        if not path.name.endswith(BATCH_OUTPUT_SUFFIX)
+        and path.name != BATCH_SUMMARY_FILE.name
+    ]
+    if not files:
+        raise ExtraModelError(f"No input files found in {input_path}")
+    stems = [path.stem for path in files]
+    duplicates = sorted({stem for stem in stems if stems.count(stem) > 1})
+    if duplicates:
+        raise ExtraModelError(
+            f"Several input files would be written to the same output file: {', '.join(duplicates)}"
+        )
+    return files
+
+
+def _run_file(extra_model: ExtraModel, paths: Tuple[Path, Path]) -> Dict:
+    """
+    Run the model on one input file of a batch, in a worker process.
+
+    :param extra_model: the loaded model, inherited from the parent process
+    :param paths: the input file and the output file
+    :return: the summary of the file, with the error message if it failed
+    """
+    input_file, output_file = paths
+    start = time.perf_counter()
+    result: Dict[str, Any] = {"input": str(input_file), "output": str(output_file)}
+    try:
+        input_data = pd.read_csv(input_file)
+        _check_columns(input_data)
+        results = pd.DataFrame(extra_model.predict(input_data.to_dict("records")))
+        results.to_csv(output_file, encoding="utf-8", index=False)
+    except Exception as e:
+        logger.error(f"{input_file} failed: {e}")
+        result.update(rows=0, error=f"{type(e).__name__}: {e}")
+    else:
+        logger.info(f"{input_file}: {len(results)} rows written to {output_file}")
+        result.update(rows=len(results), error=None)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _worker_died(paths: Tuple[Path, Path], error: Exception) -> Dict:
+    """
+    Summarize an input file of a batch that has no result, as a worker process died.
+
+    :param paths: the input file and the output file
+    :param error: the error of the broken pool
+    :return: the summary of the file, as failed
+    """
+    input_file, output_file = paths
+    logger.error(f"{input_file} failed: a worker process died")
+    return {
+        "input": str(input_file),
+        "output": str(output_file),
+        "rows": 0,
+        "error": f"{type(error).__name__}: a worker process died, e.g. running out of memory",
+        "seconds": None,
+    }
+
+
+def run_batch(
+    input_path: Path,
+    output_path: Path,
+    embeddings_path: Path = MODELS_FOLDER,
+    jobs: int = 1,
+) -> List[Dict]:
+    """
+    Run extra-model on many input files, loading the embeddings, spaCy and WordNet once.
+
+    The resources are loaded in the current process before the worker processes are forked, so that the workers
+    share the memory-mapped embeddings and the spaCy pipeline copy-on-write instead of loading them again. The
+    output of each input file goes to `output_path / <name of the input file>_result.csv`, which later batches over
+    the same folder don't take as input. A file that fails doesn't stop the others; the summary of all files is
+    written to `output_path / batch_summary.json`. If a worker process dies, e.g. running out of memory, the files
+    that have no result by then are marked as failed.
+
+    :param input_path: a directory, whose `.csv` files are the input, or a glob pattern of input files
+    :param output_path: the output folder
+    :param embeddings_path: path to the embeddings files
+    :param jobs: number of worker processes, -1 to use all cores
+    :return: the input and output file, number of rows, run time in seconds (None if unknown) and error message
+        (None on success) of each input file
+    """
+    logging.basicConfig(format="  %(message)s")
+
+    input_files = resolve_inputs(input_path)
+    if not output_path.exists():
+        logger.info(f"Creating folder {output_path}")
+        output_path.mkdir(parents=True)
+
+    extra_model = ExtraModel(models_folder=embeddings_path)
+    extra_model.load_from_files()
+    warm_up(extra_model)
+
+    logger.info(f"Running `extra-model` on {len(input_files)} files")
+    summary = parallel_map(
+        _run_file,
+        [
+            (path, output_path / f"{path.stem}{BATCH_OUTPUT_SUFFIX}")
+            for path in input_files
+        ],
+        shared=extra_model,
+        n_jobs=jobs,
+        broken=_worker_died,
+    )
+
+    failed = sum(result["error"] is not None for result in summary)
+    logger.info(f"{len(summary) - failed} files done, {failed} failed")
+    with open(output_path / BATCH_SUMMARY_FILE, "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def run_extract(input_path: Path, partial_path: Path) -> None:
+    """
+    Filter and parse the comments of a csv file, a shard of a corpus, into a partial for `run_aggregate`.
+
+    Doesn't need the embeddings, so that it can run on machines without them.
+
+    :param input_path: the input csv file, with columns `CommentId` and `Comments`
+    :param partial_path: the folder to write the partial to, see `extra_model._partials`. Needs `pyarrow`
+    """
+    logging.basicConfig(format="  %(message)s")
+
+    logger.info(f"Loading data from {input_path}")
+    input_data = pd.read_csv(input_path)
+    _check_columns(input_data)
+
+    logger.info("Extracting aspects")
+    partial = Partial.extract(input_data.to_dict("records"))
+
+    logger.info(
+        f"Saving {len(partial.aspects)} aspects of {len(partial.texts)} comments to {partial_path}"
+    )
+    partial.save(partial_path)
+
+
+def run_aggregate(
+    partial_paths: List[Path],
+    output_path: Path,
+    output_filename: Path = OUTPUT_FILE,
+    embeddings_path: Path = MODELS_FOLDER,
+    qa_report: Optional[Path] = None,
+    metrics_out: Optional[Path] = None,
+    n_jobs: int = 1,
+) -> None:
+    """
+    Merge the partials of `run_extract` and find the topics of all their comments.
+
+    :param partial_paths: the folders of the partials, in the order of their comments
+    :param output_path: the output folder
+    :param output_filename: the name of the output file
+    :param embeddings_path: path to the embeddings files
+    :param qa_report: if given, write a QA report of the topics to this file (Markdown for `.md`, JSON otherwise)
+    :param metrics_out: if given, write the time, memory and row count of each stage to this JSON file
+    :param n_jobs: number of processes for the per-topic work, see `ExtraModel`
+    """
+    logging.basicConfig(format="  %(message)s")
+
+    logger.info(f"Loading {len(partial_paths)} partials")
+    partials = [Partial.load(path) for path in partial_paths]
+
+    extra_model = ExtraModel(models_folder=embeddings_path, n_jobs=n_jobs)
+    extra_model.load_from_files()
+
+    logger.info("Running `extra-model`")
+    if metrics_out is None:
+        results_raw = extra_model.aggregate(partials, qa_report=qa_report)
+    else:
+        results_raw, metrics = extra_model.aggregate(
+            partials, qa_report=qa_report, return_metrics=True
+        )
+        logger.info(f"Saving metrics to {metrics_out}")
+        with open(metrics_out, "w") as f:
+            json.dump(metrics, f, indent=2)
+    results = pd.DataFrame(results_raw)
 
     if not output_path.exists():
         logger.info(f"Creating folder {output_path}")
@@ -0,0 +1,201 @@
+"""VADER sentiment of single descriptors, looked up in persistent tables.
+
+Running `SentimentIntensityAnalyzer.polarity_scores` on a single word goes through all of VADER's sentence level
+heuristics, and creating the analyzer reads its lexicon from disk. The scores of all words of the VADER lexicon are
+therefore computed once by `extra-model-setup` and stored next to the embeddings; the analyzer is only created and
+run for descriptors that are neither in that table nor seen before.
+
+Descriptors outside of the lexicon are stored in a second table, `SEEN_FILENAME`, next to the first one. It holds the
+`MAX_SEEN` most recently used descriptors, in order of their last use, so that it doesn't grow with every new corpus.
+Predictions add to it with :meth:`SentimentCache.flush`, which merges the descriptors of this process into the
+current file under a lock, so that runs sharing a models folder don't lose each other's descriptors.
+"""
+
+import json
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+from extra_model._metrics import count
+
+try:
+    import fcntl
+except (
+    ImportError
+):  # not available on Windows, the seen table is then written without a lock
+    fcntl = None  # type: ignore
+
+SENTIMENT_FILENAME = "vader_sentiment.json"
+SEEN_FILENAME = "vader_sentiment_seen.json"
+# most descriptors outside of the lexicon that are kept, the least recently used ones are evicted first
+MAX_SEEN = 100_000
+
+logger = logging.getLogger(__name__)
+
+
+def _read(path):
+    """Read a table, in the order it was written.
+
+    :param path: the table file
+    :type path: str
+    :return: the scores of the descriptors
+    :rtype: :class:`collections.OrderedDict`
+    """
+    with open(path) as f:
+        return OrderedDict(
+            (descriptor, tuple(score)) for descriptor, score in json.load(f).items()
+        )
+
+
+def _write(path, scores):
+    """Write a table atomically, so that concurrent readers never see a partial file.
+
+    :param path: the table file
+    :type path: str
+    :param scores: the scores of the descriptors
+    :type scores: {str:(float,float)}
+    """
+    handle, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp"
+    )
+    try:
+        with os.fdopen(handle, "w") as f:
+            json.dump(scores, f)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+class SentimentCache:
+    """Compound and binary (positive minus negative) VADER sentiment of single descriptors."""
+
+    def __init__(self):
+        """Start with empty tables, the analyzer is created on first use."""
+        self.scores = {}
+        # descriptors outside of the lexicon, least recently used first
+        self.seen = OrderedDict()
+        self.seen_path = None
+        self._analyzer = None
+        # descriptors used since the last flush, in order of use, and whether any of them is new, the seen
+        # table is only written once there is a new one
+        self._used = OrderedDict()
+        self._changed = False
+
+    @property
+    def analyzer(self):
+        """Return the VADER analyzer, creating it on first use."""
+        if self._analyzer is None:
+            self._analyzer = SentimentIntensityAnalyzer()
+        return self._analyzer
+
+    def load(self, path):
+        """Load a table written by :meth:`save`, and the table of descriptors seen outside of it next to it.
+
+        :param path: the table file
+        :type path: str
+        """
+        self.scores.update(_read(path))
+        self.seen_path = os.path.join(os.path.dirname(path), SEEN_FILENAME)
+        if os.path.isfile(self.seen_path):
+            self.seen.update(_read(self.seen_path))
+
+    def _polarity(self, descriptor):
+        """Run VADER on a descriptor.
+
+        :param descriptor: the word (typically an adjective), case matters
+        :type descriptor: str
+        :return: the compound sentiment and the difference of positive and negative sentiment
+        :rtype: (float, float)
+        """
+        count("sentiment.vader_calls")
+        score = self.analyzer.polarity_scores(descriptor)
+        return score["compound"], (score["pos"] - score["neg"])
+
+    def score(self, descriptor):
+        """Return the sentiment of a descriptor, running VADER only if it has not been seen before.
+
+        :param descriptor: the word (typically an adjective), case matters
+        :type descriptor: str
+        :return: the compound sentiment and the difference of positive and negative sentiment
+        :rtype: (float, float)
+        """
+        if descriptor in self.scores:
+            count("sentiment.cache_hits")
+            return self.scores[descriptor]
+        if descriptor in self.seen:
+            count("sentiment.cache_hits")
+            self.seen.move_to_end(descriptor)
+        else:
+            self.seen[descriptor] = self._polarity(descriptor)
+            self._changed = True
+            if len(self.seen) > MAX_SEEN:
+                self.seen.popitem(last=False)
+        if self.seen_path is not None:
+            self._used[descriptor] = True
+            self._used.move_to_end(descriptor)
+        return self.seen[descriptor]
+
+    def precompute_lexicon(self):
+        """Add every word of the VADER lexicon to the table."""
+        for word in self.analyzer.lexicon:
+            if word not in self.scores:
+                self.scores[word] = self._polarity(word)
+
+    def save(self, path):
+        """Write the table atomically, so that concurrent readers never see a partial file.
+
+        :param path: the table file
+        :type path: str
+        """
+        _write(path, self.scores)
+
+    def _merge(self):
+        """Merge the descriptors used since the last flush into the current seen table and write it."""
+        seen = (
+            _read(self.seen_path) if os.path.isfile(self.seen_path) else OrderedDict()
+        )
+        # the descriptors of this process were used last
+        for descriptor in self._used:
+            if descriptor in self.seen:
+                seen.pop(descriptor, None)
+                seen[descriptor] = self.seen[descriptor]
+        while len(seen) > MAX_SEEN:
+            seen.popitem(last=False)
+        _write(self.seen_path, seen)
+        self.seen = seen
+
+    def flush(self):
+        """Add the descriptors scored since the last flush to the seen table, if the tables were loaded from files."""
+        if self.seen_path is None or not self._changed:
+            return
+        try:
+            with open(f"{self.seen_path}.lock", "w") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                self._merge()
+        except OSError as e:
+            logger.warning(
+                f"Could not update the sentiment table {self.seen_path}: {e}"
+            )
+            return
+        self._used.clear()
+        self._changed = False
+
+
+# the table used by the adjective stage
+sentiments = SentimentCache()
+
+
+def build(path):
+    """Score the whole VADER lexicon and write the table.
+
+    :param path: the table file
+    :type path: str
+    """
+    cache = SentimentCache()
+    cache.precompute_lexicon()
+    cache.save(path)
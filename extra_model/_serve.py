@@ -0,0 +1,350 @@
+"""Serve predictions over HTTP from a long-lived process that loads all resources once.
+
+Endpoints:
+
+* `POST /predict` and `POST /score` take a JSON list of comments with keys `CommentId` and `Comments` and return the
+  records of :meth:`extra_model.ExtraModel.predict` and :meth:`extra_model.ExtraModel.score` as a JSON list.
+* `GET /metrics` returns request counts, latencies and the totals of the stage metrics of all requests.
+* `GET /health` returns `{"status": "ok"}` once the resources are loaded.
+
+Requests are run by a bounded pool of worker threads. At most `queue_size` requests wait for a free worker, any
+further request is rejected right away with status 503 and a `Retry-After` header, so that a client backs off
+rather than piling up connections. Predictions run with `n_jobs=1`: forking worker processes from the threads of the
+server can deadlock on a lock that another thread held at the time of the fork.
+"""
+
+import json
+import logging
+import os
+import socketserver
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from extra_model._aspects import load_pipeline
+from extra_model._errors import ExtraModelError
+from extra_model._wordnet import wordnet
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+# requests with larger bodies are rejected
+MAX_BODY_SIZE = 64 * 1024 * 1024
+# seconds a rejected client is asked to wait before retrying
+RETRY_AFTER = 1
+
+
+class Busy(Exception):
+    """Raised when all workers are busy and the queue is full."""
+
+
+class PredictionService:
+    """Run predictions in a bounded pool of worker threads and keep metrics of them."""
+
+    def __init__(self, model, workers=1, queue_size=8):
+        """Start the worker pool, setting the `n_jobs` of the model to 1.
+
+        :param model: the loaded model, see :meth:`extra_model.ExtraModel.load_from_files`
+        :type model: :class:`extra_model.ExtraModel`
+        :param workers: number of requests to run at the same time
+        :type workers: int
+        :param queue_size: number of requests that may wait for a worker
+        :type queue_size: int
+        :raises ExtraModelError: if `workers` or `queue_size` is out of range
+        """
+        if workers < 1:
+            raise ExtraModelError(f"`workers` must be at least 1, got {workers}")
+        if queue_size < 0:
+            raise ExtraModelError(
+                f"`queue_size` must not be negative, got {queue_size}"
+            )
+        if model.n_jobs != 1:
+            logger.warning(
+                f"Running predictions with n_jobs=1 rather than {model.n_jobs}, "
+                "forking processes from the threads of the server can deadlock"
+            )
+            model.n_jobs = 1
+        self.model = model
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="extra-model"
+        )
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._requests = {"predict": 0, "score": 0}
+        self._rejected = 0
+        self._failed = 0
+        self._latency = {"count": 0, "total": 0.0, "max": 0.0}
+        self._stages = {}
+        self._counters = {}
+
+    def run(self, method, comments):
+        """Run a prediction in the worker pool and wait for it.
+
+        :param method: `predict` or `score`
+        :type method: str
+        :param comments: the comments, with keys `CommentId` and `Comments`
+        :type comments: [dict]
+        :return: the records
+        :rtype: [dict]
+        :raises Busy: if all workers are busy and the queue is full
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise Busy()
+        start = time.perf_counter()
+        with self._lock:
+            self._pending += 1
+            self._requests[method] += 1
+        try:
+            records, metrics = self._executor.submit(
+                getattr(self.model, method), comments, return_metrics=True
+            ).result()
+        except BaseException:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+        self._record(time.perf_counter() - start, metrics)
+        return records
+
+    def _record(self, latency, metrics):
+        """Add a completed request to the metrics.
+
+        :param latency: seconds from accepting the request to its result, including the time in the queue
+        :type latency: float
+        :param metrics: the metrics of the request, see :meth:`extra_model._metrics.Metrics.to_dict`
+        :type metrics: dict
+        """
+        with self._lock:
+            self._latency["count"] += 1
+            self._latency["total"] += latency
+            self._latency["max"] = max(self._latency["max"], latency)
+            for record in metrics["stages"]:
+                totals = self._stages.setdefault(
+                    record["name"], {"count": 0, "wall_time": 0.0, "cpu_time": 0.0}
+                )
+                totals["count"] += 1
+                totals["wall_time"] += record["wall_time"]
+                totals["cpu_time"] += record["cpu_time"]
+            for name, value in metrics["counters"].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def metrics(self):
+        """Return the metrics of all requests so far.
+
+        :return: the number of requests by endpoint, rejected and failed requests, the requests running or waiting
+            now, the latency of completed requests in seconds, and the totals of their stages and counters
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "pending": self._pending,
+                "requests": dict(self._requests),
+                "rejected": self._rejected,
+                "failed": self._failed,
+                "latency": dict(self._latency),
+                "stages": {name: dict(totals) for name, totals in self._stages.items()},
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def close(self):
+        """Wait for the running requests and stop the workers."""
+        self._executor.shutdown(wait=True)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Handle the requests of a :class:`PredictionService`, which the server holds as `service`."""
+
+    server_version = "extra-model"
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self):
+        """Return the client address for the log, which is empty for Unix sockets."""
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        """Log requests to the module logger rather than stderr."""
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, message, headers=None):
+        self._send(status, {"error": message}, headers)
+
+    def do_GET(self):  # noqa: N802
+        """Answer `/health` and `/metrics`."""
+        if self.path == "/health":
+            self._send(HTTPStatus.OK, {"status": "ok"})
+        elif self.path == "/metrics":
+            self._send(HTTPStatus.OK, self.server.service.metrics())
+        else:
+            self._error(HTTPStatus.NOT_FOUND, f"Unknown path {self.path}")
+
+    def _comments(self):
+        """Read the comments from the body of the request.
+
+        :return: the comments, None if the body is invalid, in which case the error is sent
+        :rtype: [dict]
+        """
+        try:
+            size = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            size = -1
+        if size < 0:
+            self.close_connection = True
+            self._error(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+            return None
+        if size > MAX_BODY_SIZE:
+            self.close_connection = True
+            self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+            return None
+        try:
+            comments = json.loads(self.rfile.read(size))
+        except ValueError as e:
+            self._error(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}")
+            return None
+        if not isinstance(comments, list) or not all(
+            isinstance(comment, dict) and {"CommentId", "Comments"} <= comment.keys()
+            for comment in comments
+        ):
+            self._error(
+                HTTPStatus.BAD_REQUEST,
+                "Expected a list of comments with keys `CommentId` and `Comments`",
+            )
+            return None
+        return comments
+
+    def do_POST(self):  # noqa: N802
+        """Answer `/predict` and `/score`."""
+        method = {"/predict": "predict", "/score": "score"}.get(self.path)
+        if method is None:
+            self.close_connection = True
+            self._error(HTTPStatus.NOT_FOUND, f"Unknown path {self.path}")
+            return
+        comments = self._comments()
+        if comments is None:
+            return
+        try:
+            records = self.server.service.run(method, comments)
+        except Busy:
+            self._error(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                "All workers are busy, retry later",
+                {"Retry-After": str(RETRY_AFTER)},
+            )
+        except (ValueError, RuntimeError, ExtraModelError) as e:
+            # e.g. no valid aspects in the comments, or no topic model to score with
+            self._error(HTTPStatus.UNPROCESSABLE_ENTITY, str(e))
+        except Exception as e:
+            logger.exception(e)
+            self._error(HTTPStatus.INTERNAL_SERVER_ERROR, "Prediction failed")
+        else:
+            self._send(HTTPStatus.OK, records)
+
+
+class HTTPServer(ThreadingHTTPServer):
+    """HTTP server on a TCP port, with a thread per connection."""
+
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        """Bind the server.
+
+        :param address: the host and port, port 0 picks a free one
+        :type address: (str, int)
+        :param service: the service answering the requests
+        :type service: :class:`PredictionService`
+        """
+        self.service = service
+        super().__init__(address, RequestHandler)
+
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    """HTTP server on a Unix socket, with a thread per connection."""
+
+    daemon_threads = True
+
+    def __init__(self, path, service):
+        """Bind the server, replacing a stale socket file.
+
+        :param path: the path of the socket
+        :type path: str
+        :param service: the service answering the requests
+        :type service: :class:`PredictionService`
+        :raises ExtraModelError: if something other than a socket exists at `path`
+        """
+        self.service = service
+        if os.path.lexists(path):
+            if not stat.S_ISSOCK(os.lstat(path).st_mode):
+                raise ExtraModelError(
+                    f"{path} exists and is not a socket, remove it or choose another path"
+                )
+            os.remove(path)
+        super().__init__(path, RequestHandler)
+
+
+def warm_up(model):
+    """Load the resources that a prediction would otherwise load on first use.
+
+    :param model: the model, loaded with :meth:`extra_model.ExtraModel.load_from_files`
+    :type model: :class:`extra_model.ExtraModel`
+    """
+    load_pipeline()
+    wordnet.synsets("chair", pos=wordnet.NOUN)
+    model.vectorizer.get_vector("chair")
+
+
+def serve(
+    model, host=DEFAULT_HOST, port=DEFAULT_PORT, socket=None, workers=1, queue_size=8
+):
+    """Serve predictions until interrupted.
+
+    :param model: the loaded model, see :meth:`extra_model.ExtraModel.load_from_files`
+    :type model: :class:`extra_model.ExtraModel`
+    :param host: the host to listen on
+    :type host: str
+    :param port: the port to listen on
+    :type port: int
+    :param socket: if given, listen on this Unix socket instead of `host` and `port`
+    :type socket: str
+    :param workers: number of requests to run at the same time
+    :type workers: int
+    :param queue_size: number of requests that may wait for a worker before requests are rejected
+    :type queue_size: int
+    """
+    service = PredictionService(model, workers, queue_size)
+    warm_up(model)
+    if socket is None:
+        server = HTTPServer((host, port), service)
+        logger.info(f"Serving on http://{host}:{server.server_address[1]}")
+    else:
+        server = UnixHTTPServer(socket, service)
+        logger.info(f"Serving on {socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+    finally:
+        server.server_close()
+        service.close()
@@ -7,6 +7,9 @@ from gensim.models import KeyedVectors
 from gensim.test.utils import datapath
 
 from extra_model._errors import ExtraModelError
+from extra_model._sentiment import SENTIMENT_FILENAME
+from extra_model._sentiment import build as build_sentiment_table
+from extra_model._wordnet import SNAPSHOT_DIRNAME, build
 
 URL = "http://downloads.cs.stanford.edu/nlp/data/glove.840B.300d.zip"
 
@@ -22,6 +25,8 @@ def setup(output_path: Path) -> None:
     logger.info("  1. Download embeddings")
     logger.info("  2. Unzip embeddings")
     logger.info("  3. Format embeddings")
+    logger.info("  4. Build WordNet snapshot")
+    logger.info("  5. Build sentiment table")
     logger.info("This process will take approximately 40 minutes.")
     logger.info("Setup can be safely re-run if exited prematurely.")
     logger.info("")
@@ -40,6 +45,9 @@ def setup(output_path: Path) -> None:
     format_file(file_unzipped, output_path)
     cleanup(files_to_cleanup)
 
+    build_wordnet(output_path)
+    build_sentiment(output_path)
+
     logger.info("Done!")
 
 
@@ -88,6 +96,28 @@ def format_file(file: Path, output_path: Path) -> None:
         logger.info(f"File {output_file} detected, formatting skipped!")
 
 
+def build_wordnet(output_path: Path) -> None:
+    """Build the memory-mappable WordNet snapshot."""
+    output_folder = output_path / SNAPSHOT_DIRNAME
+    if not output_folder.is_dir():
+        logger.info("Building WordNet snapshot. This will take less than a minute.")
+        build(str(output_folder))
+
+    else:
+        logger.info(f"WordNet snapshot {output_folder} detected, building skipped!")
+
+
+def build_sentiment(output_path: Path) -> None:
+    """Build the table of VADER sentiments of the lexicon words."""
+    output_file = output_path / SENTIMENT_FILENAME
+    if not output_file.is_file():
+        logger.info("Building sentiment table. This will take a few seconds.")
+        build_sentiment_table(str(output_file))
+
+    else:
+        logger.info(f"Sentiment table {output_file} detected, building skipped!")
+
+
 def cleanup(files: List[Path]) -> None:
     """Cleanup setup cruft."""
     logger.info("Cleaning up setup cruft...")
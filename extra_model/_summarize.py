@@ -1,105 +1,278 @@
-"""Fill out and link the dataframes for topics, aspects and texts. Provide some summary ouput if debug-level is set to info or lower."""
+"""Fill out and link the dataframes for topics, aspects and texts. Provide a summary report on request."""
 
+import json
 import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
 
 logger = logging.getLogger(__name__)
 
 
-def qa(dataframe_texts, dataframe_aspects, dataframe_topics):
-    """Print summary information.
+def _representative_comments(dataframe_texts, dataframe_aspects, dataframe_topics):
+    """Find up to five texts per topic that mention its most common term with its most common adjective cluster.
 
-    :param dataframe_texts: dataframe with the raw texts (for example output)
-    :type dataframe_texts: :class:`pandas.DataFrame`
-    :param dataframe_aspects:  dataframe with the aspects
+    :param dataframe_texts: dataframe with the raw texts
     :type dataframe_texts: :class:`pandas.DataFrame`
+    :param dataframe_aspects: dataframe with the aspects, linked to topics and adjective clusters
+    :type dataframe_aspects: :class:`pandas.DataFrame`
     :param dataframe_topics: dataframe with the topics
-    :type dataframe_texts: :class:`pandas.DataFrame`
+    :type dataframe_topics: :class:`pandas.DataFrame`
+    :return: the representative texts of each topic
+    :rtype: [[str]]
     """
-    for ind in dataframe_topics.index:
-        logger.debug("\n++++++++++++++++++++++++++++++\n")
-        logger.debug(
-            "analyzing topic {0!s} of importance {1:f}".format(
-                dataframe_topics["topic"][ind], dataframe_topics["importance"][ind]
-            )
-        )
-        logger.debug(
-            "with seniment {0:f}(compound) / {1:f}(binary)\n".format(
-                dataframe_topics["sentiment_compound"][ind],
-                dataframe_topics["sentiment_binary"][ind],
-            )
-        )
-        # attached terms by raw number
-        logger.debug("Common terms (by raw number)")
-        for term, num in zip(
-            dataframe_topics["rawterms"][ind], dataframe_topics["rawnums"][ind]
-        ):
-            logger.debug("{0!s} ({1:d}) ".format(term, num))
-
-        # count attached terms by distance weighted number XXX this section will
-        # go after debugginf
-        logger.debug("Common terms for aspect (distance weighted)")
-        for term, num in zip(
-            dataframe_topics["weightedterms"][ind], dataframe_topics["weights"][ind]
-        ):
-            logger.debug("{0!s} ({1:f}) ".format(term, num))
-
-        # adjective clusters
-        if dataframe_topics["adjective_clusters"][ind] is not None:
-            logger.debug("\nFound adjective clusters:\n")
-            representatives, sizes, adjectives = dataframe_topics["adjective_clusters"][
-                ind
-            ]
-            for representative, size, subads in zip(representatives, sizes, adjectives):
-                logger.debug(
-                    "For representative: {}({}): ".format(representative, size)
+    wanted = pd.DataFrame(
+        [
+            (topic, rawterms[0], clusters[0][0])
+            for topic, (rawterms, clusters) in enumerate(
+                zip(
+                    dataframe_topics["rawterms"], dataframe_topics["adjective_clusters"]
                 )
-                adstring = ""
-                for ad, count in subads:
-                    adstring += "{}({}), ".format(ad, count)
-                logger.debug(adstring)
-
-            # representative comments (most common term  and most commen
-            # adjective)
-            logger.debug(
-                "\nrepresentative comments (most common term with most common adjective cluster)"
             )
-            comments = dataframe_aspects[
-                dataframe_aspects["aspect"].isin([dataframe_topics["rawterms"][ind][0]])
-                & dataframe_aspects["adcluster"].isin(
-                    [dataframe_topics["adjective_clusters"][ind][0][0]]
+            if clusters is not None and len(rawterms) > 0
+        ],
+        columns=["topic", "aspect", "adcluster"],
+    ).astype({"topic": np.int64})
+    found = (
+        dataframe_aspects[["aspect", "adcluster", "CiD"]]
+        .reset_index(drop=True)
+        .reset_index()
+        .merge(wanted, on=["aspect", "adcluster"])
+        .sort_values(["topic", "index"])
+        .groupby("topic")
+        .head(5)
+    )
+    comments = [[] for _ in range(len(dataframe_topics))]
+    for topic, text in zip(
+        found["topic"].tolist(),
+        dataframe_texts["Comments"].loc[found["CiD"]].tolist(),
+    ):
+        comments[topic].append(text)
+    return comments
+
+
+def qa_report(dataframe_texts, dataframe_aspects, dataframe_topics):
+    """Summarize the topics for quality assurance.
+
+    For each topic, the report lists its terms by raw and by distance weighted count, its adjective clusters and
+    up to five representative texts, which mention the most common term of the topic together with an adjective
+    of its most common adjective cluster.
+
+    :param dataframe_texts: dataframe with the raw texts (for example output)
+    :type dataframe_texts: :class:`pandas.DataFrame`
+    :param dataframe_aspects: dataframe with the aspects, linked to topics and adjective clusters
+    :type dataframe_aspects: :class:`pandas.DataFrame`
+    :param dataframe_topics: dataframe with the topics
+    :type dataframe_topics: :class:`pandas.DataFrame`
+    :return: the report, containing only JSON serializable types
+    :rtype: dict
+    """
+    comments = _representative_comments(
+        dataframe_texts, dataframe_aspects, dataframe_topics
+    )
+    topics = []
+    for position, topic in enumerate(dataframe_topics.itertuples(index=False)):
+        clusters = []
+        # this can happen if there is only a single adjective
+        if topic.adjective_clusters is not None:
+            for representative, adjectives in zip(
+                topic.adjective_clusters[0], topic.adjective_clusters[2]
+            ):
+                clusters.append(
+                    {
+                        "representative": representative,
+                        "size": sum(int(count) for _, count in adjectives),
+                        "adjectives": [
+                            {"adjective": adjective, "count": int(count)}
+                            for adjective, count in adjectives
+                        ],
+                    }
+                )
+        topics.append(
+            {
+                "topicID": int(topic.topicID),
+                "topic": str(topic.topic),
+                "importance": float(topic.importance),
+                "sentiment_compound": float(topic.sentiment_compound),
+                "sentiment_binary": float(topic.sentiment_binary),
+                "terms": [
+                    {"term": term, "count": int(count)}
+                    for term, count in zip(topic.rawterms, topic.rawnums)
+                ],
+                "weighted_terms": [
+                    {"term": term, "weight": float(weight)}
+                    for term, weight in zip(topic.weightedterms, topic.weights)
+                ],
+                "adjective_clusters": clusters,
+                "comments": comments[position],
+            }
+        )
+    return {
+        "texts": len(dataframe_texts),
+        "aspects": len(dataframe_aspects),
+        "topics": topics,
+    }
+
+
+def _markdown(report):
+    """Render a report of :func:`qa_report` as Markdown.
+
+    :param report: the report
+    :type report: dict
+    :return: the Markdown document
+    :rtype: str
+    """
+    lines = [
+        "# Extra model QA report",
+        "",
+        f"{report['texts']} texts, {report['aspects']} aspects, {len(report['topics'])} topics",
+    ]
+    for topic in report["topics"]:
+        lines += [
+            "",
+            f"## {topic['topic']} (topic {topic['topicID']})",
+            "",
+            f"importance {topic['importance']:f}, sentiment {topic['sentiment_compound']:f} (compound) / "
+            f"{topic['sentiment_binary']:f} (binary)",
+            "",
+            "Common terms (by raw number): "
+            + ", ".join(f"{term['term']} ({term['count']})" for term in topic["terms"]),
+            "",
+            "Common terms (distance weighted): "
+            + ", ".join(
+                f"{term['term']} ({term['weight']:f})"
+                for term in topic["weighted_terms"]
+            ),
+        ]
+        if topic["adjective_clusters"]:
+            lines += ["", "Adjective clusters:", ""]
+            lines += [
+                f"* {cluster['representative']} ({cluster['size']}): "
+                + ", ".join(
+                    f"{adjective['adjective']} ({adjective['count']})"
+                    for adjective in cluster["adjectives"]
                 )
+                for cluster in topic["adjective_clusters"]
             ]
-            comments = comments.head(5)
-            for oi in comments["CiD"]:
-                logger.debug(dataframe_texts["Comments"][oi])
+        if topic["comments"]:
+            lines += ["", "Representative comments:", ""]
+            lines += [f"> {comment}" for comment in topic["comments"]]
+    return "\n".join(lines) + "\n"
 
 
-def set_aspect(topic, dataframe_aspects):
-    """For a given topic, set topic and adjective cluster fields in the aspect_dataframe.
+def write_qa_report(report, path):
+    """Write a report of :func:`qa_report` as Markdown if the file name ends in `.md`, as JSON otherwise.
 
-    :param topic: the topic and it's associated information that we need to copy to the relevant entries in the aspect frame
-    :type topic: :class:`pandas.DataFrame.Row`
-    :param dataframe_aspects: the dataframe to be enriched with topic information
+    :param report: the report
+    :type report: dict
+    :param path: the file to write
+    :type path: str or :class:`pathlib.Path`
+    """
+    path = Path(path)
+    logger.info(f"Writing QA report to {path}")
+    if path.suffix.lower() == ".md":
+        path.write_text(_markdown(report), encoding="utf-8")
+    else:
+        path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+def topic_terms(dataframe_topics):
+    """List the raw terms of all topics as one `(topic, aspect)` row per term, in topic order.
+
+    :param dataframe_topics: the dataframe with the raw terms of each topic
+    :type dataframe_topics: :class:`pandas.DataFrame`
+    :return: the position of the topic and each of its raw terms
+    :rtype: :class:`pandas.DataFrame`
+    """
+    return (
+        pd.DataFrame(
+            {
+                "topic": np.arange(len(dataframe_topics)),
+                "aspect": list(dataframe_topics["rawterms"]),
+            }
+        )
+        .explode("aspect")
+        .dropna()
+        .astype({"topic": np.int64})
+    )
+
+
+def topic_clusters(dataframe_topics):
+    """List the adjectives of the adjective clusters of all topics, one row per adjective.
+
+    :param dataframe_topics: the dataframe with the adjective clusters of each topic
+    :type dataframe_topics: :class:`pandas.DataFrame`
+    :return: the position of the topic, the index of the cluster within the topic, the adjective and the
+        representative of its cluster
+    :rtype: :class:`pandas.DataFrame`
+    """
+    rows = [
+        (topic, cluster, adjective, representative)
+        for topic, clusters in enumerate(dataframe_topics["adjective_clusters"])
+        # this can happen if there is only a single adjective
+        if clusters is not None
+        for cluster, (representative, adjectives) in enumerate(
+            zip(clusters[0], clusters[2])
+        )
+        for adjective, _ in adjectives
+    ]
+    return pd.DataFrame(
+        rows, columns=["topic", "cluster", "descriptor", "adcluster"]
+    ).astype({"topic": np.int64, "cluster": np.int64})
+
+
+def assign_topics(dataframe_aspects, terms, clusters, topic_ids):
+    """Fill the topic and the adjective cluster of each aspect into the aspect dataframe.
+
+    An aspect belongs to the last topic whose raw terms contain it. Its adjective cluster is the last cluster, over
+    all topics containing the aspect, that contains its descriptor. Both are looked up in mapping tables that are
+    joined to the aspects, rather than scanning all aspects once per topic and adjective cluster.
+
+    :param dataframe_aspects: the dataframe to be enriched, with columns `aspect` and `descriptor`
     :type dataframe_aspects: :class:`pandas.DataFrame`
+    :param terms: the raw terms of the topics, see :func:`topic_terms`
+    :type terms: :class:`pandas.DataFrame`
+    :param clusters: the adjective clusters of the topics, see :func:`topic_clusters`
+    :type clusters: :class:`pandas.DataFrame`
+    :param topic_ids: the identifier of each topic, by position
+    :type topic_ids: :class:`numpy.array`
+    :return: the enriched dataframe, with columns `topicID` and `adcluster` (None where not found)
+    :rtype: :class:`pandas.DataFrame`
     """
-    dataframe_aspects.loc[
-        dataframe_aspects["aspect"].isin(topic["rawterms"]), "topicID"
-    ] = topic["topicID"]
-
-    # this can happen if there is only a single adjective
-    if topic["adjective_clusters"] is not None:
-        for representative, all_adjectives in zip(
-            topic["adjective_clusters"][0], topic["adjective_clusters"][2]
-        ):
-            dataframe_aspects.loc[
-                dataframe_aspects["aspect"].isin(topic["rawterms"])
-                & dataframe_aspects["descriptor"].isin(list(zip(*all_adjectives))[0]),
-                "adcluster",
-            ] = representative
+    # aspect -> position of the last topic containing it
+    last_topic = terms.drop_duplicates("aspect", keep="last").set_index("aspect")[
+        "topic"
+    ]
+    topic = dataframe_aspects["aspect"].map(last_topic).to_numpy(dtype=float)
+    found = ~np.isnan(topic)
+    ids = np.full(len(dataframe_aspects), None, dtype=object)
+    ids[found] = topic_ids[topic[found].astype(np.int64)]
+    dataframe_aspects["topicID"] = ids
+
+    # (aspect, descriptor) -> representative of the last cluster containing it
+    adclusters = (
+        dataframe_aspects[["aspect", "descriptor"]]
+        .drop_duplicates()
+        .merge(terms, on="aspect")
+        .merge(clusters, on=["topic", "descriptor"])
+        .sort_values(["topic", "cluster"], kind="stable")
+        .drop_duplicates(["aspect", "descriptor"], keep="last")
+    )
+    adcluster = dataframe_aspects[["aspect", "descriptor"]].merge(
+        adclusters[["aspect", "descriptor", "adcluster"]],
+        on=["aspect", "descriptor"],
+        how="left",
+    )["adcluster"]
+    dataframe_aspects["adcluster"] = (
+        adcluster.astype(object).where(adcluster.notna(), None).to_numpy()
+    )
+
+    return dataframe_aspects
 
 
 def link_aspects_to_topics(dataframe_aspects, dataframe_topics):
-    """Fill topic and adjective cluster information into the aspect dataframe.
+    """Fill topic and adjective cluster information into the aspect dataframe, see :func:`assign_topics`.
 
     :param dataframe_aspects: the dataframe to be enriched
     :type dataframe_aspects: :class:`pandas.DataFrame`
@@ -108,17 +281,16 @@ def link_aspects_to_topics(dataframe_aspects, dataframe_topics):
     :return: the enriched dataframe
     :rtype: :class:`pandas.DataFrame`
     """
-    # create empty collumns to be filled
-    dataframe_aspects["topicID"] = None
-    dataframe_aspects["adcluster"] = None
-
     # create a topic-id from the dataframe index
     dataframe_topics.reset_index(inplace=True)
     dataframe_topics.rename({"index": "topicID"}, axis="columns", inplace=True)
 
-    dataframe_topics.apply(lambda topic: set_aspect(topic, dataframe_aspects), axis=1)
-
-    return dataframe_aspects
+    return assign_topics(
+        dataframe_aspects,
+        topic_terms(dataframe_topics),
+        topic_clusters(dataframe_topics),
+        dataframe_topics["topicID"].to_numpy(dtype=object),
+    )
 
 
 def link_aspects_to_texts(dataframe_aspects, dataframe_texts):
@@ -137,7 +309,7 @@ def link_aspects_to_texts(dataframe_aspects, dataframe_texts):
     keepers.append("source_guid")  # unique identifier for the utterance
     logger.debug("keeping aspects columns: {}".format(keepers))
 
-    # join aspects to the original texts
-    dataframe_aspects = dataframe_aspects.join(dataframe_texts, on="CiD")
+    # join aspects to the identifiers of the original texts
+    dataframe_aspects = dataframe_aspects.join(dataframe_texts["source_guid"], on="CiD")
 
     return dataframe_aspects[keepers]
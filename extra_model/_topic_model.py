@@ -0,0 +1,193 @@
+"""A topic model fitted on a corpus, to label new comments without discovering topics again.
+
+The model keeps everything the last stages of a prediction look up per aspect: the topics with their importance,
+sentiment and number of mentions, the raw terms and adjective clusters of each topic, the `wordnet` node and count
+of each aspect, and the sentiment of the adjectives of the topics. Labelling new comments with it only needs the
+filter and aspect extraction stages, followed by joins with these tables. Aspects and descriptors that the model
+hasn't seen get no topic or adjective cluster and are dropped from the output, as aspects without a topic are by a
+prediction.
+"""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from extra_model._adjectives import aspect_sentiments, fill_sentiment_dict
+from extra_model._errors import ExtraModelError
+from extra_model._summarize import assign_topics, topic_clusters, topic_terms
+
+TOPIC_MODEL_FILENAME = "topic_model.json"
+# version of the layout of the file, a model in another layout has to be trained again
+FORMAT = "1"
+# columns of the topics in the output
+TOPIC_COLUMNS = [
+    "topicID",
+    "topic",
+    "importance",
+    "sentiment_compound",
+    "sentiment_binary",
+    "num_occurance",
+]
+
+
+class TopicModel:
+    """Topics of a corpus and the tables to assign new aspect instances to them."""
+
+    def __init__(self, topics, terms, clusters, aspects, sentiments, parameters):
+        """Collect the tables of the model.
+
+        :param topics: the topics, with the columns of :data:`TOPIC_COLUMNS`
+        :type topics: :class:`pandas.DataFrame`
+        :param terms: the raw terms of the topics, see :func:`extra_model._summarize.topic_terms`
+        :type terms: :class:`pandas.DataFrame`
+        :param clusters: the adjective clusters of the topics, see :func:`extra_model._summarize.topic_clusters`
+        :type clusters: :class:`pandas.DataFrame`
+        :param aspects: the `wordnet_node` and `aspect_count` of the aspects, indexed by aspect
+        :type aspects: :class:`pandas.DataFrame`
+        :param sentiments: the compound and binary sentiment of the adjectives of the topics
+        :type sentiments: {str:(float,float)}
+        :param parameters: the options the model was fitted with, for reference
+        :type parameters: dict
+        """
+        self.topics = topics
+        self.terms = terms
+        self.clusters = clusters
+        self.aspects = aspects
+        self.sentiments = sentiments
+        self.parameters = parameters
+
+    @classmethod
+    def fit(cls, dataframe_topics, dataframe_aspects, parameters):
+        """Build the model from the topics and aspects of a prediction, after they are linked.
+
+        :param dataframe_topics: the topics, see :func:`extra_model._summarize.link_aspects_to_topics`
+        :type dataframe_topics: :class:`pandas.DataFrame`
+        :param dataframe_aspects: the aspect instances, with columns `aspect`, `wordnet_node` and `aspect_count`
+        :type dataframe_aspects: :class:`pandas.DataFrame`
+        :param parameters: the options of the prediction
+        :type parameters: dict
+        :return: the model
+        :rtype: :class:`TopicModel`
+        """
+        topics = dataframe_topics.assign(
+            num_occurance=dataframe_topics["rawnums"].apply(sum)
+        )[TOPIC_COLUMNS].reset_index(drop=True)
+        terms = topic_terms(dataframe_topics)
+        aspects = (
+            dataframe_aspects[["aspect", "wordnet_node", "aspect_count"]]
+            .drop_duplicates("aspect")
+            .set_index("aspect")
+        )
+        # only aspects with a topic can end up in the output
+        aspects = aspects[aspects.index.isin(terms["aspect"])]
+        return cls(
+            topics,
+            terms.reset_index(drop=True),
+            topic_clusters(dataframe_topics),
+            aspects,
+            fill_sentiment_dict(dataframe_topics["adjectives"]),
+            parameters,
+        )
+
+    def assign(self, dataframe_aspects):
+        """Add the columns that the adjective and link stages of a prediction add to the aspects.
+
+        :param dataframe_aspects: the aspect instances, see :func:`extra_model._aspects.generate_aspects`
+        :type dataframe_aspects: :class:`pandas.DataFrame`
+        :return: the aspects with columns `aspect_count`, `wordnet_node`, `sentiment_compound`,
+            `sentiment_binary`, `topicID` and `adcluster`, the latter two None for unknown aspects and descriptors
+        :rtype: :class:`pandas.DataFrame`
+        """
+        aspects = dataframe_aspects["aspect"]
+        dataframe_aspects["aspect_count"] = (
+            aspects.map(self.aspects["aspect_count"]).fillna(0).astype(int)
+        )
+        wordnet_node = aspects.map(self.aspects["wordnet_node"])
+        dataframe_aspects["wordnet_node"] = (
+            wordnet_node.astype(object).where(wordnet_node.notna(), None).to_numpy()
+        )
+        dataframe_aspects = aspect_sentiments(dataframe_aspects, self.sentiments)
+        return assign_topics(
+            dataframe_aspects,
+            self.terms,
+            self.clusters,
+            self.topics["topicID"].to_numpy(dtype=object),
+        )
+
+    def save(self, path):
+        """Write the model atomically, so that concurrent readers never see a partial file.
+
+        :param path: the model file
+        :type path: str
+        """
+        model = {
+            "format": FORMAT,
+            "parameters": self.parameters,
+            "topics": self.topics.to_dict("list"),
+            "terms": self.terms.to_dict("list"),
+            "clusters": self.clusters.to_dict("list"),
+            "aspects": {
+                "aspect": self.aspects.index.tolist(),
+                "wordnet_node": self.aspects["wordnet_node"].tolist(),
+                "aspect_count": self.aspects["aspect_count"].tolist(),
+            },
+            "sentiments": self.sentiments,
+        }
+        handle, temporary = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(handle, "w") as f:
+                json.dump(model, f, default=_json_default)
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """Read a model written by :meth:`save`.
+
+        :param path: the model file
+        :type path: str
+        :return: the model
+        :rtype: :class:`TopicModel`
+        :raises ExtraModelError: if the model was written in another layout
+        """
+        with open(path) as f:
+            model = json.load(f)
+        if model.get("format") != FORMAT:
+            raise ExtraModelError(
+                f"The topic model {path} has format {model.get('format')}, not {FORMAT}, train it again"
+            )
+        return cls(
+            pd.DataFrame(model["topics"], columns=TOPIC_COLUMNS),
+            pd.DataFrame(model["terms"], columns=["topic", "aspect"]).astype(
+                {"topic": np.int64}
+            ),
+            pd.DataFrame(
+                model["clusters"],
+                columns=["topic", "cluster", "descriptor", "adcluster"],
+            ).astype({"topic": np.int64, "cluster": np.int64}),
+            pd.DataFrame(
+                model["aspects"], columns=["aspect", "wordnet_node", "aspect_count"]
+            ).set_index("aspect"),
+            {adjective: tuple(pair) for adjective, pair in model["sentiments"].items()},
+            model["parameters"],
+        )
+
+
+def _json_default(value):
+    """Convert the numpy scalars that pandas returns for some columns.
+
+    :param value: the value :mod:`json` can't serialize
+    :type value: object
+    :return: the equivalent Python value
+    :rtype: object
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -1,43 +1,25 @@
 """Aggregate aspects into semantic clusters ('topics')."""
 
+import heapq
 import logging
 from collections import Counter
 
-import networkx as nx
 import numpy as np
 import pandas as pd
-from networkx.algorithms import approximation
 from nltk import tokenize
-from nltk.corpus import wordnet as wn
+from scipy import sparse
 from scipy.spatial import distance
 
 from extra_model._disambiguate import match
+from extra_model._errors import ExtraModelError
+from extra_model._graph import HypernymGraph
+from extra_model._metrics import count, note
+from extra_model._parallel import parallel_map
+from extra_model._wordnet import wordnet as wn
 
 logger = logging.getLogger(__name__)
 
 
-def path_to_graph(hypernym_list, initialnoun):
-    """Make a hypernym chain into a graph.
-
-    :param hypernym_list: list of hypernyms for a word as obtained from wordnet
-    :type hypernym_list: [str]
-    :param initialnoun: the initial noun (we need this to mark it as leaf in the tree)
-    :type initialnoun: str
-    :return: the linear directed graph of the chain
-    :rtype: :class:`networkx.DiGraph`
-    """
-    graph = nx.DiGraph()
-    # mark the original word as 'seed' so we can track 'importance' later
-    graph.add_node(initialnoun, seed=True)
-    previous = initialnoun
-    for hypernym in reversed(hypernym_list):
-        # we'll take care of the distances later
-        graph.add_edge(previous, hypernym.name(), similarity=1.0, distance=1.0)
-        graph.nodes[hypernym.name()]["seed"] = False
-        previous = hypernym.name()
-    return graph
-
-
 def get_nodevec(node, vectors):
     """Get the vector representation of a gloss a wordnet node.
 
@@ -63,7 +45,7 @@ def iterate(transition_matrix, importance, original, alpha):
     This function does a simple iteration. The "jump-back" probability from the paper
     is implemented as a linear superposition of the new and original importance numbers.
     :param transition_matrix: The connectedness matrix of the graph, including similarity weights.
-    :type transition_matrix: :class:`numpy.array`
+    :type transition_matrix: :class:`scipy.sparse.csr_matrix` or :class:`numpy.array`
     :param importance: Current importance vector
     :type importance: :class:`numpy.array`
     :param original: Original importance vector (i.e. aspect counts for leaf nodes, zero otherwise)
@@ -73,7 +55,7 @@ def iterate(transition_matrix, importance, original, alpha):
     :return: the importance vector for the next step of the iteration
     :rtype: :class:`numpy.array`
     """
-    importance = np.matmul(transition_matrix, importance)
+    importance = transition_matrix.dot(importance)
     importance = np.multiply(importance, alpha)
     importance = np.add(
         importance, np.multiply(np.divide(original, np.sum(original)), 1.0 - alpha)
@@ -82,7 +64,90 @@ def iterate(transition_matrix, importance, original, alpha):
     return importance
 
 
-def aggregate(aspects, aspect_counts, synsets_match, vectors):  # noqa: C901
+class GraphCache:
+    """State of the topic graph that a later incremental prediction reuses.
+
+    Holds the cosine distance of every edge between two `wordnet` nodes, keyed by the names of its source and
+    target, and the importance of every node of the last ranking, from which the next ranking starts.
+    """
+
+    def __init__(self, distances=None, importance=None):
+        """Start with the given state.
+
+        :param distances: the distance of each edge, by the names of its source and target
+        :type distances: {(str,str):float}
+        :param importance: the importance of each node, by name
+        :type importance: {str:float}
+        """
+        self.distances = {} if distances is None else distances
+        self.importance = {} if importance is None else importance
+
+
+def rank(
+    transition_matrix,
+    original,
+    alpha=0.5,
+    max_iter=100,
+    tolerance=1e-10,
+    initial=None,
+):
+    """Iterate the importance vector until it changes by less than `tolerance` (L1 norm) between two steps.
+
+    The fixed point doesn't depend on the vector the iteration starts from, but starting close to it, e.g. from
+    the importances of a previous ranking of a similar graph, takes fewer iterations.
+
+    :param transition_matrix: The connectedness matrix of the graph, including similarity weights.
+    :type transition_matrix: :class:`scipy.sparse.csr_matrix` or :class:`numpy.array`
+    :param original: Original importance vector (i.e. aspect counts for leaf nodes, zero otherwise)
+    :type original: :class:`numpy.array`
+    :param alpha: jump-back probability
+    :type alpha: float
+    :param max_iter: maximum number of iterations
+    :type max_iter: int
+    :param tolerance: L1 distance between two consecutive importance vectors at which to stop
+    :type tolerance: float
+    :param initial: the importance vector to start from, `original` if None
+    :type initial: :class:`numpy.array`
+    :return: the importance vector, the number of iterations run and the final L1 residual
+    :rtype: (:class:`numpy.array`, int, float)
+    """
+    if not 0.0 <= alpha <= 1.0:
+        raise ExtraModelError(f"`alpha` must be between 0 and 1, got {alpha}")
+    if max_iter < 1:
+        raise ExtraModelError(f"`max_iter` must be at least 1, got {max_iter}")
+
+    importance = (original if initial is None else initial).copy()
+    residual = np.inf
+    iterations = 0
+    while iterations < max_iter and residual >= tolerance:
+        updated = iterate(transition_matrix, importance, original, alpha)
+        residual = float(np.abs(updated - importance).sum())
+        importance = updated
+        iterations += 1
+
+    if residual >= tolerance:
+        logger.warning(
+            f"Topic importance did not converge after {iterations} iterations, "
+            f"L1 residual {residual:.3g}"
+        )
+    else:
+        logger.info(
+            f"Topic importance converged after {iterations} iterations, "
+            f"L1 residual {residual:.3g}"
+        )
+    return importance, iterations, residual
+
+
+def aggregate(  # noqa: C901
+    aspects,
+    aspect_counts,
+    synsets_match,
+    vectors,
+    alpha=0.5,
+    max_iter=100,
+    tolerance=1e-10,
+    cache=None,
+):
     """Aggregate the aspects by building a tree from the hypernym chains.
 
     Using a page-rank type algorithm to assign importance to the nodes in the graph
@@ -92,9 +157,17 @@ def aggregate(aspects, aspect_counts, synsets_match, vectors):  # noqa: C901
     :param aspect_counts: Map with the aspects as keys and their counts as values
     :type aspect_counts: {str:int}
     :param synsets_match: List of synsets matched to each aspect
-    :type synsets_match: [:class:`nltk.wordnet.Synset`]
+    :type synsets_match: [:class:`extra_model._wordnet.Synset`]
     :param vectors: the vectorizer to use for the embedding
     :type vectors: :class:`extra_model._vectorizer.Vectorizer`
+    :param alpha: jump-back probability of the importance ranking, see :func:`rank`
+    :type alpha: float
+    :param max_iter: maximum number of iterations of the importance ranking
+    :type max_iter: int
+    :param tolerance: L1 tolerance at which the importance ranking stops
+    :type tolerance: float
+    :param cache: edge distances to reuse and the importances to start the ranking from, updated in place
+    :type cache: :class:`GraphCache`
     :return: A list nodes and their importances
     :rtype: [(str,float)]
     """
@@ -109,9 +182,9 @@ def aggregate(aspects, aspect_counts, synsets_match, vectors):  # noqa: C901
             synset_matchnumbers[syns] = 1
 
     # produce the tree from the hypernym chains
-    # a linear graph for every hypernym chain starting from every original
+    # a linear chain for every hypernym path starting from every original
     # aspect
-    linear_graphs = []
+    chains = []
     for noun, meaning in zip(aspects, synsets_match):
         if meaning is None:  # my life, my code
             continue
@@ -119,7 +192,7 @@ def aggregate(aspects, aspect_counts, synsets_match, vectors):  # noqa: C901
         # if only one hypernym path exists we don't have to select by
         # length/number of connected aspects
         if len(hypernym_paths) == 1:
-            linear_graphs.append(path_to_graph(hypernym_paths[0], noun))
+            chains.append((noun, [syns.name() for syns in hypernym_paths[0]]))
             continue
         path_match_nums = [
             np.sum(
@@ -135,138 +208,255 @@ def aggregate(aspects, aspect_counts, synsets_match, vectors):  # noqa: C901
         # chains with equal numbers of attached aspects
         for n in range(len(hypernym_paths)):
             if path_match_nums[n] == max_match:
-                linear_graphs.append(path_to_graph(hypernym_paths[n], noun))
+                chains.append((noun, [syns.name() for syns in hypernym_paths[n]]))
 
     # create the full graph as union of all the hypernym chains and lable
     # leaf-nodes
-    full_tree = nx.compose_all(linear_graphs)
-    # add similarity scores
-    for from_node, to_node in full_tree.edges():
-        # similarity is only useful within wordnet
-        if not full_tree.nodes[from_node]["seed"]:
-            full_tree.edges[from_node, to_node]["distance"] = distance.cosine(
-                get_nodevec(from_node, vectors), get_nodevec(to_node, vectors)
-            )
-            full_tree.edges[from_node, to_node]["similarity"] = (
-                1.0 - full_tree.edges[from_node, to_node]["distance"]
+    full_tree = HypernymGraph.from_chains(chains)
+    if cache is None:
+        cache = GraphCache()
+    # add similarity scores, which are only useful within wordnet
+    nodevecs = {}
+    for edge in np.flatnonzero(~full_tree.seed[full_tree.sources]):
+        key = (
+            full_tree.nodes[full_tree.sources[edge]],
+            full_tree.nodes[full_tree.targets[edge]],
+        )
+        if key not in cache.distances:
+            for node in (full_tree.sources[edge], full_tree.targets[edge]):
+                if node not in nodevecs:
+                    nodevecs[node] = get_nodevec(full_tree.nodes[node], vectors)
+            cache.distances[key] = distance.cosine(
+                nodevecs[full_tree.sources[edge]], nodevecs[full_tree.targets[edge]]
             )
-
-    # Remove loops with steiner approximation
-    seeds = [
-        node for node, node_data in full_tree.nodes(data=True) if node_data["seed"]
-    ]
-    pruned_tree = approximation.steiner_tree(
-        full_tree.to_undirected(), seeds, weight="distance"
-    )
-    pruned_nodes = set(pruned_tree.nodes())
-    nodes_to_remove = set(full_tree.nodes())
-    nodes_to_remove.difference_update(pruned_nodes)
-    full_tree.remove_nodes_from(nodes_to_remove)
-    wordnet_nodes = [
-        node for node, node_data in full_tree.nodes(data=True) if not node_data["seed"]
-    ]
-
-    # produce the similarity matrix
-    transition_matrix = np.zeros((len(wordnet_nodes), len(wordnet_nodes)))
-    # diagonal needs to be unity
-    for n_node in range(len(wordnet_nodes)):
-        transition_matrix[n_node][n_node] = 1.0
-    wordnet_nodes_indices = dict(
-        zip(wordnet_nodes, [i for i in range(len(wordnet_nodes))])
+        full_tree.distance[edge] = cache.distances[key]
+        full_tree.similarity[edge] = 1.0 - full_tree.distance[edge]
+
+    # Remove loops with a steiner tree connecting all the aspects
+    tree_edges = full_tree.steiner_tree(full_tree.seed)
+    keep = np.zeros(full_tree.node_count, dtype=bool)
+    keep[full_tree.sources[tree_edges]] = True
+    keep[full_tree.targets[tree_edges]] = True
+    full_tree = full_tree.subgraph(keep)
+    wordnet_ids = np.flatnonzero(~full_tree.seed)
+    wordnet_nodes = [full_tree.nodes[node] for node in wordnet_ids]
+
+    # position of every graph node in the list of wordnet nodes
+    positions = np.full(full_tree.node_count, -1)
+    positions[wordnet_ids] = np.arange(len(wordnet_ids))
+    from_seed = full_tree.seed[full_tree.sources]
+
+    # produce the similarity matrix, the diagonal needs to be unity
+    diagonal = np.arange(len(wordnet_nodes))
+    transition_matrix = sparse.csr_matrix(
+        (
+            np.concatenate([np.ones(len(diagonal)), full_tree.similarity[~from_seed]]),
+            (
+                np.concatenate([diagonal, positions[full_tree.targets[~from_seed]]]),
+                np.concatenate([diagonal, positions[full_tree.sources[~from_seed]]]),
+            ),
+        ),
+        shape=(len(wordnet_nodes), len(wordnet_nodes)),
     )
-    for from_node, to_node, similarity in full_tree.edges(data="similarity"):
-        if not full_tree.nodes[from_node]["seed"]:  # skip the seed nodes for this
-            transition_matrix[wordnet_nodes_indices[to_node]][
-                wordnet_nodes_indices[from_node]
-            ] = similarity
 
     # start with the an innitial importance weight proportional to the number
     # of mentions of linked aspects in the reviews
-    importance_vec = []
-    for node in wordnet_nodes:
-        imp = 0
-        for neighbor in full_tree.predecessors(node):
-            if full_tree.nodes[neighbor]["seed"]:
-                imp = imp + aspect_counts[neighbor]
-        importance_vec.append(imp)
-
-    importance = np.array(importance_vec)
+    importance = np.zeros(len(wordnet_nodes))
+    np.add.at(
+        importance,
+        positions[full_tree.targets[from_seed]],
+        [aspect_counts[full_tree.nodes[node]] for node in full_tree.sources[from_seed]],
+    )
     importance = np.divide(importance, np.sum(importance))
-    importance_original = importance.copy()
+
+    # start from the importances of the previous ranking, if any, new nodes
+    # start from their initial weight
+    initial = None
+    if cache.importance:
+        initial = np.array(
+            [
+                cache.importance.get(node, weight)
+                for node, weight in zip(wordnet_nodes, importance)
+            ]
+        )
+        initial = np.divide(initial, np.sum(initial))
 
     # find the fixed point of the page-rank-algorithm
-    for i in range(100):
-        importance = iterate(
-            transition_matrix, importance, importance_original, 0.5
-        )  # XXX make alpha configurable
+    importance, iterations, residual = rank(
+        transition_matrix, importance, alpha, max_iter, tolerance, initial
+    )
+    count("rank.iterations", iterations)
+    note("rank_residual", residual)
 
     # sort the resulting topics by importnace
     topics = list(zip(wordnet_nodes, importance))
     topics = sorted(topics, key=lambda pair: pair[1], reverse=True)
+    cache.importance = dict(topics)
     logger.debug(topics)
     return topics, full_tree  # we still need the tree for filtering
 
 
-def traverse_tree(  # noqa: C901
-    node_list, associated_aspects, aspect_counts, full_tree, weighted, direction
-):
-    """Find all hypernyms/hyponyms in the tree to a given node.
-
-    Aggregate the number of associated mentions in the original texts, optionally
-    weighted by term-similarity.
-    :param nodelist: List of nodes from which to gather the subsidiary terms and their initial mentions
-    :type nodelist: [(str,int)]
-    :param associated_aspects:  intermediate map of associated terms, used in recursion, start with an empty map
-    :type associated_aspects: {str:float}
-    :param aspect_counts: List of the pairs of aspects and their counts
-    :type aspect_counts: [(str,int)]
+def weight_aspects(topics, aspect_counts, full_tree, weighted=True):  # noqa: C901
+    """Collect the aspects below each topic, weighted by the similarities along the way down.
+
+    Gives the same result as a breadth-first walk down from every topic, in a single pass over the tree in
+    topological order: an aspect reachable along several paths gets the weight of the path the walk visits
+    first, i.e. the shortest one and, among those, the one through the earliest predecessors.
+    :param topics: the topics from which to collect the aspects
+    :type topics: [str]
+    :param aspect_counts: Map with the aspects as keys and their counts as values
+    :type aspect_counts: {str:int}
     :param full_tree: the graph which is being traversed
-    :type full_tree: :class:`networkx.DiGraph`
+    :type full_tree: :class:`extra_model._graph.HypernymGraph`
     :param weighted: True->similarity weights are used in aggregation. False->weights are assumed to be 1
     :type weighted: Bool
-    :param direction: In which direction to traverse the tree "up" or "down"
-    :type direction: str
-    :return: A map of the resulting terms associated to the initial node and their distance-weighted number of mentions
-    :rtype: {str:float}
+    :return: for each topic, a map of the aspects below it to their weighted number of mentions, in the
+        order the breadth-first walk visits them
+    :rtype: {str:{str:float}}
     """
-    new_nodes = []
-    for node, weight in node_list:
-        for daughter in full_tree.predecessors(node):
-            # we need the directed unpruned graph here to avoid descent from
-            # hypernyms
-            if full_tree.nodes[daughter]["seed"] and daughter not in associated_aspects:
-                associated_aspects[daughter] = aspect_counts[daughter] * weight
-        maybe_daugthers = None
-        if direction == "up":
-            maybe_daugthers = full_tree.neighbors(node)
-        if direction == "down":
-            maybe_daugthers = full_tree.predecessors(node)
-        for daughter in maybe_daugthers:
-            if full_tree.nodes[daughter]["seed"]:  # we already took care of these
-                continue
-            elif weighted:  # go further up/down the tree
-                new_nodes.append(
-                    (
-                        daughter,
-                        weight
-                        * (
-                            full_tree.edges[node, daughter]["similarity"]
-                            if direction == "up"
-                            else full_tree.edges[daughter, node]["similarity"]
-                        ),
+    indptr = full_tree.predecessor_indptr.tolist()
+    incoming = full_tree.predecessor_edges.tolist()
+    sources = full_tree.sources.tolist()
+    similarity = full_tree.similarity.tolist()
+    seed = full_tree.seed.tolist()
+
+    # for every node and topic above it: the first path from the topic to the node
+    # in visiting order (as its depth and the positions among the predecessors along
+    # the way) and the weight along that path
+    paths = [{} for _ in range(full_tree.node_count)]
+    for topic in topics:
+        paths[full_tree.node_ids[topic]][topic] = ((0, ()), 1)
+    visits = {topic: {} for topic in topics}
+    for node in reversed(full_tree.topological_order()):
+        for position, edge in enumerate(incoming[indptr[node] : indptr[node + 1]]):
+            daughter = sources[edge]
+            for topic, ((depth, path), weight) in paths[node].items():
+                if seed[daughter]:
+                    key = (depth, path, position)
+                    visit = visits[topic].get(daughter)
+                    if visit is None or key < visit[0]:
+                        visits[topic][daughter] = (key, weight)
+                    continue
+                key = (depth + 1, path + (position,))
+                current = paths[daughter].get(topic)
+                if current is None or key < current[0]:
+                    paths[daughter][topic] = (
+                        key,
+                        weight * similarity[edge] if weighted else 1,
                     )
-                )
-            else:
-                new_nodes.append((daughter, 1))
-    if len(new_nodes) == 0:
-        return associated_aspects
-    else:
-        return traverse_tree(
-            new_nodes, associated_aspects, aspect_counts, full_tree, weighted, direction
+
+    weighted_aspects = {}
+    for topic, topic_visits in visits.items():
+        weighted_aspects[topic] = {}
+        for daughter, (_, weight) in sorted(
+            topic_visits.items(), key=lambda item: item[1][0]
+        ):
+            name = full_tree.nodes[daughter]
+            weighted_aspects[topic][name] = aspect_counts[name] * weight
+    return weighted_aspects
+
+
+def index_aspects(aspect_counts, full_tree):
+    """Map every wordnet node to the aspects directly attached to it.
+
+    :param aspect_counts: Map with the aspects as keys and their counts as values
+    :type aspect_counts: {str:int}
+    :param full_tree: the graph which is being traversed
+    :type full_tree: :class:`extra_model._graph.HypernymGraph`
+    :return: the attached aspects and their counts for each node, sorted by descending count and, for equal
+        counts, in the order of `aspect_counts`
+    :rtype: {str:[(str,int)]}
+    """
+    ranks = {aspect: rank for rank, aspect in enumerate(aspect_counts)}
+    edges = [
+        edge
+        for edge in np.flatnonzero(full_tree.seed[full_tree.sources])
+        if full_tree.nodes[full_tree.sources[edge]] in ranks
+    ]
+    aspects = [full_tree.nodes[node] for node in full_tree.sources[edges]]
+    targets = full_tree.targets[edges]
+    # sort by node, then by descending count, then by rank
+    order = np.lexsort(
+        (
+            [ranks[aspect] for aspect in aspects],
+            [-aspect_counts[aspect] for aspect in aspects],
+            targets,
+        )
+    )
+    index = {}
+    for position in order:
+        index.setdefault(full_tree.nodes[targets[position]], []).append(
+            (aspects[position], aspect_counts[aspects[position]])
+        )
+    return index
+
+
+def topic_row(shared, topic):
+    """Gather the raw and the distance-weighted terms of a single topic.
+
+    :param shared: the removed topics keyed to the topics they are subsidiary to, the aspects attached to each
+        node (see :func:`index_aspects`), the weighted aspects of each topic (see :func:`weight_aspects`), and
+        the position of each aspect in the aspect counts
+    :type shared: ({str:[str]}, {str:[(str,int)]}, {str:{str:float}}, {str:int})
+    :param topic: the topic and its importance
+    :type topic: (str,float)
+    :return: the row of the topic for the topics dataframe, None if there are no terms attached to the topic
+    :rtype: dict
+    """
+    removed_topics, attached_aspects, weighted_aspects, ranks = shared
+    topic_noun = topic[0]
+    row = {
+        "topic": topic_noun,
+        "importance": topic[1],
+        "rawterms": [],
+        "rawnums": [],
+        "weightedterms": [],
+        "weights": [],
+    }
+    logger.debug("Common terms for aspect {0!s} (by raw number)".format(topic_noun))
+    subsidiaries = removed_topics[topic_noun] + [topic_noun]
+    logger.debug(subsidiaries)
+    # the aspects of all subsidiaries, by descending count and then in order of
+    # the first subsidiary they are attached to, keeping only their first mention
+    raw_aspects = {}
+    for *_, aspect, mentions in heapq.merge(
+        *(
+            [
+                (-mentions, position, ranks[aspect], aspect, mentions)
+                for aspect, mentions in attached_aspects.get(subtopic, [])
+            ]
+            for position, subtopic in enumerate(subsidiaries)
         )
+    ):
+        raw_aspects.setdefault(aspect, mentions)
+    if len(raw_aspects) == 0:
+        logger.debug("No attached terms, skipping")
+        return None
+    ordered_aspects = list(raw_aspects.items())
+    row["rawterms"] = list(list(zip(*ordered_aspects))[0])
+    row["rawnums"] = list(list(zip(*ordered_aspects))[1])
+    for j in range(min(20, len(ordered_aspects))):  # print some exampels
+        logger.debug("{} {}".format(ordered_aspects[j][0], ordered_aspects[j][1]))
+    logger.debug("Common terms for aspect {0!s} (distance weighted)".format(topic_noun))
+    ordered_aspects_weighted = sorted(
+        weighted_aspects[topic_noun].items(),
+        key=lambda pair: pair[1],
+        reverse=True,
+    )
+    row["weightedterms"] = list(list(zip(*ordered_aspects_weighted))[0])
+    row["weights"] = list(list(zip(*ordered_aspects_weighted))[1])
+    for j in range(min(20, len(ordered_aspects_weighted))):
+        logger.debug(
+            "{} {}".format(
+                ordered_aspects_weighted[j][0], ordered_aspects_weighted[j][1]
+            )
+        )
+    return row
 
 
-def collect_topic_info(filtered_topics, removed_topics, aspect_counts, full_tree):
+def collect_topic_info(
+    filtered_topics, removed_topics, aspect_counts, full_tree, n_jobs=1
+):
     """Gather various bits of information into a single DataFrame.
 
     For each topic we store the importance, the list of associated raw text terms and their numbers.
@@ -277,63 +467,24 @@ def collect_topic_info(filtered_topics, removed_topics, aspect_counts, full_tree
     :param aspect_counts: List of the pairs of aspects and their counts
     :type aspect_counts: [(str,int)]
     :param full_tree: the graph which is being traversed
-    :type full_tree: :class:`networkx.DiGraph`
+    :type full_tree: :class:`extra_model._graph.HypernymGraph`
+    :param n_jobs: number of processes to gather the topics in, see :func:`extra_model._parallel.parallel_map`
+    :type n_jobs: int
     :return: the aggregated dataframe of topics
     :rtype: :class:`pandas.DataFrame`
     """
-    row_vec = []
-    for topic in filtered_topics:
-        topic_noun = topic[0]
-        row = {
-            "topic": topic_noun,
-            "importance": topic[1],
-            "rawterms": [],
-            "rawnums": [],
-            "weightedterms": [],
-            "weights": [],
-        }
-        logger.debug("Common terms for aspect {0!s} (by raw number)".format(topic_noun))
-        raw_aspects = {}
-        subsidiaries = removed_topics[topic_noun]
-        subsidiaries.append(topic_noun)
-        logger.debug(subsidiaries)
-        for subtopic in subsidiaries:
-            for aspect, count in aspect_counts.items():
-                if full_tree.has_edge(aspect, subtopic):
-                    raw_aspects[aspect] = count
-        if len(raw_aspects) == 0:
-            logger.debug("No attached terms, skipping")
-            continue
-        ordered_aspects = sorted(
-            raw_aspects.items(), key=lambda pair: pair[1], reverse=True
-        )
-        row["rawterms"] = list(list(zip(*ordered_aspects))[0])
-        row["rawnums"] = list(list(zip(*ordered_aspects))[1])
-        for j in range(min(20, len(ordered_aspects))):  # print some exampels
-            logger.debug("{} {}".format(ordered_aspects[j][0], ordered_aspects[j][1]))
-        logger.debug(
-            "Common terms for aspect {0!s} (distance weighted)".format(topic_noun)
-        )
-        weighted_aspects = traverse_tree(
-            [(topic_noun, 1)],
-            {},
-            aspect_counts,
-            full_tree,
-            weighted=True,
-            direction="down",
-        )
-        ordered_aspects_weighted = sorted(
-            weighted_aspects.items(), key=lambda pair: pair[1], reverse=True
-        )
-        row["weightedterms"] = list(list(zip(*ordered_aspects_weighted))[0])
-        row["weights"] = list(list(zip(*ordered_aspects_weighted))[1])
-        for j in range(min(20, len(ordered_aspects_weighted))):
-            logger.debug(
-                "{} {}".format(
-                    ordered_aspects_weighted[j][0], ordered_aspects_weighted[j][1]
-                )
-            )
-        row_vec.append(row)
+    attached_aspects = index_aspects(aspect_counts, full_tree)
+    weighted_aspects = weight_aspects(
+        [topic[0] for topic in filtered_topics], aspect_counts, full_tree
+    )
+    ranks = {aspect: rank for rank, aspect in enumerate(aspect_counts)}
+    rows = parallel_map(
+        topic_row,
+        filtered_topics,
+        shared=(removed_topics, attached_aspects, weighted_aspects, ranks),
+        n_jobs=n_jobs,
+    )
+    row_vec = [row for row in rows if row is not None]
 
     dataframe_topics = pd.DataFrame(
         row_vec,
@@ -357,13 +508,12 @@ def has_connection(term, prior, full_tree):
     :param prior: second node to test
     :type prior: str
     :param full_tree: the graph which is being traversed
-    :type full_tree: :class:`networkx.DiGraph`
+    :type full_tree: :class:`extra_model._graph.HypernymGraph`
     :return: Do the two nodes have a connection in the directed graph?
     :rtype: Bool
     """
-    if term in nx.descendants(full_tree, prior) or prior in nx.descendants(
-        full_tree, term
-    ):
+    term, prior = full_tree.node_ids[term], full_tree.node_ids[prior]
+    if full_tree.has_path(prior, term) or full_tree.has_path(term, prior):
         return True
     return False
 
@@ -374,7 +524,7 @@ def filter_aggregates(topics, tree):
     :param topics: List of all topics in the graph
     :type topics: [str]
     :param tree: the graph which is being traversed
-    :type tree: :class:`networkx.DiGraph`
+    :type tree: :class:`extra_model._graph.HypernymGraph`
     :return: a tuple of 1) the list of surviving topics, 2) a map of the culled topics keyed to the topics they are subsidiary to
     :rtype: ([str],{str:[str]})
     """
@@ -397,13 +547,73 @@ def filter_aggregates(topics, tree):
     return filtered_topics, removed_topics
 
 
-def get_topics(dataframe_aspects, vectors):
+def match_aspects(
+    dataframe_aspects, vectors, disambiguation="context", context_model=None
+):
+    """Match the distinct aspects to `wordnet` nouns.
+
+    :param dataframe_aspects: the aspect instances with a column `aspect`
+    :type dataframe_aspects: :class:`pandas.DataFrame`
+    :param vectors: provides embeddings for context clustering and wordsense disammbguation
+    :type vectors: :class:`extra_model._vectorizer.Vectorizer`
+    :param disambiguation: word-sense disambiguation method, see :func:`extra_model._disambiguate.match`
+    :type disambiguation: str
+    :param context_model: the clusters to take the contexts from, see :func:`extra_model._disambiguate.match`
+    :type context_model: :class:`extra_model._disambiguate.ContextModel`
+    :return: the aspects with an embedding, most common first, and the name of the matched synset in column
+        `wordnet_node` (None if there is no match)
+    :rtype: :class:`pandas.DataFrame`
+    """
+    aspects, synsets_match = match(
+        Counter(dataframe_aspects["aspect"]),
+        vectors,
+        method=disambiguation,
+        context_model=context_model,
+    )
+    return pd.DataFrame(
+        {
+            "aspect": aspects,
+            "wordnet_node": [
+                synset.name() if synset is not None else None
+                for synset in synsets_match
+            ],
+        },
+        columns=["aspect", "wordnet_node"],
+    )
+
+
+def get_topics(
+    dataframe_aspects,
+    vectors,
+    disambiguation="context",
+    alpha=0.5,
+    max_iter=100,
+    tolerance=1e-10,
+    n_jobs=1,
+    matches=None,
+    cache=None,
+):
     """Generate the semantically clustered topics from the raw aspects.
 
     :param dataframe_aspects: the collection of nouns to be aggregated into topics
     :type dataframe_aspects: :class:`pandas.DataFrame`
     :param vectors: provides embeddings for context clustering and wordsense disammbguation
     :type vectors: :class:`extra_model._vectorizer.Vectorizer`
+    :param disambiguation: word-sense disambiguation method, see :func:`extra_model._disambiguate.match`
+    :type disambiguation: str
+    :param alpha: jump-back probability of the importance ranking, see :func:`rank`
+    :type alpha: float
+    :param max_iter: maximum number of iterations of the importance ranking
+    :type max_iter: int
+    :param tolerance: L1 tolerance at which the importance ranking stops
+    :type tolerance: float
+    :param n_jobs: number of processes for the per-topic work, see :func:`extra_model._parallel.parallel_map`
+    :type n_jobs: int
+    :param matches: the `wordnet` matches of the aspects as returned by :func:`match_aspects`, matched here if None
+    :type matches: :class:`pandas.DataFrame`
+    :param cache: the state of the topic graph of a previous prediction to reuse, updated in place, see
+        :class:`GraphCache`
+    :type cache: :class:`GraphCache`
     :return: The dataframe containing the topics and associated info
     :rtype: :class:`pandas.DataFrame`
     """
@@ -417,21 +627,29 @@ def get_topics(dataframe_aspects, vectors):
 
     # match the aspects to dictionary terms, filtering aspects that can't be
     # mathched
-    aspects, synsets_match = match(aspect_counts, vectors)
-    disambiguation_dict = dict(zip(aspects, synsets_match))
+    if matches is None:
+        matches = match_aspects(dataframe_aspects, vectors, disambiguation)
+    aspects = matches["aspect"].tolist()
+    synset_names = matches["wordnet_node"].tolist()
+    synsets_match = [
+        wn.synset(name) if name is not None else None for name in synset_names
+    ]
+    disambiguation_dict = dict(zip(aspects, synset_names))
     dataframe_aspects.loc[:, "wordnet_node"] = dataframe_aspects["aspect"].apply(
-        lambda aspect: (
-            disambiguation_dict[aspect].name()
-            if (
-                aspect in disambiguation_dict
-                and disambiguation_dict[aspect] is not None
-            )
-            else None
-        )
+        lambda aspect: disambiguation_dict.get(aspect)
     )
 
     # build the hypernym graph
-    topics, full_tree = aggregate(aspects, aspect_counts, synsets_match, vectors)
+    topics, full_tree = aggregate(
+        aspects,
+        aspect_counts,
+        synsets_match,
+        vectors,
+        alpha,
+        max_iter,
+        tolerance,
+        cache,
+    )
 
     # filter the importance ranked topics, so that only one topic within a
     # given hypernym chain remains
@@ -441,7 +659,7 @@ def get_topics(dataframe_aspects, vectors):
 
     # gather information into a more structured format
     dataframe_topics = collect_topic_info(
-        filtered_topics, removed_topics, aspect_counts, full_tree
+        filtered_topics, removed_topics, aspect_counts, full_tree, n_jobs
     )
 
     return dataframe_topics
@@ -3,6 +3,8 @@ import logging
 import numpy as np
 from gensim.models import KeyedVectors
 
+from extra_model._metrics import count
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,12 +35,14 @@ class Vectorizer:
         :return: the embedding vector. Number of dimensions is set by the input file
         :rtype np.array:
         """
+        count("vectorizer.lookups")
         if key.lower() in self.wv_glove.key_to_index:
             return self.wv_glove.get_vector(key.lower(), norm=True)
         else:
             for subword in key.split():
                 if subword.lower() not in self.wv_glove.key_to_index:
                     logger.debug("can't vectorize {0!s}".format(key))
+                    count("vectorizer.misses")
                     return None
             res = np.sum(
                 [
@@ -0,0 +1,555 @@
+"""Compact, memory-mapped snapshot of the parts of WordNet used by Extra.
+
+NLTK's corpus reader parses the WordNet database files lazily and resolves every
+lookup in pure Python, which makes the first access slow and every subsequent call
+expensive. The snapshot stores noun and adjective synsets, the hypernym DAG, the
+lemma-to-synset index, the morphological exception lists and the antonym relations
+as flat numpy arrays that are loaded with `mmap`. The lookups mirror the NLTK API
+(`synsets`, `synset`, `Synset.hypernym_paths`, ...) and reproduce its answers exactly.
+"""
+
+import logging
+import os
+
+import numpy as np
+
+from extra_model._metrics import count
+
+logger = logging.getLogger(__name__)
+
+NOUN = "n"
+ADJ = "a"
+ADJ_SAT = "s"
+POS_LIST = [NOUN, ADJ]
+
+# copied from nltk.corpus.reader.wordnet.WordNetCorpusReader, so that the
+# snapshot lemmatizes exactly like NLTK does
+MORPHOLOGICAL_SUBSTITUTIONS = {
+    NOUN: [
+        ("s", ""),
+        ("ses", "s"),
+        ("ves", "f"),
+        ("xes", "x"),
+        ("zes", "z"),
+        ("ches", "ch"),
+        ("shes", "sh"),
+        ("men", "man"),
+        ("ies", "y"),
+    ],
+    ADJ: [("er", ""), ("est", ""), ("er", "e"), ("est", "e")],
+}
+
+SNAPSHOT_DIRNAME = "wordnet"
+
+
+class Synset:
+    """Lightweight handle to a synset stored in a :class:`WordNet` snapshot.
+
+    Implements the subset of :class:`nltk.corpus.reader.wordnet.Synset` used by Extra.
+    """
+
+    __slots__ = ("_wordnet", "index")
+
+    def __init__(self, wordnet, index):
+        """Create a synset handle.
+
+        :param wordnet: the snapshot the synset belongs to
+        :type wordnet: :class:`WordNet`
+        :param index: position of the synset in the snapshot arrays
+        :type index: int
+        """
+        self._wordnet = wordnet
+        self.index = int(index)
+
+    def name(self):
+        """Return the synset identifier, e.g. `chair.n.01`."""
+        return self._wordnet.synset_name(self.index)
+
+    def pos(self):
+        """Return the part of speech of the synset (`n`, `a` or `s`)."""
+        return self._wordnet.synset_pos(self.index)
+
+    def definition(self):
+        """Return the gloss of the synset."""
+        return self._wordnet.synset_definition(self.index)
+
+    def lemma_names(self):
+        """Return the names of the lemmas of the synset."""
+        return self._wordnet.lemma_names(self.index)
+
+    def antonyms(self):
+        """Return the names of all lemmas that are antonyms of one of the lemmas of the synset."""
+        return self._wordnet.antonym_names(self.index)
+
+    def hypernyms(self):
+        """Return the direct (instance-)hypernyms of the synset."""
+        return [
+            Synset(self._wordnet, index)
+            for index in self._wordnet.hypernym_indices(self.index)
+        ]
+
+    def hypernym_paths(self):
+        """Return all paths from the root of the hierarchy down to this synset.
+
+        :return: list of paths, each starting at the root and ending with this synset
+        :rtype: [[:class:`Synset`]]
+        """
+        return [
+            [Synset(self._wordnet, index) for index in path]
+            for path in self._wordnet.hypernym_path_indices(self.index)
+        ]
+
+    def __eq__(self, other):
+        """Compare two synsets of the same snapshot."""
+        return (
+            isinstance(other, Synset)
+            and self._wordnet is other._wordnet
+            and self.index == other.index
+        )
+
+    def __hash__(self):
+        """Hash by snapshot position."""
+        return hash(self.index)
+
+    def __lt__(self, other):
+        """Order by name, like NLTK does."""
+        return self.name() < other.name()
+
+    def __repr__(self):
+        """Represent the synset like NLTK does."""
+        return "Synset('{}')".format(self.name())
+
+
+def _string_array(strings):
+    """Encode a list of strings into a fixed-width byte array.
+
+    :param strings: the strings to encode
+    :type strings: [str]
+    :return: the encoded array
+    :rtype: :class:`numpy.array`
+    """
+    return np.array([string.encode("utf-8") for string in strings], dtype=np.bytes_)
+
+
+def _csr(lists):
+    """Flatten a list of lists into an `indptr`/`values` pair.
+
+    :param lists: list of integer lists
+    :type lists: [[int]]
+    :return: the offsets of each list and the concatenated values
+    :rtype: (:class:`numpy.array`, :class:`numpy.array`)
+    """
+    indptr = np.zeros(len(lists) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(values) for values in lists])
+    values = np.fromiter(
+        (value for values in lists for value in values),
+        dtype=np.int32,
+        count=int(indptr[-1]),
+    )
+    return indptr, values
+
+
+def _find(keys, key):
+    """Find the position of a string in a sorted byte array.
+
+    :param keys: sorted, fixed-width byte array
+    :type keys: :class:`numpy.array`
+    :param key: the string to look up
+    :type key: str
+    :return: the position of the key, or -1 if it is not present
+    :rtype: int
+    """
+    key = key.encode("utf-8")
+    # longer keys would be silently truncated to the array width by numpy
+    if len(key) > keys.dtype.itemsize or len(keys) == 0:
+        return -1
+    position = int(np.searchsorted(keys, key))
+    if position < len(keys) and keys[position] == key:
+        return position
+    return -1
+
+
+class WordNet:
+    """Read-only WordNet snapshot backed by numpy arrays."""
+
+    NOUN = NOUN
+    ADJ = ADJ
+
+    def __init__(self, arrays):
+        """Wrap a dictionary of snapshot arrays.
+
+        Use :meth:`load` or :meth:`from_nltk` to create an instance.
+
+        :param arrays: the snapshot arrays keyed by name
+        :type arrays: {str: :class:`numpy.array`}
+        """
+        self._arrays = arrays
+        self._names = arrays["names"]
+        self._sorted_names = arrays["sorted_names"]
+        self._name_order = arrays["name_order"]
+        self._pos = arrays["pos"]
+        self._definitions = arrays["definitions"]
+        self._definitions_indptr = arrays["definitions_indptr"]
+        self._hypernyms_indptr = arrays["hypernyms_indptr"]
+        self._hypernyms = arrays["hypernyms"]
+        self._lemma_vocabulary = arrays["lemma_vocabulary"]
+        self._lemmas_indptr = arrays["lemmas_indptr"]
+        self._lemmas = arrays["lemmas"]
+        self._antonyms_indptr = arrays["antonyms_indptr"]
+        self._antonyms = arrays["antonyms"]
+        self._path_cache = {}
+
+    @classmethod
+    def load(cls, folder):
+        """Load a snapshot from disk, memory-mapping all arrays.
+
+        :param folder: the folder written by :meth:`save`
+        :type folder: str
+        :return: the snapshot
+        :rtype: :class:`WordNet`
+        """
+        arrays = {}
+        for filename in os.listdir(folder):
+            if filename.endswith(".npy"):
+                arrays[filename[: -len(".npy")]] = np.load(
+                    os.path.join(folder, filename), mmap_mode="r"
+                )
+        return cls(arrays)
+
+    def save(self, folder):
+        """Write the snapshot arrays to a folder, one `.npy` file per array.
+
+        :param folder: the output folder, created if necessary
+        :type folder: str
+        """
+        os.makedirs(folder, exist_ok=True)
+        for key, array in self._arrays.items():
+            np.save(os.path.join(folder, f"{key}.npy"), np.asarray(array))
+
+    @classmethod
+    def from_nltk(cls, reader=None):  # noqa: C901
+        """Build a snapshot from the NLTK WordNet corpus reader.
+
+        :param reader: the corpus reader to copy, defaults to `nltk.corpus.wordnet`
+        :type reader: :class:`nltk.corpus.reader.wordnet.WordNetCorpusReader`
+        :return: the snapshot
+        :rtype: :class:`WordNet`
+        """
+        if reader is None:
+            from nltk.corpus import wordnet as reader
+        reader.ensure_loaded()
+
+        synsets = list(reader.all_synsets(NOUN)) + list(reader.all_synsets(ADJ))
+        indices = {
+            (synset.pos(), synset.offset()): i for i, synset in enumerate(synsets)
+        }
+
+        def index_of(synset):
+            return indices[(synset.pos(), synset.offset())]
+
+        lemma_vocabulary = sorted(
+            {lemma.name() for synset in synsets for lemma in synset.lemmas()}
+            | {
+                antonym.name()
+                for synset in synsets
+                for lemma in synset.lemmas()
+                for antonym in lemma.antonyms()
+            }
+        )
+        lemma_indices = {name: i for i, name in enumerate(lemma_vocabulary)}
+
+        names = [synset.name() for synset in synsets]
+        definitions = [synset.definition().encode("utf-8") for synset in synsets]
+        definitions_indptr = np.zeros(len(definitions) + 1, dtype=np.int64)
+        definitions_indptr[1:] = np.cumsum([len(text) for text in definitions])
+
+        arrays = {
+            "names": _string_array(names),
+            "sorted_names": np.sort(_string_array(names)),
+            "name_order": np.argsort(_string_array(names)).astype(np.int32),
+            "pos": _string_array([synset.pos() for synset in synsets]),
+            "definitions": np.frombuffer(b"".join(definitions), dtype=np.uint8),
+            "definitions_indptr": definitions_indptr,
+            "lemma_vocabulary": _string_array(lemma_vocabulary),
+        }
+        arrays["hypernyms_indptr"], arrays["hypernyms"] = _csr(
+            [
+                [
+                    index_of(hypernym)
+                    for hypernym in synset.hypernyms() + synset.instance_hypernyms()
+                ]
+                for synset in synsets
+            ]
+        )
+        arrays["lemmas_indptr"], arrays["lemmas"] = _csr(
+            [
+                [lemma_indices[lemma.name()] for lemma in synset.lemmas()]
+                for synset in synsets
+            ]
+        )
+        arrays["antonyms_indptr"], arrays["antonyms"] = _csr(
+            [
+                [
+                    lemma_indices[antonym.name()]
+                    for lemma in synset.lemmas()
+                    for antonym in lemma.antonyms()
+                ]
+                for synset in synsets
+            ]
+        )
+
+        for pos in POS_LIST:
+            # the index of lemma -> synsets, in the (frequency) order of the index files
+            lemma_map = reader._lemma_pos_offset_map
+            forms = sorted(form for form in lemma_map if pos in lemma_map[form])
+            arrays[f"index_{pos}_keys"] = _string_array(forms)
+            arrays[f"index_{pos}_indptr"], arrays[f"index_{pos}_values"] = _csr(
+                [
+                    [
+                        index_of(reader.synset_from_pos_and_offset(pos, offset))
+                        for offset in lemma_map[form][pos]
+                    ]
+                    for form in forms
+                ]
+            )
+            # irregular inflections, e.g. "geese" -> "goose"
+            exceptions = reader._exception_map[pos]
+            exception_forms = sorted(exceptions)
+            exception_values = sorted(
+                {value for form in exception_forms for value in exceptions[form]}
+            )
+            exception_value_indices = {
+                value: i for i, value in enumerate(exception_values)
+            }
+            arrays[f"exceptions_{pos}_keys"] = _string_array(exception_forms)
+            arrays[f"exceptions_{pos}_forms"] = _string_array(exception_values)
+            (
+                arrays[f"exceptions_{pos}_indptr"],
+                arrays[f"exceptions_{pos}_values"],
+            ) = _csr(
+                [
+                    [exception_value_indices[value] for value in exceptions[form]]
+                    for form in exception_forms
+                ]
+            )
+        return cls(arrays)
+
+    def __len__(self):
+        """Return the number of synsets in the snapshot."""
+        return len(self._names)
+
+    def synset_name(self, index):
+        """Return the name of the synset at a given position."""
+        return self._names[index].decode("utf-8")
+
+    def synset_pos(self, index):
+        """Return the part of speech of the synset at a given position."""
+        return self._pos[index].decode("utf-8")
+
+    def synset_definition(self, index):
+        """Return the definition of the synset at a given position."""
+        start, end = (
+            self._definitions_indptr[index],
+            self._definitions_indptr[index + 1],
+        )
+        return bytes(self._definitions[start:end]).decode("utf-8")
+
+    def hypernym_indices(self, index):
+        """Return the positions of the direct (instance-)hypernyms of a synset."""
+        start, end = self._hypernyms_indptr[index], self._hypernyms_indptr[index + 1]
+        return self._hypernyms[start:end].tolist()
+
+    def hypernym_path_indices(self, index):
+        """Return all root-to-synset paths of a synset as lists of positions.
+
+        Follows the same recursion as `nltk`'s `Synset.hypernym_paths`, so paths are
+        returned in the same order. Results are cached per synset.
+
+        :param index: position of the synset
+        :type index: int
+        :return: the paths, each starting at the root and ending with the synset
+        :rtype: [[int]]
+        """
+        return [list(path) for path in self._hypernym_paths(index)]
+
+    def _hypernym_paths(self, index):
+        if index not in self._path_cache:
+            hypernyms = self.hypernym_indices(index)
+            if len(hypernyms) == 0:
+                paths = [(index,)]
+            else:
+                paths = [
+                    path + (index,)
+                    for hypernym in hypernyms
+                    for path in self._hypernym_paths(hypernym)
+                ]
+            self._path_cache[index] = paths
+        return self._path_cache[index]
+
+    def lemma_names(self, index):
+        """Return the lemma names of the synset at a given position."""
+        return [self._lemma_name(i) for i in self.lemma_indices(index)]
+
+    def antonym_names(self, index):
+        """Return the lemma names of all antonyms of the synset at a given position."""
+        return [self._lemma_name(i) for i in self.antonym_indices(index)]
+
+    def lemma_indices(self, index):
+        """Return the lemma-vocabulary positions of the lemmas of a synset."""
+        start, end = self._lemmas_indptr[index], self._lemmas_indptr[index + 1]
+        return self._lemmas[start:end].tolist()
+
+    def antonym_indices(self, index):
+        """Return the lemma-vocabulary positions of the antonyms of a synset."""
+        start, end = self._antonyms_indptr[index], self._antonyms_indptr[index + 1]
+        return self._antonyms[start:end].tolist()
+
+    def _lemma_name(self, lemma_index):
+        return self._lemma_vocabulary[lemma_index].decode("utf-8")
+
+    def synset(self, name):
+        """Look up a synset by its name.
+
+        :param name: the synset identifier, e.g. `chair.n.01`
+        :type name: str
+        :return: the synset
+        :rtype: :class:`Synset`
+        :raises ValueError: if the snapshot has no synset with this name
+        """
+        count("wordnet.synset")
+        position = _find(self._sorted_names, name)
+        if position < 0:
+            raise ValueError(f"No synset named {name} in the WordNet snapshot")
+        return Synset(self, self._name_order[position])
+
+    def _lookup(self, table, key):
+        """Look up a string key in one of the snapshot's `keys`/`indptr`/`values` tables.
+
+        :param table: name prefix of the table, e.g. `index_n`
+        :type table: str
+        :param key: the key to look up
+        :type key: str
+        :return: the integer values stored for the key, or None if the key is missing
+        :rtype: [int]
+        """
+        position = _find(self._arrays[f"{table}_keys"], key)
+        if position < 0:
+            return None
+        indptr = self._arrays[f"{table}_indptr"]
+        start, end = indptr[position], indptr[position + 1]
+        return self._arrays[f"{table}_values"][start:end].tolist()
+
+    def _morphy(self, form, pos):  # noqa: C901
+        """Find the base forms of a word, replicating `nltk`'s `_morphy`."""
+        substitutions = MORPHOLOGICAL_SUBSTITUTIONS[pos]
+
+        def apply_rules(forms):
+            return [
+                form[: -len(old)] + new
+                for form in forms
+                for old, new in substitutions
+                if form.endswith(old)
+            ]
+
+        def filter_forms(forms):
+            result = []
+            for form in forms:
+                if (
+                    form not in result
+                    and self._lookup(f"index_{pos}", form) is not None
+                ):
+                    result.append(form)
+            return result
+
+        # 0. Check the exception lists
+        exceptions = self._lookup(f"exceptions_{pos}", form)
+        if exceptions is not None:
+            base_forms = self._arrays[f"exceptions_{pos}_forms"]
+            return filter_forms(
+                [form] + [base_forms[i].decode("utf-8") for i in exceptions]
+            )
+
+        # 1. Apply rules once to the input
+        forms = apply_rules([form])
+
+        # 2. Return all that are in the database (and check the original too)
+        results = filter_forms([form] + forms)
+        if results:
+            return results
+
+        # 3. If there are no matches, keep applying rules until we find a match
+        while forms:
+            forms = apply_rules(forms)
+            results = filter_forms(forms)
+            if results:
+                return results
+        return []
+
+    def synsets(self, lemma, pos):
+        """Find all synsets of a word for a given part of speech.
+
+        :param lemma: the word to look up, may be inflected
+        :type lemma: str
+        :param pos: the part of speech, either `WordNet.NOUN` or `WordNet.ADJ`
+        :type pos: str
+        :return: the matching synsets, most frequent sense first
+        :rtype: [:class:`Synset`]
+        """
+        count("wordnet.synsets")
+        lemma = lemma.lower()
+        return [
+            Synset(self, index)
+            for form in self._morphy(lemma, pos)
+            for index in self._lookup(f"index_{pos}", form)
+        ]
+
+
+def build(folder):
+    """Build the WordNet snapshot from the NLTK corpus and store it.
+
+    :param folder: the output folder
+    :type folder: str
+    """
+    WordNet.from_nltk().save(folder)
+
+
+class LazyWordNet:
+    """Proxy that loads the WordNet snapshot on first use.
+
+    Mirrors `nltk.corpus.wordnet`, which is a lazy loader as well. Unless
+    :meth:`load` has been called with the location of a prebuilt snapshot, the
+    snapshot is built in memory from the NLTK corpus the first time it's needed.
+    """
+
+    NOUN = NOUN
+    ADJ = ADJ
+
+    def __init__(self):
+        """Create an unloaded proxy."""
+        self._wordnet = None
+
+    def load(self, folder):
+        """Point the proxy at a prebuilt snapshot.
+
+        :param folder: folder containing the snapshot arrays
+        :type folder: str
+        """
+        logger.debug(f"Loading WordNet snapshot from {folder}")
+        self._wordnet = WordNet.load(folder)
+
+    def get(self):
+        """Return the underlying snapshot, building it if needed.
+
+        :rtype: :class:`WordNet`
+        """
+        if self._wordnet is None:
+            logger.debug("No WordNet snapshot loaded, building one from nltk")
+            self._wordnet = WordNet.from_nltk()
+        return self._wordnet
+
+    def __getattr__(self, attribute):
+        """Forward attribute access to the snapshot."""
+        return getattr(self.get(), attribute)
+
+
+wordnet = LazyWordNet()
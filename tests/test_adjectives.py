@@ -5,11 +5,14 @@ import pytest
 from gensim.models import KeyedVectors
 
 from extra_model._adjectives import (
+    AdjectiveGraph,
     adjective_info,
     cluster_adjectives,
+    count_topic_adjectives,
     fill_sentiment_dict,
     sentiments_from_adjectives,
 )
+from extra_model._sentiment import SentimentCache
 from extra_model._vectorizer import Vectorizer
 
 
@@ -53,16 +56,83 @@ def test__cluster_adjectives__common(vec):
     )
 
 
+def test__cluster_adjectives__assigned(vec):
+    # "small" is only close to "little", which is already taken by the cluster of "beautiful"
+    adjective_counts = [("beautiful", 5), ("little", 4), ("small", 3)]
+    assert cluster_adjectives(adjective_counts=adjective_counts, vectorizer=vec) == (
+        ("beautiful", "small"),
+        (9, 3),
+        ([("beautiful", 5), ("little", 4)], [("small", 3)]),
+    )
+
+
+def test__adjective_graph(vec):
+    graph = AdjectiveGraph(["small", "asdf", "little", "small", "Beautiful"], vec)
+    assert graph.adjectives == ["small", "little", "Beautiful"]
+    assert graph.ids == {"small": 0, "little": 1, "Beautiful": 2}
+    assert graph.vectors.shape[0] == 3
+    # neighbours are sorted and include the adjective itself
+    assert graph.neighbours(0).tolist() == [0, 1]
+    assert graph.neighbours(1).tolist() == [0, 1, 2]
+    assert graph.neighbours(2).tolist() == [1, 2]
+
+
+def test__adjective_graph__antonyms(vec):
+    graph = AdjectiveGraph(["Beautiful", "small", "ugly", "little"], vec)
+    assert graph.antonyms(graph.ids["Beautiful"]).tolist() == [graph.ids["ugly"]]
+    assert graph.antonyms(graph.ids["ugly"]).tolist() == [graph.ids["Beautiful"]]
+    assert graph.antonyms(graph.ids["small"]).tolist() == []
+
+
+def test__adjective_graph__empty(vec):
+    graph = AdjectiveGraph(["asdf"], vec)
+    assert graph.adjectives == [] and len(graph.indices) == 0
+
+
+def test__cluster_adjectives__shared_graph(vec):
+    # a graph over a larger vocabulary gives the same clusters as one per topic
+    adjective_counts = [("small", 23), ("little", 22), ("Beautiful", 19), ("Ugly", 1)]
+    graph = AdjectiveGraph(
+        ["Ugly", "asdf", "pretty", "small", "little", "Beautiful"], vec
+    )
+    assert cluster_adjectives(
+        adjective_counts, vectorizer=None, neighbours=graph
+    ) == cluster_adjectives(adjective_counts, vectorizer=vec)
+
+
 def test__fill_sentiment_dict():
     assert fill_sentiment_dict([[("Ugly", 1)]]) == {"Ugly": (-0.5106, -1.0)}
 
 
+def test__fill_sentiment_dict__cache():
+    cache = SentimentCache()
+    cache.scores["Ugly"] = (0.5, 1.0)
+    assert fill_sentiment_dict([[("Ugly", 1)]], cache) == {"Ugly": (0.5, 1.0)}
+
+
 def test__sentiments_from_adjectives():
     assert sentiments_from_adjectives(
         [("pretty", 3), ("ugly", 1)], {"pretty": (0.5, 1), "ugly": (-0.5, -1)}
     ) == (0.25, 0.5)
 
 
+def test__count_topic_adjectives():
+    df_aspects = pandas.DataFrame(
+        {
+            "aspect": ["chair", "table", "chair", "table", "lamp", "chair"],
+            "descriptor": ["small", "big", "big", "small", "big", "big"],
+        }
+    )
+    rawterms = pandas.Series([["chair", "table"], ["table", "table"], [], ["sofa"]])
+    assert count_topic_adjectives(rawterms, df_aspects) == [
+        # ties are broken by first occurrence, as in `Counter.most_common`
+        [("big", 3), ("small", 2)],
+        [("big", 1), ("small", 1)],
+        [],
+        [],
+    ]
+
+
 def test__adjective_info(vec):
     # important part here is to test the inversion of the sentiment of negated adjectives
     df_topics = pandas.DataFrame([{"rawterms": ["chair"]}])
@@ -0,0 +1,125 @@
+import os
+
+import pandas as pd
+import pytest
+
+from extra_model import _checkpoints
+from extra_model._checkpoints import Checkpoints, stage_keys
+from extra_model._errors import ExtraModelError
+
+pytest.importorskip("pyarrow")
+
+PARAMETERS = {"match": {"disambiguation": "context"}, "topics": {"alpha": 0.5}}
+
+
+@pytest.fixture
+def comments():
+    return pd.DataFrame(
+        [
+            {"source_guid": 1, "Comments": "A comfortable chair"},
+            {"source_guid": 2, "Comments": "A wobbly table"},
+        ]
+    )
+
+
+def test__stage_keys(comments):
+    keys = stage_keys(comments, PARAMETERS)
+    assert list(keys) == list(_checkpoints.STAGES)
+    assert stage_keys(comments.copy(), PARAMETERS) == keys
+
+
+def test__stage_keys__input_changed(comments):
+    keys = stage_keys(comments, PARAMETERS)
+    comments.loc[1, "Comments"] = "A sturdy table"
+    # every stage depends on the input
+    changed = stage_keys(comments, PARAMETERS)
+    assert all(changed[stage] != keys[stage] for stage in keys)
+
+
+def test__stage_keys__parameter_changed(comments):
+    keys = stage_keys(comments, PARAMETERS)
+    changed = stage_keys(
+        comments, {"match": {"disambiguation": "context"}, "topics": {"alpha": 0.6}}
+    )
+    # only the stage of the parameter and the ones after it are invalidated
+    assert [changed[stage] == keys[stage] for stage in keys] == [
+        True,
+        True,
+        True,
+        False,
+        False,
+    ]
+
+
+def test__checkpoints__disabled(comments, mocker):
+    checkpoints = Checkpoints(None, comments, PARAMETERS)
+    compute = mocker.Mock(return_value={"texts": comments})
+    assert checkpoints.run("filter", ["texts"], compute)["texts"] is comments
+    assert checkpoints.run("filter", ["texts"], compute)["texts"] is comments
+    assert compute.call_count == 2
+
+
+def test__checkpoints__missing_pyarrow(comments, mocker, tmp_path):
+    mocker.patch.object(_checkpoints, "pyarrow", None)
+    with pytest.raises(ExtraModelError, match="pyarrow"):
+        Checkpoints(tmp_path, comments, PARAMETERS)
+
+
+def test__checkpoints__round_trip(comments, mocker, tmp_path):
+    topics = pd.DataFrame(
+        {
+            "topic": ["chair.n.01", "table.n.02"],
+            "importance": [0.25, 0.125],
+            "rawterms": [["chair", "seat"], ["table"]],
+            "rawnums": [[2, 1], [1]],
+        }
+    )
+    aspects = pd.DataFrame(
+        {"aspect": ["chair", "table"], "wordnet_node": ["chair.n.01", None]}
+    )
+    compute = mocker.Mock(return_value={"topics": topics, "aspects": aspects})
+
+    checkpoints = Checkpoints(tmp_path, comments, PARAMETERS)
+    checkpoints.run("topics", ["topics", "aspects"], compute)
+    loaded = Checkpoints(tmp_path, comments, PARAMETERS).run(
+        "topics", ["topics", "aspects"], compute
+    )
+
+    compute.assert_called_once()
+    pd.testing.assert_frame_equal(loaded["topics"], topics)
+    pd.testing.assert_frame_equal(loaded["aspects"], aspects)
+    # lists, not arrays
+    assert loaded["topics"]["rawterms"][0] == ["chair", "seat"]
+    assert not [path for path in os.listdir(tmp_path) if path.endswith(".tmp")]
+
+
+def test__checkpoints__incomplete(comments, mocker, tmp_path):
+    compute = mocker.Mock(return_value={"topics": comments, "aspects": comments})
+    checkpoints = Checkpoints(tmp_path, comments, PARAMETERS)
+    checkpoints.run("topics", ["topics", "aspects"], compute)
+    os.remove(checkpoints._path("topics", "aspects"))
+
+    checkpoints.run("topics", ["topics", "aspects"], compute)
+
+    assert compute.call_count == 2
+
+
+def test__checkpoints__unreadable(comments, mocker, tmp_path):
+    compute = mocker.Mock(return_value={"texts": comments})
+    checkpoints = Checkpoints(tmp_path, comments, PARAMETERS)
+    with open(checkpoints._path("filter", "texts"), "w") as f:
+        f.write("not parquet")
+
+    loaded = checkpoints.run("filter", ["texts"], compute)
+
+    compute.assert_called_once()
+    pd.testing.assert_frame_equal(
+        checkpoints.load("filter", ["texts"])["texts"], loaded["texts"]
+    )
+
+
+def test__checkpoints__unstorable(comments, tmp_path):
+    checkpoints = Checkpoints(tmp_path, comments, PARAMETERS)
+    # mixed types can't be stored as Parquet, the prediction goes on without a checkpoint
+    checkpoints.save("filter", {"texts": pd.DataFrame({"source_guid": [1, "a"]})})
+    assert os.listdir(tmp_path) == []
@@ -4,7 +4,14 @@ from pathlib import Path
 import pytest
 from click.testing import CliRunner
 
-from extra_model._cli import entrypoint, entrypoint_setup
+from extra_model._cli import (
+    entrypoint,
+    entrypoint_aggregate,
+    entrypoint_extract,
+    entrypoint_serve,
+    entrypoint_setup,
+    show_progress,
+)
 from extra_model._errors import ExtraModelError
 
 
@@ -18,11 +25,24 @@ def run_mock(mocker):
     return mocker.patch("extra_model._cli.run")
 
 
+@pytest.fixture
+def run_batch_mock(mocker):
+    run_batch_mock = mocker.patch("extra_model._cli.run_batch")
+    run_batch_mock.return_value = []
+    return run_batch_mock
+
+
 @pytest.fixture
 def setup_mock(mocker):
     return mocker.patch("extra_model._cli.setup")
 
 
+@pytest.fixture
+def serve_mock(mocker):
+    mocker.patch("extra_model._cli.ExtraModel")
+    return mocker.patch("extra_model._cli.serve")
+
+
 INPUT = "/input"
 OUTPUT = "/output"
 OUTPUT_FILENAME = "result.csv"
@@ -66,7 +86,97 @@ def test_entrypoint__all_options_are_set_and_passed_to_run(cli_runner, run_mock)
     )
 
     run_mock.assert_called_once_with(
-        Path(INPUT), Path(OUTPUT), Path(OUTPUT_FILENAME), Path(EMBEDDINGS_PATH)
+        Path(INPUT),
+        Path(OUTPUT),
+        Path(OUTPUT_FILENAME),
+        Path(EMBEDDINGS_PATH),
+        qa_report=None,
+        metrics_out=None,
+        progress=None,
+        checkpoint_dir=None,
+        state_dir=None,
+        group_by=None,
+        n_jobs=1,
+    )
+
+
+def test_entrypoint__qa_report_set__passed_to_run(cli_runner, run_mock):
+    cli_runner.invoke(
+        entrypoint, [INPUT, "--qa-report", "report.md"], catch_exceptions=False
+    )
+
+    assert run_mock.call_args.kwargs["qa_report"] == Path("report.md")
+
+
+def test_entrypoint__metrics_out_set__passed_to_run(cli_runner, run_mock):
+    cli_runner.invoke(
+        entrypoint, [INPUT, "--metrics-out", "metrics.json"], catch_exceptions=False
+    )
+
+    assert run_mock.call_args.kwargs["metrics_out"] == Path("metrics.json")
+
+
+def test_entrypoint__state_dir_set__passed_to_run(cli_runner, run_mock):
+    cli_runner.invoke(
+        entrypoint, [INPUT, "--state-dir", "state"], catch_exceptions=False
+    )
+
+    assert run_mock.call_args.kwargs["state_dir"] == Path("state")
+
+
+def test_entrypoint__glob__run_batch(cli_runner, run_mock, run_batch_mock):
+    result = cli_runner.invoke(
+        entrypoint, ["/io/*.csv", "-op", OUTPUT, "-j", "4"], catch_exceptions=False
+    )
+
+    assert result.exit_code == 0 and not run_mock.called
+    run_batch_mock.assert_called_once_with(
+        Path("/io/*.csv"), Path(OUTPUT), Path(EMBEDDINGS_PATH), jobs=4
+    )
+
+
+def test_entrypoint__batch_file_failed__exit_code_1(cli_runner, run_batch_mock):
+    run_batch_mock.return_value = [
+        {"input": "/io/a.csv", "error": None},
+        {"input": "/io/b.csv", "error": "ValueError: no aspects"},
+    ]
+
+    result = cli_runner.invoke(entrypoint, ["/io/*.csv"], catch_exceptions=False)
+
+    assert result.exit_code == 1
+
+
+def test_entrypoint__batch_with_state_dir__exit_code_1(cli_runner, run_batch_mock):
+    result = cli_runner.invoke(
+        entrypoint, ["/io/*.csv", "--state-dir", "state"], catch_exceptions=False
+    )
+
+    assert result.exit_code == 1 and not run_batch_mock.called
+
+
+def test_entrypoint__group_by_set__passed_to_run(cli_runner, run_mock):
+    cli_runner.invoke(
+        entrypoint,
+        [INPUT, "--group-by", "ProductClass", "-j", "4"],
+        catch_exceptions=False,
+    )
+
+    assert run_mock.call_args.kwargs["group_by"] == "ProductClass"
+    assert run_mock.call_args.kwargs["n_jobs"] == 4
+
+
+def test_entrypoint__progress_set__display_passed_to_run(cli_runner, run_mock):
+    cli_runner.invoke(entrypoint, [INPUT, "--progress"], catch_exceptions=False)
+
+    assert run_mock.call_args.kwargs["progress"] is show_progress
+
+
+def test_show_progress(capsys):
+    show_progress("aspects", 50, 100, 10.0)
+    show_progress("aspects", 100, 100, 10.0)
+
+    assert capsys.readouterr().err == (
+        "\r  aspects: 50/100 (10.0/s, 5s left)\r  aspects: 100/100 (10.0/s, 0s left)\n"
     )
 
 
@@ -103,3 +213,74 @@ def test_entrypoint_setup__output_path_set__argument_passed_to_setup(
     cli_runner.invoke(entrypoint_setup, [OUTPUT], catch_exceptions=False)
 
     setup_mock.assert_called_once_with(Path(OUTPUT))
+
+
+def test_entrypoint_serve__options_passed_to_serve(cli_runner, serve_mock):
+    result = cli_runner.invoke(
+        entrypoint_serve,
+        ["--port", "9000", "--workers", "2", "--queue-size", "0"],
+        catch_exceptions=False,
+    )
+
+    assert result.exit_code == 0
+    assert serve_mock.call_args.kwargs == {
+        "host": "127.0.0.1",
+        "port": 9000,
+        "socket": None,
+        "workers": 2,
+        "queue_size": 0,
+    }
+
+
+def test_entrypoint_serve__serve_raises_ExtraModelError__exit_code_1(
+    cli_runner, serve_mock
+):
+    serve_mock.side_effect = ExtraModelError
+
+    result = cli_runner.invoke(entrypoint_serve, catch_exceptions=False)
+
+    assert result.exit_code == 1
+
+
+def test_entrypoint_extract__run_extract_called(cli_runner, mocker):
+    run_extract_mock = mocker.patch("extra_model._cli.run_extract")
+
+    result = cli_runner.invoke(
+        entrypoint_extract, [INPUT, "/partials/0"], catch_exceptions=False
+    )
+
+    assert result.exit_code == 0
+    run_extract_mock.assert_called_once_with(Path(INPUT), Path("/partials/0"))
+
+
+def test_entrypoint_aggregate__run_aggregate_called(cli_runner, mocker):
+    run_aggregate_mock = mocker.patch("extra_model._cli.run_aggregate")
+
+    result = cli_runner.invoke(
+        entrypoint_aggregate,
+        ["/partials/0", "/partials/1", "-op", OUTPUT, "-j", "2"],
+        catch_exceptions=False,
+    )
+
+    assert result.exit_code == 0
+    run_aggregate_mock.assert_called_once_with(
+        [Path("/partials/0"), Path("/partials/1")],
+        Path(OUTPUT),
+        Path(OUTPUT_FILENAME),
+        Path(EMBEDDINGS_PATH),
+        qa_report=None,
+        metrics_out=None,
+        n_jobs=2,
+    )
+
+
+def test_entrypoint_aggregate__run_aggregate_raises_ExtraModelError__exit_code_1(
+    cli_runner, mocker
+):
+    mocker.patch("extra_model._cli.run_aggregate", side_effect=ExtraModelError)
+
+    result = cli_runner.invoke(
+        entrypoint_aggregate, ["/partials/0"], catch_exceptions=False
+    )
+
+    assert result.exit_code == 1
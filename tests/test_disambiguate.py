@@ -5,7 +5,15 @@ from collections import Counter
 import pytest
 from gensim.models import KeyedVectors
 
-from extra_model._disambiguate import best_cluster, cluster, match, vectorize_aspects
+from extra_model._disambiguate import (
+    ContextModel,
+    best_cluster,
+    cluster,
+    find_synsets,
+    match,
+    vectorize_aspects,
+)
+from extra_model._errors import ExtraModelError
 from extra_model._vectorizer import Vectorizer
 
 
@@ -78,6 +86,36 @@ def test__cluster(vec_cluster, mocker):
     )
 
 
+def test__context_model__unseen_aspect(vec_cluster, mocker):
+    mocker.patch("extra_model._disambiguate.best_cluster", return_value=2)
+    aspects = ["table", "chair", "arm"]
+    model = ContextModel.fit(
+        aspects, [vec_cluster.get_vector(aspect) for aspect in aspects]
+    )
+    assert model.members == {
+        model.labels["table"]: ["table", "chair"],
+        model.labels["arm"]: ["arm"],
+    }
+
+    # "leg" is closest to "arm", whose cluster becomes its context
+    contexts = model.contexts(
+        ["chair", "leg"],
+        [vec_cluster.get_vector("chair"), vec_cluster.get_vector("leg")],
+        vec_cluster,
+    )
+    assert (contexts[0] == vec_cluster.get_vector("table")).all()
+    assert (contexts[1] == vec_cluster.get_vector("arm")).all()
+    assert "leg" not in model.labels
+
+
+def test__context_model__too_few(vec_cluster):
+    aspects = ["table", "chair"]
+    with pytest.raises(ExtraModelError, match="at least 3 aspects"):
+        ContextModel.fit(
+            aspects, [vec_cluster.get_vector(aspect) for aspect in aspects]
+        )
+
+
 def test__match(vec):
     # mostly an integration test.
     aspects, synsets = match(
@@ -108,3 +146,46 @@ def test__match(vec):
         and synsets[2].name() == "table.n.03"  # disambiguation failure
         and not synsets[3]  # no synset for the unknown word
     )
+
+
+def test__find_synsets__compound_falls_back_to_constituents():
+    assert [synset.name() for synset in find_synsets("asdf chair")] == [
+        synset.name() for synset in find_synsets("chair")
+    ]
+    assert find_synsets("asdf") == []
+
+
+def test__match__first_sense(vec_cluster, mocker):
+    cluster_mock = mocker.patch("extra_model._disambiguate.cluster")
+    aspects, synsets = match(
+        Counter(["table", "table", "table", "chair", "chair", "arm", "asdf"]),
+        vec_cluster,
+        method="first_sense",
+    )
+    cluster_mock.assert_not_called()
+    # same output format as the context based disambiguation
+    assert aspects == ["table", "chair", "arm"]
+    assert [synset.name() for synset in synsets] == [
+        "table.n.01",
+        "chair.n.01",
+        "arm.n.01",
+    ]
+
+
+def test__match__similarity_skips_clustering(vec_cluster, mocker):
+    cluster_mock = mocker.patch("extra_model._disambiguate.cluster")
+    # the test embeddings don't cover the glosses
+    mocker.patch(
+        "extra_model._disambiguate.tokenize.word_tokenize", return_value=["leg"]
+    )
+    aspects, synsets = match(
+        Counter(["table", "table", "chair"]), vec_cluster, method="similarity"
+    )
+    cluster_mock.assert_not_called()
+    assert aspects == ["table", "chair"]
+    assert len(synsets) == 2
+
+
+def test__match__unknown_method(vec_cluster):
+    with pytest.raises(ExtraModelError, match="disambiguation"):
+        match(Counter(["table"]), vec_cluster, method="asdf")
@@ -1,7 +1,8 @@
 import pandas as pd
 import pytest
 
-from extra_model._filter import filter
+from extra_model._filter import detect_languages, filter
+from extra_model._progress import reporting
 
 
 @pytest.fixture()
@@ -49,3 +50,14 @@ def test__no_unreadable_characters(cleaned_dataset):
 def test__proper_comment_is_retained(cleaned_dataset):
     ids = cleaned_dataset["id"].tolist()
     assert "good" in ids
+
+
+def test__detect_languages__progress(mocker):
+    mocker.patch("extra_model._filter.LANGUAGE_CHUNK", 2)
+    mocker.patch("extra_model._progress.INTERVAL", 0)
+    callback = mocker.Mock()
+    with reporting(callback):
+        languages = detect_languages(["This is an example of English comment"] * 3)
+    assert languages == ["en"] * 3
+    # one report per chunk
+    assert [call.args[1] for call in callback.call_args_list] == [2, 3]
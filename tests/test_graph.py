@@ -0,0 +1,201 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from extra_model._graph import HypernymGraph
+from extra_model._wordnet import wordnet as wn
+
+
+@pytest.fixture()
+def chains():
+    # two aspects sharing the top of their chains, "b" is reached via two paths
+    return [
+        ("x", ["r", "a", "b"]),
+        ("y", ["r", "c", "b"]),
+        ("z", ["r", "c"]),
+    ]
+
+
+def test__from_chains__nodes(chains):
+    graph = HypernymGraph.from_chains(chains)
+    assert graph.nodes == ["x", "b", "a", "r", "y", "c", "z"]
+    assert graph.seed.tolist() == [True, False, False, False, True, False, True]
+    assert graph.node_count == 7
+    assert graph.edge_count == 7
+
+
+def test__from_chains__matches_networkx(chains):
+    graph = HypernymGraph.from_chains(chains)
+    linear_graphs = []
+    for aspect, hypernyms in chains:
+        linear_graph = nx.DiGraph()
+        nx.add_path(linear_graph, [aspect] + hypernyms[::-1])
+        linear_graphs.append(linear_graph)
+    reference = nx.compose_all(linear_graphs)
+    assert graph.nodes == list(reference.nodes)
+    for node_id, node in enumerate(graph.nodes):
+        assert [graph.nodes[i] for i in graph.successors(node_id)] == list(
+            reference.successors(node)
+        )
+        assert [graph.nodes[i] for i in graph.predecessors(node_id)] == list(
+            reference.predecessors(node)
+        )
+
+
+def test__from_chains__empty():
+    graph = HypernymGraph.from_chains([])
+    assert graph.node_count == 0 and graph.edge_count == 0
+
+
+def test__reachable__chains(chains):
+    graph = HypernymGraph.from_chains(chains)
+    ids = graph.node_ids
+    assert graph.reachable()[ids["x"]] == {ids["b"], ids["a"], ids["c"], ids["r"]}
+    assert graph.reachable()[ids["r"]] == set()
+
+
+def test__subgraph(chains):
+    graph = HypernymGraph.from_chains(chains)
+    graph.similarity[:] = np.arange(graph.edge_count)
+    subgraph = graph.subgraph([node != "a" for node in graph.nodes])
+    ids = subgraph.node_ids
+    assert subgraph.nodes == ["x", "b", "r", "y", "c", "z"]
+    assert subgraph.edge_count == 5
+    assert [subgraph.nodes[i] for i in subgraph.predecessors(ids["c"])] == ["b", "z"]
+    edge = subgraph.successor_edges(ids["c"])[0]
+    assert (
+        subgraph.similarity[edge]
+        == graph.similarity[graph.successor_edges(graph.node_ids["c"])[0]]
+    )
+
+
+def to_networkx(graph):
+    # undirected reference graph with a `distance` edge attribute
+    undirected = nx.Graph()
+    undirected.add_nodes_from(graph.nodes)
+    undirected.add_weighted_edges_from(
+        zip(
+            [graph.nodes[i] for i in graph.sources],
+            [graph.nodes[i] for i in graph.targets],
+            graph.distance.tolist(),
+        ),
+        weight="distance",
+    )
+    return undirected
+
+
+def tree_weight(graph, edges):
+    return graph.distance[edges].sum()
+
+
+def networkx_weight(graph):
+    seeds = [node for node, seed in zip(graph.nodes, graph.seed) if seed]
+    tree = nx.approximation.steiner_tree(
+        to_networkx(graph), seeds, weight="distance", method="kou"
+    )
+    return tree.size(weight="distance")
+
+
+def test__steiner_tree__tree():
+    # a tree with a dangling hypernym chain that is not needed to connect the seeds
+    graph = HypernymGraph.from_chains(
+        [("x", ["r", "a"]), ("y", ["r", "b"]), ("z", ["r", "b", "c", "d"])]
+    )
+    graph.distance[:] = np.arange(1, graph.edge_count + 1)
+    edges = graph.steiner_tree(graph.seed)
+    assert sorted(
+        (graph.nodes[graph.sources[edge]], graph.nodes[graph.targets[edge]])
+        for edge in edges
+    ) == sorted(
+        [
+            ("x", "a"),
+            ("a", "r"),
+            ("y", "b"),
+            ("b", "r"),
+            ("z", "d"),
+            ("d", "c"),
+            ("c", "b"),
+        ]
+    )
+    assert tree_weight(graph, edges) == pytest.approx(networkx_weight(graph))
+
+
+def test__steiner_tree__prunes_leaves():
+    graph = HypernymGraph(
+        ["x", "a", "b", "y"], [True, False, False, True], [0, 1, 3], [1, 2, 1]
+    )
+    edges = graph.steiner_tree(graph.seed)
+    assert edges.tolist() == [0, 2]
+
+
+def test__steiner_tree__cycle(chains):
+    # "x" reaches "r" via "a" and "c", the cheaper path has to be picked
+    graph = HypernymGraph.from_chains(chains)
+    weights = {("x", "b"): 1, ("b", "a"): 5, ("a", "r"): 5}
+    graph.distance[:] = [
+        weights.get((graph.nodes[source], graph.nodes[target]), 1)
+        for source, target in zip(graph.sources, graph.targets)
+    ]
+    edges = graph.steiner_tree(graph.seed)
+    nodes = {graph.nodes[node] for node in graph.sources[edges]} | {
+        graph.nodes[node] for node in graph.targets[edges]
+    }
+    assert nodes == {"x", "b", "y", "c", "z"}
+    assert tree_weight(graph, edges) == pytest.approx(networkx_weight(graph))
+
+
+def test__steiner_tree__wordnet():
+    # real hypernym chains with multiple inheritance and random distances
+    chains = []
+    for word in ["person", "coffee", "water", "dog", "table", "light", "chair"]:
+        for path in wn.synsets(word, pos=wn.NOUN)[0].hypernym_paths():
+            chains.append((word, [synset.name() for synset in path]))
+    graph = HypernymGraph.from_chains(chains)
+    graph.distance[:] = np.random.default_rng(0).uniform(0.1, 1.0, graph.edge_count)
+    edges = graph.steiner_tree(graph.seed)
+    # the result is a tree that spans all seeds
+    tree = to_networkx(graph).edge_subgraph(
+        (graph.nodes[graph.sources[edge]], graph.nodes[graph.targets[edge]])
+        for edge in edges
+    )
+    assert nx.is_tree(tree)
+    assert set(node for node, seed in zip(graph.nodes, graph.seed) if seed) <= set(
+        tree.nodes
+    )
+    assert tree_weight(graph, edges) == pytest.approx(networkx_weight(graph))
+
+
+def test__topological_order(chains):
+    graph = HypernymGraph.from_chains(chains)
+    position = {node: i for i, node in enumerate(graph.topological_order())}
+    assert len(position) == graph.node_count
+    for source, target in zip(graph.sources, graph.targets):
+        assert position[source] < position[target]
+
+
+def test__topological_order__cycle():
+    graph = HypernymGraph(["a", "b"], [False, False], [0, 1], [1, 0])
+    with pytest.raises(ValueError):
+        graph.topological_order()
+
+
+def test__reachable(chains):
+    graph = HypernymGraph.from_chains(chains)
+    reference = nx.DiGraph(
+        (graph.nodes[source], graph.nodes[target])
+        for source, target in zip(graph.sources, graph.targets)
+    )
+    for node_id, node in enumerate(graph.nodes):
+        assert {graph.nodes[i] for i in graph.reachable()[node_id]} == nx.descendants(
+            reference, node
+        )
+
+
+def test__has_path(chains):
+    graph = HypernymGraph.from_chains(chains)
+    ids = graph.node_ids
+    assert graph.has_path(ids["x"], ids["r"])
+    assert graph.has_path(ids["x"], ids["c"])
+    assert not graph.has_path(ids["r"], ids["x"])
+    assert not graph.has_path(ids["x"], ids["x"])
+    assert not graph.has_path(ids["x"], ids["y"])
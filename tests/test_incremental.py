@@ -0,0 +1,183 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from extra_model import _incremental
+from extra_model._disambiguate import ContextModel
+from extra_model._errors import ExtraModelError
+from extra_model._incremental import RunState
+from extra_model._topics import GraphCache
+
+pytest.importorskip("pyarrow")
+
+PARAMETERS = {"disambiguation": "first_sense", "embedding_type": "glove"}
+
+
+def aspects_of(cid, words):
+    return pd.DataFrame(
+        {
+            "CiD": [cid] * len(words),
+            "position": list(range(len(words))),
+            "aspect": words,
+            "descriptor": ["good"] * len(words),
+            "is_negated": [False] * len(words),
+        }
+    )
+
+
+def texts_of(start, comments):
+    return pd.DataFrame(
+        {"source_guid": comments, "Comments": comments},
+        index=pd.RangeIndex(start, start + len(comments)),
+    )
+
+
+def matches_of(aspects):
+    return pd.DataFrame(
+        {"aspect": aspects, "wordnet_node": [f"{aspect}.n.01" for aspect in aspects]}
+    )
+
+
+def test__run_state__add():
+    state = RunState(PARAMETERS)
+    unseen = state.add(texts_of(0, ["a"]), aspects_of(0, ["chair", "table"]))
+    assert unseen["aspect"].tolist() == ["chair", "table"]
+    assert state.text_count == 1
+
+    unseen = state.add(texts_of(1, ["b", "c"]), aspects_of(2, ["table", "lamp"]))
+    assert unseen["aspect"].tolist() == ["lamp"]
+    assert state.text_count == 3
+    assert state.texts.index.tolist() == [0, 1, 2]
+    assert state.aspects["CiD"].tolist() == [0, 0, 2, 2]
+    assert state.aspects.index.tolist() == [0, 1, 2, 3]
+
+
+def test__run_state__same_comments_twice():
+    state = RunState(PARAMETERS)
+    state.add(texts_of(0, ["a", "b"]), aspects_of(0, ["chair", "table"]))
+
+    texts = state.new_texts(texts_of(0, ["a", "b"]))
+    assert texts.empty
+    state.add(texts, aspects_of(0, []))
+    assert state.text_count == 2
+    assert state.aspects["aspect"].tolist() == ["chair", "table"]
+
+    # only the new comment is kept, indexed after those of the state
+    texts = state.new_texts(texts_of(0, ["b", "c"]))
+    assert texts["source_guid"].tolist() == ["c"]
+    assert texts.index.tolist() == [2]
+
+
+def test__run_state__add__known_comments():
+    state = RunState(PARAMETERS)
+    state.add(texts_of(0, ["a"]), aspects_of(0, ["chair"]))
+    with pytest.raises(ExtraModelError, match="already in the state"):
+        state.add(texts_of(1, ["a"]), aspects_of(1, ["table"]))
+    assert state.text_count == 1
+
+
+def test__run_state__match(mocker):
+    match_aspects = mocker.patch(
+        "extra_model._incremental.match_aspects",
+        side_effect=lambda aspects, *_: matches_of(list(dict.fromkeys(aspects.aspect))),
+    )
+    state = RunState(PARAMETERS)
+    unseen = state.add(texts_of(0, ["a"]), aspects_of(0, ["chair", "table"]))
+    state.match(unseen, None, "first_sense")
+    unseen = state.add(
+        texts_of(1, ["b"]), aspects_of(1, ["table", "lamp", "lamp", "lamp"])
+    )
+
+    matches = state.match(unseen, None, "first_sense")
+
+    # only the new aspect is matched
+    assert match_aspects.call_args[0][0]["aspect"].tolist() == ["lamp", "lamp", "lamp"]
+    # most common first, as for a prediction on all comments
+    assert matches["aspect"].tolist() == ["lamp", "table", "chair"]
+    assert state.context_model is None
+
+
+def test__run_state__match__context_refit(mocker):
+    mocker.patch(
+        "extra_model._incremental.vectorize_aspects",
+        side_effect=lambda counts, _: (list(counts), [[0.0]] * len(counts)),
+    )
+    fit = mocker.patch(
+        "extra_model._incremental.ContextModel.fit",
+        side_effect=lambda aspects, _: ContextModel(
+            {aspect: 0 for aspect in aspects}, [[0.0]]
+        ),
+    )
+    match_aspects = mocker.patch(
+        "extra_model._incremental.match_aspects",
+        side_effect=lambda aspects, *_: matches_of(list(dict.fromkeys(aspects.aspect))),
+    )
+    state = RunState(PARAMETERS)
+    words = ["chair", "table", "lamp", "desk"]
+    state.match(state.add(texts_of(0, ["a"]), aspects_of(0, words)), None, "context")
+    assert fit.call_count == 1
+
+    # five aspects are fewer than 1.5 times the four clustered ones
+    unseen = state.add(texts_of(1, ["b"]), aspects_of(1, ["sofa"]))
+    state.match(unseen, None, "context")
+    assert fit.call_count == 1
+    assert match_aspects.call_args[0][0]["aspect"].tolist() == ["sofa"]
+
+    # six are not, all aspects are clustered and matched again
+    unseen = state.add(texts_of(2, ["c"]), aspects_of(2, ["bed"]))
+    matches = state.match(unseen, None, "context")
+    assert fit.call_count == 2
+    assert len(state.context_model.labels) == 6
+    assert sorted(matches["aspect"]) == sorted(words + ["sofa", "bed"])
+
+
+def test__run_state__round_trip(tmp_path):
+    state = RunState(PARAMETERS)
+    state.add(texts_of(0, ["a", "b"]), aspects_of(1, ["chair", "table"]))
+    state.matches = pd.DataFrame(
+        {"aspect": ["chair", "table"], "wordnet_node": ["chair.n.01", None]}
+    )
+    state.context_model = ContextModel(
+        {"chair": 0, "table": 1}, np.array([[1.0, 0.0], [0.0, 1.0]])
+    )
+    state.cache = GraphCache(
+        {("chair.n.01", "seat.n.03"): 0.25}, {"seat.n.03": 0.5, "chair.n.01": 0.5}
+    )
+    folder = tmp_path / "state"
+    state.save(folder)
+    # saving again replaces the state
+    state.save(folder)
+
+    loaded = RunState.load(folder, PARAMETERS)
+
+    pd.testing.assert_frame_equal(loaded.texts, state.texts)
+    pd.testing.assert_frame_equal(loaded.aspects, state.aspects)
+    pd.testing.assert_frame_equal(loaded.matches, state.matches)
+    assert loaded.context_model.labels == state.context_model.labels
+    assert (loaded.context_model.centers == state.context_model.centers).all()
+    assert loaded.cache.distances == state.cache.distances
+    assert loaded.cache.importance == state.cache.importance
+    assert sorted(os.listdir(tmp_path)) == ["state"]
+
+
+def test__run_state__load__new(tmp_path):
+    state = RunState.load(tmp_path / "state", PARAMETERS)
+    assert state.text_count == 0 and state.matches is None
+
+
+def test__run_state__load__other_parameters(tmp_path):
+    state = RunState(PARAMETERS)
+    state.add(texts_of(0, ["a"]), aspects_of(0, ["chair"]))
+    state.matches = matches_of(["chair"])
+    state.save(tmp_path / "state")
+
+    with pytest.raises(ExtraModelError, match="start a new state"):
+        RunState.load(tmp_path / "state", {**PARAMETERS, "disambiguation": "context"})
+
+
+def test__run_state__missing_pyarrow(mocker, tmp_path):
+    mocker.patch.object(_incremental, "pyarrow", None)
+    with pytest.raises(ExtraModelError, match="pyarrow"):
+        RunState.load(tmp_path, PARAMETERS)
@@ -0,0 +1,84 @@
+import tracemalloc
+
+from extra_model._metrics import Metrics, collect, count, note, stage
+
+
+def test__count__not_collecting():
+    # must not fail, nor leak into later collections
+    count("lookups")
+    with collect() as metrics:
+        pass
+    assert metrics.to_dict() == {"stages": [], "counters": {}}
+
+
+def test__stage__not_collecting():
+    with stage("filter") as record:
+        record["rows"] = 3
+
+
+def test__collect():
+    with collect() as metrics:
+        with stage("filter") as record:
+            count("lookups")
+            count("lookups", 2)
+            record["rows"] = 3
+        with stage("aspects"):
+            count("fits")
+    report = metrics.to_dict()
+    assert [record["name"] for record in report["stages"]] == ["filter", "aspects"]
+    assert report["stages"][0]["rows"] == 3
+    assert report["stages"][1]["rows"] is None
+    for record in report["stages"]:
+        assert record["wall_time"] >= 0 and record["cpu_time"] >= 0
+        assert "peak_traced" not in record
+    assert report["counters"] == {"fits": 1, "lookups": 3}
+    # nothing is recorded after the context is left
+    count("lookups")
+    assert metrics.counters["lookups"] == 3
+
+
+def test__note():
+    # must not fail outside of a collection or a stage
+    note("residual", 0.5)
+    with collect() as metrics:
+        note("residual", 0.5)
+        with stage("topics"):
+            with stage("rank"):
+                note("iterations", 3)
+            note("residual", 0.25)
+    topics, rank = sorted(
+        metrics.to_dict()["stages"], key=lambda r: r["name"] != "topics"
+    )
+    assert topics["residual"] == 0.25 and "iterations" not in topics
+    assert rank["iterations"] == 3 and "residual" not in rank
+
+
+def test__collect__nested():
+    with collect() as outer:
+        with collect() as inner:
+            count("lookups")
+        count("fits")
+    assert inner.counters == {"lookups": 1}
+    assert outer.counters == {"fits": 1}
+
+
+def test__stage__exception():
+    metrics = Metrics()
+    try:
+        with metrics.stage("topics"):
+            raise ValueError
+    except ValueError:
+        pass
+    assert metrics.stages[0]["name"] == "topics"
+
+
+def test__stage__tracemalloc():
+    tracemalloc.start()
+    try:
+        with collect() as metrics:
+            with stage("aspects"):
+                data = bytearray(10**6)
+    finally:
+        tracemalloc.stop()
+    del data
+    assert metrics.stages[0]["peak_traced"] >= 10**6
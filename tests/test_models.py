@@ -5,6 +5,7 @@ import pandas as pd
 import pytest
 
 from extra_model._models import ExtraModelBase, ModelBase, extra_factory
+from extra_model._partials import Partial
 
 ExtraModel = extra_factory()
 
@@ -132,3 +133,141 @@ def test_predict(tmp_trained_ExtraModel, test_comments):
     ]
     res = tmp_trained_ExtraModel.predict(comments=test_comments_2)
     assert len(res) > 0
+
+
+def test_predict_incremental(tmp_trained_ExtraModel, test_comments, tmp_path):
+    pytest.importorskip("pyarrow")
+    tmp_trained_ExtraModel.disambiguation = "similarity"
+    full = pd.DataFrame(tmp_trained_ExtraModel.predict(comments=test_comments))
+
+    state_dir = tmp_path / "state"
+    tmp_trained_ExtraModel.predict_incremental(test_comments[:60], state_dir)
+    res = pd.DataFrame(
+        tmp_trained_ExtraModel.predict_incremental(test_comments[60:], state_dir)
+    )
+
+    # only the importances can differ, by about the tolerance of the ranking
+    importance = tmp_trained_ExtraModel.api_spec_names["importance"]
+    pd.testing.assert_frame_equal(
+        res.drop(columns=importance), full.drop(columns=importance)
+    )
+    assert res[importance].tolist() == pytest.approx(
+        full[importance].tolist(), abs=1e-8
+    )
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_predict_grouped__failed_group(mocker, tmp_path, n_jobs, caplog):
+    model = ExtraModel(models_folder=tmp_path, n_jobs=n_jobs)
+    model.is_trained = True
+    model.vectorizer = None
+    texts = pd.DataFrame(
+        {
+            "source_guid": [1, 2, 3],
+            "Comments": ["a", "b", "c"],
+            "Group": ["chairs", "lamps", "chairs"],
+        }
+    )
+    aspects = pd.DataFrame({"CiD": [0, 1, 2], "aspect": ["chair", "lamp", "seat"]})
+    mocker.patch("extra_model._models.filter", return_value=texts)
+    mocker.patch("extra_model._models.generate_aspects", return_value=aspects)
+
+    def get_topics(dataframe_aspects, *args, **kwargs):
+        if "lamp" in dataframe_aspects["aspect"].tolist():
+            # as `best_cluster` does for too few aspects
+            raise IndexError("list index out of range")
+        return pd.DataFrame()
+
+    mocker.patch("extra_model._models.get_topics", side_effect=get_topics)
+    mocker.patch.object(
+        ExtraModelBase,
+        "_finish",
+        side_effect=lambda texts, aspects, topics: [
+            {"Aspect": aspect} for aspect in aspects["aspect"]
+        ],
+    )
+
+    res = model.predict_grouped(texts.to_dict("records"), "Group")
+
+    assert res == [
+        {"Group": "chairs", "Aspect": "chair"},
+        {"Group": "chairs", "Aspect": "seat"},
+    ]
+    assert "lamps" in caplog.text
+
+
+def test_predict_grouped__all_groups_failed(mocker, tmp_path):
+    model = ExtraModel(models_folder=tmp_path)
+    model.is_trained = True
+    model.vectorizer = None
+    texts = pd.DataFrame({"source_guid": [1], "Comments": ["a"], "Group": ["lamps"]})
+    mocker.patch("extra_model._models.filter", return_value=texts)
+    mocker.patch(
+        "extra_model._models.generate_aspects",
+        return_value=pd.DataFrame({"CiD": [0], "aspect": ["lamp"]}),
+    )
+    mocker.patch("extra_model._models.get_topics", side_effect=IndexError)
+
+    with pytest.raises(ValueError, match="No group"):
+        model.predict_grouped(texts.to_dict("records"), "Group")
+
+
+def test_aggregate(tmp_trained_ExtraModel, test_comments):
+    partials = [
+        Partial.extract(test_comments[:40]),
+        Partial.extract(test_comments[40:]),
+    ]
+
+    # the partials of consecutive shards give the records of a prediction on all comments
+    assert tmp_trained_ExtraModel.aggregate(partials) == tmp_trained_ExtraModel.predict(
+        comments=test_comments
+    )
+
+
+def test_predict_grouped(tmp_trained_ExtraModel, test_comments):
+    comments = [
+        {**comment, "Group": "even" if i % 2 == 0 else "odd"}
+        for i, comment in enumerate(test_comments)
+    ]
+    res = pd.DataFrame(tmp_trained_ExtraModel.predict_grouped(comments, "Group"))
+
+    # each group gets the records of a prediction on its comments alone
+    for group in ["even", "odd"]:
+        expected = pd.DataFrame(
+            tmp_trained_ExtraModel.predict(
+                comments=[
+                    {"CommentId": c["CommentId"], "Comments": c["Comments"]}
+                    for c in comments
+                    if c["Group"] == group
+                ]
+            )
+        )
+        pd.testing.assert_frame_equal(
+            res[res["Group"] == group].drop(columns="Group").reset_index(drop=True),
+            expected,
+        )
+
+
+def test_score(tmp_trained_ExtraModel, test_comments, tmp_path):
+    tmp_trained_ExtraModel.models_folder = tmp_path
+    tmp_trained_ExtraModel.train(comments=test_comments)
+    assert (tmp_path / "topic_model.json").is_file()
+
+    # the comments the model was fitted on get the records of `predict`
+    assert tmp_trained_ExtraModel.score(
+        comments=test_comments
+    ) == tmp_trained_ExtraModel.predict(comments=test_comments)
+
+
+def test_train__not_loaded(tmp_untrained_tmp_models_folder_ExtraModel):
+    with pytest.raises(RuntimeError, match="load_from_files"):
+        tmp_untrained_tmp_models_folder_ExtraModel.train(
+            comments=[{"CommentId": 1, "Comments": "A comfortable chair"}]
+        )
+
+
+def test_score__no_topic_model(tmp_untrained_tmp_models_folder_ExtraModel):
+    with pytest.raises(RuntimeError, match="topic model"):
+        tmp_untrained_tmp_models_folder_ExtraModel.score(
+            comments=[{"CommentId": 1, "Comments": "A comfortable chair"}]
+        )
@@ -0,0 +1,65 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from extra_model._errors import ExtraModelError
+from extra_model._parallel import parallel_map, resolve_n_jobs
+
+
+def scale(shared, item):
+    return shared["factor"] * item, os.getpid()
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test__parallel_map(n_jobs):
+    results = parallel_map(scale, range(10), shared={"factor": 3}, n_jobs=n_jobs)
+    assert [value for value, _ in results] == [3 * item for item in range(10)]
+
+
+def test__parallel_map__in_process():
+    results = parallel_map(scale, [1, 2], shared={"factor": 1}, n_jobs=1)
+    assert {pid for _, pid in results} == {os.getpid()}
+
+
+def test__parallel_map__pool():
+    results = parallel_map(scale, range(8), shared={"factor": 1}, n_jobs=2)
+    assert os.getpid() not in {pid for _, pid in results}
+
+
+def exit_on_zero(shared, item):
+    if item == 0:
+        # a worker process killed, e.g. for running out of memory
+        os._exit(1)
+    return item
+
+
+def test__parallel_map__broken_pool():
+    results = parallel_map(
+        exit_on_zero,
+        [1, 0, 2, 3],
+        n_jobs=2,
+        broken=lambda item, error: ("broken", item),
+    )
+    # only the item whose process dies has no result
+    assert results == [1, ("broken", 0), 2, 3]
+
+
+def test__parallel_map__broken_pool__raises():
+    with pytest.raises(BrokenProcessPool):
+        parallel_map(exit_on_zero, [1, 0], n_jobs=2)
+
+
+def test__parallel_map__empty():
+    assert parallel_map(scale, [], shared={"factor": 1}, n_jobs=2) == []
+
+
+def test__resolve_n_jobs():
+    assert resolve_n_jobs(3) == 3
+    assert resolve_n_jobs(-1) == (os.cpu_count() or 1)
+
+
+@pytest.mark.parametrize("n_jobs", [0, -2, 1.5])
+def test__resolve_n_jobs__invalid(n_jobs):
+    with pytest.raises(ExtraModelError):
+        resolve_n_jobs(n_jobs)
@@ -0,0 +1,92 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from extra_model import _partials
+from extra_model._errors import ExtraModelError
+from extra_model._partials import Partial
+
+pytest.importorskip("pyarrow")
+
+
+def partial_of(comments, words):
+    texts = pd.DataFrame(
+        {"source_guid": list(range(len(comments))), "Comments": comments}
+    )
+    aspects = pd.DataFrame(
+        {
+            "CiD": [cid for cid, _ in words],
+            "position": [0] * len(words),
+            "aspect": [word for _, word in words],
+            "descriptor": ["good"] * len(words),
+            "is_negated": [False] * len(words),
+        }
+    )
+    return Partial(texts, aspects)
+
+
+def test__partial__extract(mocker):
+    expected = partial_of(["a comfortable chair"], [(0, "chair")])
+    mocker.patch("extra_model._partials.filter", return_value=expected.texts)
+    generate_aspects = mocker.patch(
+        "extra_model._partials.generate_aspects", return_value=expected.aspects
+    )
+
+    partial = Partial.extract([{"CommentId": 0, "Comments": "a comfortable chair"}])
+
+    assert generate_aspects.call_args[0][0] is expected.texts
+    assert partial.aspect_counts == {"chair": 1}
+
+
+def test__partial__merge():
+    first = partial_of(["a", "b"], [(0, "chair"), (1, "table")])
+    empty = partial_of([], [])
+    second = partial_of(["c"], [(0, "chair")])
+
+    merged = Partial.merge([first, empty, second])
+
+    assert merged.texts["Comments"].tolist() == ["a", "b", "c"]
+    assert merged.texts.index.tolist() == [0, 1, 2]
+    # the comments of the second partial follow those of the first
+    assert merged.aspects["CiD"].tolist() == [0, 1, 2]
+    assert merged.aspects.dtypes.equals(first.aspects.dtypes)
+    assert merged.aspect_counts == {"chair": 2, "table": 1}
+
+
+def test__partial__merge__other_version():
+    first = partial_of(["a"], [(0, "chair")])
+    second = partial_of(["b"], [(0, "table")])
+    second.version = "0.0.1"
+
+    with pytest.raises(ExtraModelError, match="extract them again"):
+        Partial.merge([first, second])
+
+
+def test__partial__round_trip(tmp_path):
+    partial = partial_of(["a", "b"], [(0, "chair"), (1, "table"), (1, "chair")])
+    folder = tmp_path / "partial"
+    partial.save(folder)
+    # saving again replaces the partial
+    partial.save(folder)
+
+    loaded = Partial.load(folder)
+
+    pd.testing.assert_frame_equal(loaded.texts, partial.texts)
+    pd.testing.assert_frame_equal(loaded.aspects, partial.aspects)
+    assert loaded.version == partial.version
+    metadata = json.loads((folder / "partial.json").read_text())
+    assert metadata["aspect_counts"] == {"chair": 2, "table": 1}
+    assert sorted(os.listdir(tmp_path)) == ["partial"]
+
+
+def test__partial__load__not_a_partial(tmp_path):
+    with pytest.raises(ExtraModelError, match="not a partial"):
+        Partial.load(tmp_path)
+
+
+def test__partial__missing_pyarrow(mocker, tmp_path):
+    mocker.patch.object(_partials, "pyarrow", None)
+    with pytest.raises(ExtraModelError, match="pyarrow"):
+        partial_of(["a"], [(0, "chair")]).save(tmp_path / "partial")
@@ -0,0 +1,40 @@
+import pytest
+
+from extra_model import _progress
+from extra_model._progress import reporting, track
+
+
+def test__track__no_callback():
+    # must not fail without a callback
+    track("aspects", 10).update(5)
+
+
+def test__track(mocker):
+    callback = mocker.Mock()
+    with reporting(callback):
+        progress = track("aspects", 3)
+    progress.update(3)
+
+    stage, done, total, rate = callback.call_args.args
+    assert (stage, done, total) == ("aspects", 3, 3)
+    assert rate > 0
+
+
+@pytest.mark.parametrize("interval,calls", [(0, 3), (3600, 1)])
+def test__track__throttled(mocker, interval, calls):
+    mocker.patch.object(_progress, "INTERVAL", interval)
+    callback = mocker.Mock()
+    with reporting(callback):
+        progress = track("filter", 3)
+        for done in range(1, 4):
+            progress.update(done)
+
+    # the completion is always reported
+    assert callback.call_count == calls
+    assert callback.call_args.args[1] == 3
+
+
+def test__reporting__reset(mocker):
+    with reporting(mocker.Mock()):
+        pass
+    assert track("filter", 1).callback is None
@@ -1,8 +1,18 @@
+import json
+from concurrent.futures.process import BrokenProcessPool
+
 import pandas as pd
 import pytest
 
 from extra_model._errors import ExtraModelError
-from extra_model._run import run, run_from_dataframe
+from extra_model._run import (
+    resolve_inputs,
+    run,
+    run_aggregate,
+    run_batch,
+    run_extract,
+    run_from_dataframe,
+)
 
 
 @pytest.fixture
@@ -93,3 +103,199 @@ def test_run_from_dataframe__wrong_input_raises_error(
 
     with pytest.raises(ExtraModelError, match="wrong_column_1"):
         run_from_dataframe(df)
+
+
+def test_run_from_dataframe__metrics_out__metrics_written(
+    extra_model_mock, pandas_mock, tmp_path
+):
+    metrics = {"stages": [{"name": "filter", "rows": 2}], "counters": {}}
+    extra_model_mock.return_value.predict.return_value = ([], metrics)
+    df = pd.DataFrame(
+        data=[[1, "test comment"], [2, "test comment 2"]],
+        columns=["CommentId", "Comments"],
+    )
+    run_from_dataframe(df, metrics_out=tmp_path / "metrics.json")
+
+    assert extra_model_mock.return_value.predict.call_args.kwargs["return_metrics"]
+    assert json.loads((tmp_path / "metrics.json").read_text()) == metrics
+
+
+def test_run_from_dataframe__state_dir__incremental(extra_model_mock, pandas_mock):
+    df = pd.DataFrame(
+        data=[[1, "test comment"], [2, "test comment 2"]],
+        columns=["CommentId", "Comments"],
+    )
+    run_from_dataframe(df, state_dir="state")
+
+    model = extra_model_mock.return_value
+    assert not model.predict.called
+    assert model.predict_incremental.call_args.kwargs["state_dir"] == "state"
+
+
+def test_run_from_dataframe__state_and_checkpoint_dir__raises_error(
+    extra_model_mock, pandas_mock
+):
+    df = pd.DataFrame(
+        data=[[1, "test comment"], [2, "test comment 2"]],
+        columns=["CommentId", "Comments"],
+    )
+    with pytest.raises(ExtraModelError, match="incremental"):
+        run_from_dataframe(df, checkpoint_dir="checkpoints", state_dir="state")
+
+
+def test_run_from_dataframe__group_by__grouped(extra_model_mock, pandas_mock):
+    df = pd.DataFrame(
+        data=[[1, "test comment", "chairs"], [2, "test comment 2", "tables"]],
+        columns=["CommentId", "Comments", "ProductClass"],
+    )
+    run_from_dataframe(df, group_by="ProductClass", n_jobs=2)
+
+    assert extra_model_mock.call_args.kwargs["n_jobs"] == 2
+    model = extra_model_mock.return_value
+    assert not model.predict.called
+    assert model.predict_grouped.call_args.kwargs["group_by"] == "ProductClass"
+
+
+@pytest.mark.parametrize(
+    "options, match",
+    [
+        ({"group_by": "Missing"}, "Missing"),
+        ({"group_by": "ProductClass", "state_dir": "state"}, "state_dir"),
+    ],
+)
+def test_run_from_dataframe__group_by__raises_error(
+    extra_model_mock, pandas_mock, options, match
+):
+    df = pd.DataFrame(
+        data=[[1, "test comment", "chairs"]],
+        columns=["CommentId", "Comments", "ProductClass"],
+    )
+    with pytest.raises(ExtraModelError, match=match):
+        run_from_dataframe(df, **options)
+
+
+@pytest.fixture
+def batch_model(mocker):
+    mocker.patch("extra_model._run.warm_up")
+    extra_model_mock = mocker.patch("extra_model._run.ExtraModel")
+
+    def predict(comments):
+        if comments[0]["Comments"] == "fail":
+            raise ValueError("Input dataset doesn't contain valid aspects")
+        return [{"CommentId": comment["CommentId"]} for comment in comments]
+
+    extra_model_mock.return_value.predict.side_effect = predict
+    return extra_model_mock
+
+
+def write_inputs(folder, names):
+    folder.mkdir()
+    for name in names:
+        pd.DataFrame({"CommentId": [1, 2], "Comments": [name, name]}).to_csv(
+            folder / f"{name}.csv", index=False
+        )
+
+
+def test_resolve_inputs(tmp_path):
+    write_inputs(tmp_path / "in", ["b", "a"])
+    (tmp_path / "in" / "notes.txt").write_text("not an input")
+
+    assert resolve_inputs(tmp_path / "in") == [
+        tmp_path / "in" / "a.csv",
+        tmp_path / "in" / "b.csv",
+    ]
+    assert resolve_inputs(tmp_path / "in" / "b*") == [tmp_path / "in" / "b.csv"]
+    with pytest.raises(ExtraModelError, match="No input files"):
+        resolve_inputs(tmp_path / "in" / "*.json")
+
+
+def test_run_batch__worker_died(batch_model, mocker, tmp_path):
+    write_inputs(tmp_path / "in", ["chairs", "tables"])
+
+    def parallel_map(function, items, shared, n_jobs, broken):
+        # the worker of the second file dies
+        return [function(shared, items[0]), broken(items[1], BrokenProcessPool())]
+
+    mocker.patch("extra_model._run.parallel_map", side_effect=parallel_map)
+
+    summary = run_batch(tmp_path / "in", tmp_path / "out", jobs=2)
+
+    assert summary[0]["error"] is None
+    assert summary[1]["error"].startswith("BrokenProcessPool")
+    assert json.loads((tmp_path / "out" / "batch_summary.json").read_text()) == summary
+
+
+def test_run_batch__output_in_input_folder(batch_model, tmp_path):
+    write_inputs(tmp_path / "io", ["chairs"])
+
+    run_batch(tmp_path / "io", tmp_path / "io")
+    # a rerun doesn't take the results of the first run as input
+    summary = run_batch(tmp_path / "io", tmp_path / "io")
+
+    assert [result["input"] for result in summary] == [
+        str(tmp_path / "io" / "chairs.csv")
+    ]
+    assert pd.read_csv(tmp_path / "io" / "chairs.csv")["Comments"].tolist() == [
+        "chairs",
+        "chairs",
+    ]
+
+
+def test_resolve_inputs__same_output__raises_error(tmp_path):
+    write_inputs(tmp_path / "one", ["a"])
+    write_inputs(tmp_path / "two", ["a"])
+
+    with pytest.raises(ExtraModelError, match="same output"):
+        resolve_inputs(tmp_path / "*" / "a.csv")
+
+
+def test_run_batch(batch_model, tmp_path):
+    write_inputs(tmp_path / "in", ["chairs", "fail", "tables"])
+
+    summary = run_batch(tmp_path / "in", tmp_path / "out")
+
+    # the model is loaded once for all files
+    batch_model.assert_called_once()
+    assert [result["error"] for result in summary] == [
+        None,
+        "ValueError: Input dataset doesn't contain valid aspects",
+        None,
+    ]
+    assert sorted(path.name for path in (tmp_path / "out").iterdir()) == [
+        "batch_summary.json",
+        "chairs_result.csv",
+        "tables_result.csv",
+    ]
+    assert pd.read_csv(tmp_path / "out" / "chairs_result.csv")[
+        "CommentId"
+    ].tolist() == [1, 2]
+    assert json.loads((tmp_path / "out" / "batch_summary.json").read_text()) == summary
+
+
+def test_run_extract(mocker, tmp_path):
+    partial_mock = mocker.patch("extra_model._run.Partial")
+    pd.DataFrame({"CommentId": [1], "Comments": ["test comment"]}).to_csv(
+        tmp_path / "shard.csv", index=False
+    )
+
+    run_extract(tmp_path / "shard.csv", tmp_path / "partial")
+
+    partial_mock.extract.assert_called_once_with(
+        [{"CommentId": 1, "Comments": "test comment"}]
+    )
+    partial_mock.extract.return_value.save.assert_called_once_with(tmp_path / "partial")
+
+
+def test_run_aggregate(mocker, extra_model_mock, tmp_path):
+    partial_mock = mocker.patch("extra_model._run.Partial")
+    extra_model_mock.return_value.aggregate.return_value = [{"CommentId": 1}]
+
+    run_aggregate([tmp_path / "a", tmp_path / "b"], tmp_path / "out", n_jobs=2)
+
+    assert partial_mock.load.call_count == 2
+    assert extra_model_mock.call_args.kwargs["n_jobs"] == 2
+    assert (
+        extra_model_mock.return_value.aggregate.call_args[0][0]
+        == [partial_mock.load.return_value] * 2
+    )
+    assert pd.read_csv(tmp_path / "out" / "result.csv")["CommentId"].tolist() == [1]
@@ -0,0 +1,118 @@
+import json
+
+import pytest
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+from extra_model._sentiment import SEEN_FILENAME, SentimentCache, build
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return SentimentIntensityAnalyzer()
+
+
+def expected(analyzer, word):
+    score = analyzer.polarity_scores(word)
+    return (score["compound"], score["pos"] - score["neg"])
+
+
+@pytest.mark.parametrize("word", ["ugly", "Ugly", "GREAT", "sturdy", "not", "asdf"])
+def test__score(analyzer, word):
+    assert SentimentCache().score(word) == expected(analyzer, word)
+
+
+def test__score__cached(mocker):
+    cache = SentimentCache()
+    polarity_scores = mocker.spy(cache.analyzer, "polarity_scores")
+    cache.score("ugly")
+    cache.score("ugly")
+    polarity_scores.assert_called_once_with("ugly")
+
+
+def test__build(analyzer, tmp_path):
+    path = tmp_path / "table.json"
+    build(str(path))
+    cache = SentimentCache()
+    cache.load(str(path))
+    assert set(cache.scores) == set(analyzer.lexicon)
+    for word in ["ugly", "great", ":)"]:
+        assert cache.score(word) == expected(analyzer, word)
+    # no need for the analyzer for known words
+    assert cache._analyzer is None
+
+
+def table(tmp_path):
+    path = tmp_path / "table.json"
+    path.write_text(json.dumps({"ugly": [-0.5106, -1.0]}))
+    return path
+
+
+def loaded(path):
+    cache = SentimentCache()
+    cache.load(str(path))
+    return cache
+
+
+def test__flush(analyzer, mocker, tmp_path):
+    path = table(tmp_path)
+    cache = loaded(path)
+    cache.flush()
+    assert not (tmp_path / SEEN_FILENAME).exists()
+
+    assert cache.score("Great") == expected(analyzer, "Great")
+    cache.flush()
+    # the lexicon table is left as it is
+    assert json.loads(path.read_text()) == {"ugly": [-0.5106, -1.0]}
+    assert set(json.loads((tmp_path / SEEN_FILENAME).read_text())) == {"Great"}
+
+    # a new process doesn't run VADER again
+    cache = loaded(path)
+    polarity_scores = mocker.spy(cache.analyzer, "polarity_scores")
+    assert cache.score("Great") == expected(analyzer, "Great")
+    polarity_scores.assert_not_called()
+
+
+def test__flush__merge(tmp_path):
+    path = table(tmp_path)
+    first, second = loaded(path), loaded(path)
+    first.score("sturdy")
+    second.score("wobbly")
+    first.flush()
+    second.flush()
+    # neither run loses the descriptors of the other one
+    assert list(json.loads((tmp_path / SEEN_FILENAME).read_text())) == [
+        "sturdy",
+        "wobbly",
+    ]
+    assert set(second.seen) == {"sturdy", "wobbly"}
+
+
+def test__score__max_seen(mocker, tmp_path):
+    mocker.patch("extra_model._sentiment.MAX_SEEN", 2)
+    cache = loaded(table(tmp_path))
+    for word in ["sturdy", "wobbly", "sturdy", "shiny"]:
+        cache.score(word)
+    # the least recently used descriptor is evicted
+    assert list(cache.seen) == ["sturdy", "shiny"]
+    cache.flush()
+    assert list(json.loads((tmp_path / SEEN_FILENAME).read_text())) == [
+        "sturdy",
+        "shiny",
+    ]
+
+
+def test__flush__not_loaded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = SentimentCache()
+    cache.score("sturdy")
+    cache.flush()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test__flush__read_only(mocker, tmp_path):
+    cache = loaded(table(tmp_path))
+    cache.score("sturdy")
+    mocker.patch("extra_model._sentiment.tempfile.mkstemp", side_effect=OSError)
+    # a read-only models folder must not break predictions
+    cache.flush()
+    assert not (tmp_path / SEEN_FILENAME).exists()
@@ -0,0 +1,194 @@
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+from extra_model._errors import ExtraModelError
+from extra_model._serve import HTTPServer, PredictionService, UnixHTTPServer
+
+COMMENTS = [{"CommentId": 1, "Comments": "A comfortable chair"}]
+RECORDS = [{"CommentId": 1, "Aspect": "chair"}]
+METRICS = {
+    "stages": [{"name": "filter", "rows": 1, "wall_time": 0.5, "cpu_time": 0.25}],
+    "counters": {"vectorizer.lookups": 2},
+}
+
+
+@pytest.fixture
+def model(mocker):
+    model = mocker.Mock(n_jobs=1)
+    model.predict.return_value = (RECORDS, METRICS)
+    model.score.return_value = ([], METRICS)
+    return model
+
+
+def start(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def serve(model):
+    servers = []
+
+    def serve(workers=1, queue_size=8):
+        service = PredictionService(model, workers, queue_size)
+        server = start(HTTPServer(("127.0.0.1", 0), service))
+        servers.append((server, service))
+        return server.server_address[1]
+
+    yield serve
+    for server, service in servers:
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+def request(port, method, path, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    connection.request(
+        method, path, body=None if body is None else json.dumps(body).encode()
+    )
+    response = connection.getresponse()
+    result = response.status, dict(response.getheaders()), json.loads(response.read())
+    connection.close()
+    return result
+
+
+def test_serve__predict(serve, model):
+    port = serve()
+    status, _, records = request(port, "POST", "/predict", COMMENTS)
+    assert status == 200 and records == RECORDS
+    model.predict.assert_called_once_with(COMMENTS, return_metrics=True)
+
+
+def test_serve__score(serve, model):
+    port = serve()
+    status, _, records = request(port, "POST", "/score", COMMENTS)
+    assert status == 200 and records == []
+    model.score.assert_called_once_with(COMMENTS, return_metrics=True)
+
+
+def test_serve__metrics(serve):
+    port = serve()
+    request(port, "POST", "/predict", COMMENTS)
+    request(port, "POST", "/predict", COMMENTS)
+
+    status, _, metrics = request(port, "GET", "/metrics")
+
+    assert status == 200
+    assert metrics["requests"] == {"predict": 2, "score": 0}
+    assert metrics["latency"]["count"] == 2 and metrics["pending"] == 0
+    assert metrics["stages"] == {
+        "filter": {"count": 2, "wall_time": 1.0, "cpu_time": 0.5}
+    }
+    assert metrics["counters"] == {"vectorizer.lookups": 4}
+
+
+@pytest.mark.parametrize(
+    "body", [{"comments": COMMENTS}, [{"Comments": "no id"}], "not a list"]
+)
+def test_serve__invalid_request(serve, model, body):
+    port = serve()
+    status, _, response = request(port, "POST", "/predict", body)
+    assert status == 400 and "CommentId" in response["error"]
+    model.predict.assert_not_called()
+
+
+def test_serve__no_aspects(serve, model):
+    model.predict.side_effect = ValueError(
+        "Input dataset doesn't contain valid aspects"
+    )
+    port = serve()
+    status, _, response = request(port, "POST", "/predict", COMMENTS)
+
+    assert status == 422 and "aspects" in response["error"]
+    assert request(port, "GET", "/metrics")[2]["failed"] == 1
+
+
+def test_serve__unknown_path(serve):
+    port = serve()
+    assert request(port, "GET", "/predict")[0] == 404
+    assert request(port, "POST", "/train", COMMENTS)[0] == 404
+
+
+def test_serve__busy(serve, model):
+    started, release = threading.Event(), threading.Event()
+
+    def predict(comments, return_metrics):
+        started.set()
+        release.wait(10)
+        return RECORDS, METRICS
+
+    model.predict.side_effect = predict
+    port = serve(workers=1, queue_size=0)
+    first = threading.Thread(target=request, args=(port, "POST", "/predict", COMMENTS))
+    first.start()
+    assert started.wait(10)
+
+    # the only worker is busy and nothing may wait for it
+    status, headers, _ = request(port, "POST", "/predict", COMMENTS)
+    release.set()
+    first.join(10)
+
+    assert status == 503 and headers["Retry-After"] == "1"
+    metrics = request(port, "GET", "/metrics")[2]
+    assert metrics["rejected"] == 1 and metrics["requests"]["predict"] == 1
+
+
+def test_serve__unix_socket(model, tmp_path):
+    path = str(tmp_path / "extra.sock")
+    service = PredictionService(model)
+    server = start(UnixHTTPServer(path, service))
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(path)
+            client.sendall(
+                b"GET /health HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n"
+            )
+            # the headers and the body may arrive separately, read until the server closes
+            response = b"".join(iter(lambda: client.recv(4096), b"")).decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+    assert response.startswith("HTTP/1.1 200") and '{"status": "ok"}' in response
+
+
+def test_serve__unix_socket__stale(model, tmp_path):
+    path = str(tmp_path / "extra.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(path)
+    service = PredictionService(model)
+    server = UnixHTTPServer(path, service)
+    server.server_close()
+    service.close()
+
+
+def test_serve__unix_socket__not_a_socket(model, tmp_path):
+    path = tmp_path / "input.csv"
+    path.write_text("CommentId,Comments\n")
+    service = PredictionService(model)
+    with pytest.raises(ExtraModelError, match="not a socket"):
+        UnixHTTPServer(str(path), service)
+    service.close()
+    # a mistyped path must not delete the file
+    assert path.read_text() == "CommentId,Comments\n"
+
+
+@pytest.mark.parametrize("workers, queue_size", [(0, 8), (1, -1)])
+def test_prediction_service__invalid(model, workers, queue_size):
+    with pytest.raises(ExtraModelError):
+        PredictionService(model, workers, queue_size)
+
+
+def test_prediction_service__n_jobs(model, caplog):
+    model.n_jobs = 4
+    service = PredictionService(model)
+    service.close()
+    # forking from the threads of the server can deadlock
+    assert model.n_jobs == 1
+    assert "n_jobs=1" in caplog.text
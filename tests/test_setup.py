@@ -4,7 +4,15 @@ from pathlib import Path
 import pytest
 
 from extra_model._errors import ExtraModelError
-from extra_model._setup import URL, cleanup, download_file, format_file, run_subprocess
+from extra_model._setup import (
+    URL,
+    build_sentiment,
+    build_wordnet,
+    cleanup,
+    download_file,
+    format_file,
+    run_subprocess,
+)
 from extra_model._setup import setup as setup_extra
 from extra_model._setup import unzip_file
 
@@ -48,6 +56,16 @@ def cleanup_mock(mocker):
     return mocker.patch("extra_model._setup.cleanup")
 
 
+@pytest.fixture
+def build_wordnet_mock(mocker):
+    return mocker.patch("extra_model._setup.build_wordnet")
+
+
+@pytest.fixture
+def build_sentiment_mock(mocker):
+    return mocker.patch("extra_model._setup.build_sentiment")
+
+
 @pytest.fixture
 def create_output_path(mocker):
     """Mock for Path truediv (/) operator"""
@@ -63,7 +81,13 @@ def create_output_path(mocker):
 
 
 def test_setup__input_return_n__setup_functions_not_called(
-    input_mock, download_file_mock, unzip_file_mock, format_file_mock, cleanup_mock
+    input_mock,
+    download_file_mock,
+    unzip_file_mock,
+    format_file_mock,
+    cleanup_mock,
+    build_wordnet_mock,
+    build_sentiment_mock,
 ):
     input_mock.return_value = "n"
 
@@ -73,10 +97,18 @@ def test_setup__input_return_n__setup_functions_not_called(
     unzip_file_mock.assert_not_called()
     format_file_mock.assert_not_called()
     cleanup_mock.assert_not_called()
+    build_wordnet_mock.assert_not_called()
+    build_sentiment_mock.assert_not_called()
 
 
 def test_setup__input_return_True__setup_functions_called(
-    input_mock, download_file_mock, unzip_file_mock, format_file_mock, cleanup_mock
+    input_mock,
+    download_file_mock,
+    unzip_file_mock,
+    format_file_mock,
+    cleanup_mock,
+    build_wordnet_mock,
+    build_sentiment_mock,
 ):
     input_mock.return_value = "y"
 
@@ -86,10 +118,18 @@ def test_setup__input_return_True__setup_functions_called(
     unzip_file_mock.assert_called_once()
     format_file_mock.assert_called_once()
     cleanup_mock.assert_called_once()
+    build_wordnet_mock.assert_called_once()
+    build_sentiment_mock.assert_called_once()
 
 
 def test_setup__output_path_set__argument_passed_to_setup_functions(
-    input_mock, download_file_mock, unzip_file_mock, format_file_mock, cleanup_mock
+    input_mock,
+    download_file_mock,
+    unzip_file_mock,
+    format_file_mock,
+    cleanup_mock,
+    build_wordnet_mock,
+    build_sentiment_mock,
 ):
     setup_extra(OUTPUT)
 
@@ -103,6 +143,10 @@ def test_setup__output_path_set__argument_passed_to_setup_functions(
         [download_file_mock.return_value, unzip_file_mock.return_value]
     )
 
+    build_wordnet_mock.assert_called_once_with(OUTPUT)
+
+    build_sentiment_mock.assert_called_once_with(OUTPUT)
+
 
 def test_download_file__output_file_found__skip_download_file(
     create_output_path, run_subprocess_mock
@@ -170,6 +214,44 @@ def test_format_file__output_file_missing__format_file(mocker, create_output_pat
     datapath_mock.assert_called_once()
 
 
+def test_build_wordnet__output_folder_found__skip_build(mocker, create_output_path):
+    build_mock = mocker.patch("extra_model._setup.build")
+    output_path = create_output_path()
+    output_path.__truediv__.return_value.is_dir.return_value = True
+
+    build_wordnet(output_path)
+
+    build_mock.assert_not_called()
+
+
+def test_build_wordnet__output_folder_missing__build(mocker, create_output_path):
+    build_mock = mocker.patch("extra_model._setup.build")
+    output_path = create_output_path()
+    output_path.__truediv__.return_value.is_dir.return_value = False
+
+    build_wordnet(output_path)
+
+    build_mock.assert_called_once()
+
+
+def test_build_sentiment__output_file_found__skip_build(mocker, create_output_path):
+    build_mock = mocker.patch("extra_model._setup.build_sentiment_table")
+    output_path = create_output_path(file_exists=True)
+
+    build_sentiment(output_path)
+
+    build_mock.assert_not_called()
+
+
+def test_build_sentiment__output_file_missing__build(mocker, create_output_path):
+    build_mock = mocker.patch("extra_model._setup.build_sentiment_table")
+    output_path = create_output_path(file_exists=False)
+
+    build_sentiment(output_path)
+
+    build_mock.assert_called_once()
+
+
 def test_cleanup__files_unliked(mocker):
     file = mocker.Mock()
     cleanup([file])
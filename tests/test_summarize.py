@@ -1,18 +1,19 @@
+import json
+
 import numpy as np
 import pandas as pd
+import pytest
 
 from extra_model._summarize import (
     link_aspects_to_texts,
     link_aspects_to_topics,
-    qa,
-    set_aspect,
+    qa_report,
+    write_qa_report,
 )
 
 
-def test_summarize__qa():
-    # Test is a bit tricky, ideally you'd like to run the complete code to see that the output format
-    # matches what is expected by this function. However, that's not really feasible for testing,
-    # so we mock the respective dataframes just to see that it's not crashing
+@pytest.fixture
+def qa_frames():
     topicframe = pd.DataFrame(
         columns=[
             "topic",
@@ -31,47 +32,87 @@ def test_summarize__qa():
         [
             "table",
             ["table"],
-            [1],
+            [2],
             ["table"],
-            [1],
-            1,
-            (["small"], [[1]], [[("small", 1)]]),
-            1.0,
+            [2.0],
+            0,
+            (["small"], [2], [[("small", 1), ("little", 1)]]),
             1.0,
+            0.5,
             1.0,
         ],
         dtype=object,
     )
+    topicframe.loc[1] = np.asarray(
+        ["chair", ["chair"], [1], ["chair"], [1.0], 1, None, 0.5, 0.0, 0.0],
+        dtype=object,
+    )
     aspectframe = pd.DataFrame(
-        [{"aspect": "table", "descriptor": "small", "adcluster": "small", "CiD": 0}]
+        [
+            {"aspect": "table", "descriptor": "small", "adcluster": "small", "CiD": 0},
+            {"aspect": "table", "descriptor": "little", "adcluster": "small", "CiD": 1},
+            {"aspect": "chair", "descriptor": "red", "adcluster": None, "CiD": 1},
+        ]
     )
-    textframe = pd.DataFrame([{"Comments": "This is a small table"}])
-    # this just needs to not crash
-    qa(textframe, aspectframe, topicframe)
+    textframe = pd.DataFrame(
+        [{"Comments": "This is a small table"}, {"Comments": "A little table"}]
+    )
+    return textframe, aspectframe, topicframe
+
+
+def test_summarize__qa_report(qa_frames):
+    report = qa_report(*qa_frames)
+    assert report["texts"] == 2 and report["aspects"] == 3
+    table, chair = report["topics"]
+    assert table["terms"] == [{"term": "table", "count": 2}]
+    assert table["adjective_clusters"] == [
+        {
+            "representative": "small",
+            "size": 2,
+            "adjectives": [
+                {"adjective": "small", "count": 1},
+                {"adjective": "little", "count": 1},
+            ],
+        }
+    ]
+    assert table["comments"] == ["This is a small table", "A little table"]
+    # no adjective clusters, no representative comments
+    assert chair["adjective_clusters"] == [] and chair["comments"] == []
+
+
+@pytest.mark.parametrize("filename", ["report.json", "report.md"])
+def test_summarize__write_qa_report(qa_frames, tmp_path, filename):
+    report = qa_report(*qa_frames)
+    write_qa_report(report, tmp_path / filename)
+    content = (tmp_path / filename).read_text()
+    if filename.endswith(".json"):
+        assert json.loads(content) == report
+    else:
+        assert "## table (topic 0)" in content
+        assert "* small (2): small (1), little (1)" in content
+        assert "> A little table" in content
 
 
-def test_summarize__set_aspect():
-    topicframe = pd.DataFrame(columns=["rawterms", "topicID", "adjective_clusters"])
+def test_summarize__link_aspects_to_topics__last_match():
+    topicframe = pd.DataFrame(columns=["rawterms", "adjective_clusters"])
     topicframe.loc[0] = np.asarray(
-        [["table"], 1, (["small"], [[1]], [[("small", 1)]])], dtype=object
+        [["table", "chair"], (["small"], [[1]], [[("small", 1)]])], dtype=object
+    )
+    topicframe.loc[1] = np.asarray(
+        [["table"], (["big"], [[1]], [[("big", 1)]])], dtype=object
     )
     aspectframe = pd.DataFrame(
         [
             {"aspect": "table", "descriptor": "small"},
-            {"aspect": "chair", "descriptor": "small"},
+            {"aspect": "table", "descriptor": "big"},
+            {"aspect": "chair", "descriptor": "big"},
         ]
     )
-    aspectframe["topicID"] = None
-    aspectframe["adcluster"] = None
-
-    topicframe.apply(lambda topic: set_aspect(topic, aspectframe), axis=1)
-
-    assert (
-        aspectframe.iloc[0]["topicID"] == 1
-        and aspectframe.iloc[0]["adcluster"] == "small"
-        and not aspectframe.iloc[1]["topicID"]
-        and not aspectframe.iloc[1]["adcluster"]
-    )
+    result = link_aspects_to_topics(aspectframe, topicframe)
+    # the aspect belongs to the last topic containing it, the adjective cluster of
+    # an earlier topic is kept if the later topic has none for the descriptor
+    assert result["topicID"].tolist() == [1, 1, 0]
+    assert result["adcluster"].tolist() == ["small", "big", None]
 
 
 def test_summarize__link_aspects_to_topics():
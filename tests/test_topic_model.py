@@ -0,0 +1,110 @@
+import pandas as pd
+import pytest
+
+from extra_model._errors import ExtraModelError
+from extra_model._sentiment import SentimentCache
+from extra_model._summarize import link_aspects_to_topics
+from extra_model._topic_model import TopicModel
+
+
+@pytest.fixture
+def linked(mocker):
+    cache = SentimentCache()
+    cache.scores.update({"small": (0.5, 0.25), "big": (-0.5, -0.25)})
+    mocker.patch("extra_model._adjectives.sentiments", cache)
+    topics = pd.DataFrame(
+        {
+            "topic": ["table.n.01", "furniture.n.01"],
+            "importance": [0.75, 0.25],
+            "sentiment_compound": [0.5, 0.0],
+            "sentiment_binary": [0.25, 0.0],
+            "rawterms": [["table"], ["table", "chair"]],
+            "rawnums": [[2], [2, 1]],
+            "adjectives": [[("small", 2)], [("small", 2), ("big", 1)]],
+            "adjective_clusters": [
+                (["small"], [[1]], [[("small", 2)]]),
+                (["small", "big"], [[1], [1]], [[("small", 2)], [("big", 1)]]),
+            ],
+        }
+    )
+    aspects = pd.DataFrame(
+        {
+            "aspect": ["table", "table", "chair", "lamp"],
+            "descriptor": ["small", "small", "big", "big"],
+            "wordnet_node": ["table.n.01", "table.n.01", "chair.n.01", None],
+            "aspect_count": [2, 2, 1, 1],
+        }
+    )
+    link_aspects_to_topics(aspects, topics)
+    return topics, aspects
+
+
+def new_aspects():
+    return pd.DataFrame(
+        {
+            "CiD": [0, 0, 1],
+            "position": [0, 10, 0],
+            "aspect": ["chair", "lamp", "table"],
+            "descriptor": ["big", "big", "shiny"],
+            "is_negated": [True, False, False],
+        }
+    )
+
+
+def test__topic_model__fit(linked):
+    model = TopicModel.fit(*linked, {"topics": {"alpha": 0.5}})
+    assert model.topics.to_dict("records") == [
+        {
+            "topicID": 0,
+            "topic": "table.n.01",
+            "importance": 0.75,
+            "sentiment_compound": 0.5,
+            "sentiment_binary": 0.25,
+            "num_occurance": 2,
+        },
+        {
+            "topicID": 1,
+            "topic": "furniture.n.01",
+            "importance": 0.25,
+            "sentiment_compound": 0.0,
+            "sentiment_binary": 0.0,
+            "num_occurance": 3,
+        },
+    ]
+    # aspects without topic are left out
+    assert model.aspects.index.tolist() == ["table", "chair"]
+    assert model.sentiments == {"small": (0.5, 0.25), "big": (-0.5, -0.25)}
+
+
+def test__topic_model__assign(linked):
+    model = TopicModel.fit(*linked, {})
+    assigned = model.assign(new_aspects())
+    assert assigned["topicID"].tolist() == [1, None, 1]
+    # there is no cluster for an unseen descriptor
+    assert assigned["adcluster"].tolist() == ["big", None, None]
+    assert assigned["wordnet_node"].tolist() == ["chair.n.01", None, "table.n.01"]
+    assert assigned["aspect_count"].tolist() == [1, 0, 2]
+    assert assigned["sentiment_compound"].tolist() == [0.5, -0.5, 0.0]
+
+
+def test__topic_model__round_trip(linked, tmp_path):
+    model = TopicModel.fit(*linked, {"topics": {"alpha": 0.5}})
+    model.save(tmp_path / "topic_model.json")
+
+    loaded = TopicModel.load(tmp_path / "topic_model.json")
+
+    pd.testing.assert_frame_equal(loaded.topics, model.topics)
+    pd.testing.assert_frame_equal(loaded.terms, model.terms)
+    pd.testing.assert_frame_equal(loaded.clusters, model.clusters)
+    pd.testing.assert_frame_equal(loaded.aspects, model.aspects)
+    assert loaded.sentiments == model.sentiments
+    assert loaded.parameters == {"topics": {"alpha": 0.5}}
+    pd.testing.assert_frame_equal(
+        loaded.assign(new_aspects()), model.assign(new_aspects())
+    )
+
+
+def test__topic_model__load__other_format(linked, tmp_path):
+    (tmp_path / "topic_model.json").write_text('{"format": "0"}')
+    with pytest.raises(ExtraModelError, match="train it again"):
+        TopicModel.load(tmp_path / "topic_model.json")
@@ -1,21 +1,27 @@
 import os
 
-import networkx as nx
 import numpy as np
 import pytest
 from gensim.models import KeyedVectors
-from nltk.corpus import wordnet as wn
+from scipy import sparse
 
+from extra_model._errors import ExtraModelError
+from extra_model._graph import HypernymGraph
+from extra_model._metrics import collect, stage
 from extra_model._topics import (
+    GraphCache,
     aggregate,
+    collect_topic_info,
     filter_aggregates,
     get_nodevec,
     has_connection,
+    index_aspects,
     iterate,
-    path_to_graph,
-    traverse_tree,
+    rank,
+    weight_aspects,
 )
 from extra_model._vectorizer import Vectorizer
+from extra_model._wordnet import wordnet as wn
 
 
 @pytest.fixture()
@@ -42,47 +48,31 @@ def simple_graph():
     # a simple example graph: two leaf nodes (corresponding to text instances), L1 and L2, connected to
     # the root of the tree R via two intermidate nodes I1 and I2 which represent higher-level wordnet synsets
     # the edges are weighted to test the similarity functionality
-    graph = nx.DiGraph()
-    graph.add_nodes_from(["L1", "I1", "L2", "I2", "R"])
-    graph.add_edges_from([("L1", "I1"), ("L2", "I2"), ("I1", "R"), ("I2", "R")])
-    graph.nodes["L1"]["seed"] = True
-    graph.nodes["L2"]["seed"] = True
-    graph.nodes["I1"]["seed"] = False
-    graph.nodes["I2"]["seed"] = False
-    graph.nodes["R"]["seed"] = False
-    graph["L1"]["I1"]["similarity"] = 1.0
-    graph["L2"]["I2"]["similarity"] = 1.0
-    graph["I1"]["R"]["similarity"] = 0.5
-    graph["I2"]["R"]["similarity"] = 0.5
-    return graph
-
-
-def test__path_to_graph():
+    return HypernymGraph(
+        ["L1", "I1", "L2", "I2", "R"],
+        [True, False, True, False, False],
+        sources=[0, 2, 1, 3],
+        targets=[1, 3, 4, 4],
+        similarity=[1.0, 1.0, 0.5, 0.5],
+    )
+
+
+def test__aggregate__hypernym_chain():
     noun = "zombie"
     hypernym_list = wn.synsets(noun, pos=wn.NOUN)[0].hypernym_paths()[0]
-    graph = path_to_graph(hypernym_list, noun)
-    print(list(graph.successors(noun)))
-    print(list(graph.successors("entity.n.01")))
-    assert (
-        # entity is the root
-        len(list(graph.successors("entity.n.01"))) == 0
-        # initial word is the leaf
-        and len(nx.dfs_successors(graph, noun)) == graph.order() - 1
-        # leaf has the seed-flag set
-        and graph.nodes[noun]["seed"] is True
-    )
-    # all the other nodes should not be seeds
-    for depth, nodes in nx.dfs_successors(graph, noun).items():
-        for node in nodes:
-            assert not graph.nodes[node]["seed"]
-    # all intermediate nodes should have 2 connections, the leaf only one.
-    for depth, nodes in nx.dfs_predecessors(graph, "entity.n.01").items():
-        for node in nodes:
-            if graph.nodes[node]["seed"] is True:
-                assert graph.degree(node) == 1
-            else:
-                assert graph.degree(node) == 2
-    print(graph.nodes)
+    graph = HypernymGraph.from_chains(
+        [(noun, [hypernym.name() for hypernym in hypernym_list])]
+    )
+    root = graph.node_ids["entity.n.01"]
+    leaf = graph.node_ids[noun]
+    # entity is the root
+    assert len(graph.successors(root)) == 0
+    # initial word is the leaf and the only seed
+    assert len(graph.reachable()[leaf]) == graph.node_count - 1
+    assert graph.seed.tolist() == [node == leaf for node in range(graph.node_count)]
+    # the chain is linear
+    assert graph.edge_count == graph.node_count - 1
+    assert len(graph.predecessors(leaf)) == 0
 
 
 def test__get_nodevec(minivec):
@@ -98,6 +88,58 @@ def test__iterate():
     assert result[1] == pytest.approx(0.5)
 
 
+def test__iterate__sparse():
+    transition_matrix = sparse.csr_matrix(np.array([[0.0, 1.0], [1.0, 0.0]]))
+    original = np.array([0.2, 0.8])
+    result = iterate(transition_matrix, original.copy(), original, 0.5)
+    assert result == pytest.approx([0.5, 0.5])
+
+
+def test__rank__converges():
+    transition_matrix = sparse.csr_matrix(np.array([[1.0, 0.5], [0.0, 1.0]]))
+    original = np.array([0.2, 0.8])
+    importance, iterations, residual = rank(
+        transition_matrix, original, alpha=0.5, max_iter=1000, tolerance=1e-12
+    )
+    assert iterations < 1000 and residual < 1e-12
+    assert iterate(transition_matrix, importance, original, 0.5) == pytest.approx(
+        importance
+    )
+
+
+def test__rank__max_iter():
+    transition_matrix = sparse.csr_matrix(np.array([[1.0, 0.5], [0.0, 1.0]]))
+    original = np.array([0.2, 0.8])
+    _, iterations, residual = rank(
+        transition_matrix, original, alpha=0.5, max_iter=2, tolerance=0.0
+    )
+    assert iterations == 2 and residual > 0.0
+
+
+def test__rank__initial():
+    transition_matrix = sparse.csr_matrix(np.array([[1.0, 0.5], [0.0, 1.0]]))
+    original = np.array([0.2, 0.8])
+    fixed_point, iterations, _ = rank(
+        transition_matrix, original, alpha=0.5, max_iter=1000, tolerance=1e-12
+    )
+    importance, warm_iterations, residual = rank(
+        transition_matrix,
+        original,
+        alpha=0.5,
+        max_iter=1000,
+        tolerance=1e-12,
+        initial=fixed_point,
+    )
+    assert warm_iterations < iterations and residual < 1e-12
+    assert importance == pytest.approx(fixed_point)
+
+
+@pytest.mark.parametrize("alpha, max_iter", [(-0.1, 10), (1.5, 10), (0.5, 0)])
+def test__rank__invalid(alpha, max_iter):
+    with pytest.raises(ExtraModelError):
+        rank(sparse.identity(2), np.array([0.5, 0.5]), alpha, max_iter)
+
+
 def test__has_connection(simple_graph):
     assert (
         has_connection("L1", "R", simple_graph)
@@ -133,43 +175,106 @@ def test__aggregate(vec):
     )
 
 
-def test__traverse_tree__down_weighted(simple_graph):
-    assert traverse_tree(
-        [("R", 1)],
-        {},
-        {"L1": 4, "L2": 1},
-        simple_graph,
-        weighted=True,
-        direction="down",
-    ) == {"L1": 2, "L2": 0.5}
-
-
-def test__traverse_tree__down_unweighted(simple_graph):
-    assert traverse_tree(
-        [("R", 1)],
-        {},
-        {"L1": 4, "L2": 1},
-        simple_graph,
-        weighted=False,
-        direction="down",
-    ) == {"L1": 4, "L2": 1}
-
-
-def test__traverse_tree__up_weighted(simple_graph):
-    assert traverse_tree(
-        [("I1", 1)], {}, {"L1": 4, "L2": 1}, simple_graph, weighted=True, direction="up"
-    ) == {"L1": 4}
+def test__aggregate__metrics(mocker):
+    mocker.patch(
+        "extra_model._topics.get_nodevec",
+        side_effect=lambda node, _: np.array([1.0, len(node), node.count("n")]),
+    )
+    with collect() as metrics:
+        with stage("topics"):
+            aggregate(
+                ["chair", "zombie"],
+                {"chair": 4, "zombie": 1},
+                [wn.synset("chair.n.01"), wn.synset("zombi.n.01")],
+                None,
+                tolerance=1e-6,
+            )
+    report = metrics.to_dict()
+    assert report["counters"]["rank.iterations"] > 0
+    assert 0.0 <= report["stages"][0]["rank_residual"] < 1e-6
+
+
+def test__aggregate__cache(mocker):
+    # a distinct gloss embedding for every node
+    get_nodevec = mocker.patch(
+        "extra_model._topics.get_nodevec",
+        side_effect=lambda node, _: np.array([1.0, len(node), node.count("n")]),
+    )
+    arguments = (
+        ["chair", "zombie"],
+        {"chair": 4, "zombie": 1},
+        [wn.synset("chair.n.01"), wn.synset("zombi.n.01")],
+        None,
+    )
+    topics, _ = aggregate(*arguments)
+    cache = GraphCache()
+    assert aggregate(*arguments, cache=cache)[0] == topics
+    calls = get_nodevec.call_count
+    assert cache.importance == dict(topics)
+
+    warm, _ = aggregate(*arguments, cache=cache)
+
+    # no new edges, no new embeddings
+    assert get_nodevec.call_count == calls
+    assert [node for node, _ in warm] == [node for node, _ in topics]
+    assert [importance for _, importance in warm] == pytest.approx(
+        [importance for _, importance in topics]
+    )
 
 
-def test__traverse_tree__up_unweighted(simple_graph):
-    assert traverse_tree(
-        [("I1", 1)],
-        {},
-        {"L1": 4, "L2": 1},
-        simple_graph,
-        weighted=False,
-        direction="up",
-    ) == {"L1": 4}
+def traverse_tree(topic, aspect_counts, full_tree, weighted):
+    # reference for `weight_aspects`: a breadth-first walk down from a single topic
+    associated_aspects = {}
+    node_list = [(topic, 1)]
+    while node_list:
+        new_nodes = []
+        for node, weight in node_list:
+            for edge in full_tree.incoming_edges(full_tree.node_ids[node]):
+                daughter = full_tree.sources[edge]
+                name = full_tree.nodes[daughter]
+                if not full_tree.seed[daughter]:
+                    new_nodes.append(
+                        (name, weight * full_tree.similarity[edge] if weighted else 1)
+                    )
+                elif name not in associated_aspects:
+                    associated_aspects[name] = aspect_counts[name] * weight
+        node_list = new_nodes
+    return associated_aspects
+
+
+@pytest.mark.parametrize(
+    "weighted, expected", [(True, {"L1": 2, "L2": 0.5}), (False, {"L1": 4, "L2": 1})]
+)
+def test__weight_aspects(simple_graph, weighted, expected):
+    assert weight_aspects(
+        ["R", "I1"], {"L1": 4, "L2": 1}, simple_graph, weighted=weighted
+    ) == {"R": expected, "I1": {"L1": 4}}
+
+
+@pytest.mark.parametrize("weighted", [True, False])
+def test__weight_aspects__matches_traverse_tree(weighted):
+    # real hypernym chains with multiple inheritance and random similarities
+    chains = []
+    for word in ["person", "coffee", "water", "dog", "table", "light", "chair"]:
+        for path in wn.synsets(word, pos=wn.NOUN)[0].hypernym_paths():
+            chains.append((word, [synset.name() for synset in path]))
+    graph = HypernymGraph.from_chains(chains)
+    graph.similarity[:] = np.random.default_rng(0).uniform(0.1, 1.0, graph.edge_count)
+    aspect_counts = {word: len(word) for word, _ in chains}
+    topics = [node for node, seed in zip(graph.nodes, graph.seed) if not seed]
+
+    result = weight_aspects(topics, aspect_counts, graph, weighted=weighted)
+    for topic in topics:
+        expected = traverse_tree(topic, aspect_counts, graph, weighted)
+        assert list(result[topic].items()) == list(expected.items())
+
+
+def test__weight_aspects__deep_chain():
+    # deeper than the recursion limit
+    hypernyms = [f"n{depth}" for depth in range(5000)]
+    graph = HypernymGraph.from_chains([("leaf", hypernyms)])
+    graph.similarity[:] = 1.0
+    assert weight_aspects(["n0"], {"leaf": 3}, graph) == {"n0": {"leaf": 3.0}}
 
 
 @pytest.mark.skip(
@@ -179,8 +284,36 @@ def test_aspects__get_topics():
     pass
 
 
-@pytest.mark.skip(
-    reason="This function is hard to test in isolation and is tested as part of the integration test"
-)
-def test_aspects__collect_topic_info():
-    pass
+@pytest.fixture()
+def shared_graph():
+    # "a", "b" and "c" are attached to I1, "c" and "d" to I2, both below R
+    return HypernymGraph.from_chains(
+        [
+            ("a", ["R", "I1"]),
+            ("b", ["R", "I1"]),
+            ("c", ["R", "I1"]),
+            ("c", ["R", "I2"]),
+            ("d", ["R", "I2"]),
+        ]
+    )
+
+
+def test__index_aspects(shared_graph):
+    index = index_aspects({"b": 2, "a": 2, "c": 5, "d": 2, "e": 9}, shared_graph)
+    assert index == {
+        "I1": [("c", 5), ("b", 2), ("a", 2)],
+        "I2": [("c", 5), ("d", 2)],
+    }
+
+
+def test__collect_topic_info__rawterms(shared_graph):
+    topics = collect_topic_info(
+        [("I2", 0.6), ("R", 0.4)],
+        {"I2": ["I1"], "R": []},
+        {"d": 2, "b": 2, "a": 2, "c": 5},
+        shared_graph,
+    )
+    # aspects of the subsidiary topic come first for equal counts
+    assert topics["topic"].tolist() == ["I2"]
+    assert topics["rawterms"][0] == ["c", "b", "a", "d"]
+    assert topics["rawnums"][0] == [5, 2, 2, 2]
@@ -0,0 +1,86 @@
+import pytest
+from nltk.corpus import wordnet as nltk_wn
+
+from extra_model._wordnet import LazyWordNet, Synset, WordNet
+
+WORDS = [
+    "chair",
+    "Chairs",
+    "table",
+    "tables",
+    "coffee table",
+    "geese",
+    "axes",
+    "glasses",
+    "men",
+    "people",
+    "beautiful",
+    "ugly",
+    "bigger",
+    "happiest",
+    "asdf",
+    "",
+]
+
+
+@pytest.fixture(scope="module")
+def snapshot(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("wordnet")
+    WordNet.from_nltk().save(str(folder))
+    # load through mmap, like in production
+    return WordNet.load(str(folder))
+
+
+@pytest.mark.parametrize("pos", [nltk_wn.NOUN, nltk_wn.ADJ])
+@pytest.mark.parametrize("word", WORDS)
+def test__synsets__matches_nltk(snapshot, word, pos):
+    assert [synset.name() for synset in snapshot.synsets(word, pos=pos)] == [
+        synset.name() for synset in nltk_wn.synsets(word, pos=pos)
+    ]
+
+
+def test__synsets__overlong_word(snapshot):
+    assert snapshot.synsets("a" * 500, pos=WordNet.NOUN) == []
+
+
+@pytest.mark.parametrize(
+    "name", ["entity.n.01", "chair.n.01", "zombi.n.01", "president.n.04"]
+)
+def test__synset__matches_nltk(snapshot, name):
+    synset = snapshot.synset(name)
+    reference = nltk_wn.synset(name)
+    assert synset.name() == name
+    assert synset.pos() == reference.pos()
+    assert synset.definition() == reference.definition()
+    assert synset.lemma_names() == reference.lemma_names()
+    assert [[node.name() for node in path] for path in synset.hypernym_paths()] == [
+        [node.name() for node in path] for path in reference.hypernym_paths()
+    ]
+
+
+def test__synset__unknown_name(snapshot):
+    with pytest.raises(ValueError):
+        snapshot.synset("asdf.n.01")
+
+
+@pytest.mark.parametrize("word", ["ugly", "beautiful", "small", "good", "cheap"])
+def test__antonyms__match_nltk(snapshot, word):
+    assert [synset.antonyms() for synset in snapshot.synsets(word, pos="a")] == [
+        [antonym.name() for lemma in synset.lemmas() for antonym in lemma.antonyms()]
+        for synset in nltk_wn.synsets(word, pos="a")
+    ]
+
+
+def test__synset__equality(snapshot):
+    assert snapshot.synset("chair.n.01") == snapshot.synsets("chair", pos="n")[0]
+    assert snapshot.synset("chair.n.01") != snapshot.synset("table.n.01")
+    assert len({snapshot.synset("chair.n.01"), snapshot.synset("chair.n.01")}) == 1
+    assert isinstance(snapshot.synset("chair.n.01"), Synset)
+
+
+def test__lazy_wordnet__load(snapshot, tmp_path):
+    snapshot.save(str(tmp_path))
+    lazy = LazyWordNet()
+    lazy.load(str(tmp_path))
+    assert lazy.synset("chair.n.01").name() == "chair.n.01"
+    assert lazy.get() is not snapshot